@@ -0,0 +1,221 @@
+import codecs
+import hashlib
+import json
+import mmap
+import os
+import re
+
+from university_index import read_index, summarise_university, write_index
+
+# How much of the file is decoded at a time when there is no index to jump straight to each university
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Whitespace allowed between JSON values (same as the json module)
+WHITESPACE_PATTERN = re.compile(r"[ \t\n\r]*")
+
+# Characters that can come straight after an item in a list
+LIST_TERMINATORS = ", \t\n\r]"
+
+
+def iter_universities(path, chunk_size=READ_CHUNK_SIZE):
+    """
+    Reads a universities.json file one university at a time, so the whole file never has to be in memory.
+    The file is memory mapped. If it has an up to date summary index (see university_index.py) each
+    record is decoded straight from its offset, otherwise the top-level list is decoded a chunk at a time.
+
+    :param path: JSON file path to read
+    :param chunk_size: Bytes decoded at a time when there is no index (default 1 MB)
+    :return: Generator of university dictionaries (anything else in the list is passed through as it is)
+    """
+    path = str(path)
+    if os.path.getsize(path) == 0:
+        raise ValueError(f"{path} is empty")
+    # endif
+
+    index = read_index(path)
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as source:
+            if index is not None:
+                entries, _ = index
+                for entry in entries:
+                    offset = entry["offset"]
+                    yield json.loads(source[offset:offset + entry["length"]])
+                # endfor
+            else:
+                yield from scan_array(source, chunk_size)
+            # endif
+        # endwith
+    # endwith
+
+
+# enddef
+
+def build_index(path, chunk_size=READ_CHUNK_SIZE):
+    """
+    Writes the summary index for a universities.json file that doesn't have an up to date one,
+    by scanning the file once. The JSON file itself is left as it is.
+
+    :param path: JSON file path to index
+    :param chunk_size: Bytes decoded at a time (default 1 MB)
+    :return: None
+    """
+    path = str(path)
+    if os.path.getsize(path) == 0:
+        raise ValueError(f"{path} is empty")
+    # endif
+
+    entries = []
+    compact = True
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as source:
+            for university, offset, length in scan_array(source, chunk_size, with_spans=True):
+                record = source[offset:offset + length]
+                # Records written with an indent span several lines
+                if not entries and b"\n" in record:
+                    compact = False
+                # endif
+                entry = summarise_university(university)
+                entry["hash"] = hashlib.sha256(record).hexdigest()
+                entry["offset"] = offset
+                entry["length"] = length
+                entries.append(entry)
+            # endfor
+        # endwith
+    # endwith
+    write_index(path, entries, compact)
+
+
+# enddef
+
+def utf8_length(text):
+    """
+    Gets how many bytes some text takes up in UTF-8.
+
+    :param text: Text
+    :return: Number of bytes
+    """
+    if text.isascii():
+        return len(text)
+    # endif
+    return len(text.encode("utf-8"))
+
+
+# enddef
+
+def scan_array(source, chunk_size=READ_CHUNK_SIZE, with_spans=False):
+    """
+    Decodes a JSON list one item at a time from bytes (e.g. a memory mapped file).
+    Only the current chunk and the item being decoded are held as text.
+
+    :param source: Bytes-like object holding a JSON list
+    :param chunk_size: Bytes decoded at a time
+    :param with_spans: Also give where each item is in source (default False)
+    :return: Generator of the items in the list, or of (item, byte offset, byte length) with with_spans
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+    read_at = 0
+
+    # With spans: byte offset in source of buffer[0], and a character position in the buffer whose
+    # byte offset from buffer[0] is known, so each offset only has to count the bytes since the last one
+    buffer_offset = 0
+    known_chars = 0
+    known_bytes = 0
+
+    # "start" before the "[", "first" just after it, "value" after a comma, "after" after an item
+    state = "start"
+    while True:
+        position = WHITESPACE_PATTERN.match(buffer, position).end()
+        at_end = read_at >= len(source)
+
+        if position == len(buffer) and state != "done":
+            if at_end:
+                raise ValueError("Unexpected end of JSON list")
+            # endif
+            # Drop what has been decoded already and add the next chunk
+            chunk = source[read_at:read_at + chunk_size]
+            read_at += len(chunk)
+            if with_spans:
+                buffer_offset += known_bytes + utf8_length(buffer[known_chars:position])
+                known_chars = 0
+                known_bytes = 0
+            # endif
+            buffer = buffer[position:] + utf8.decode(chunk, final=read_at >= len(source))
+            position = 0
+            continue
+        # endif
+
+        if state == "start":
+            if buffer[position] != "[":
+                raise ValueError("Expected a JSON list")
+            # endif
+            position += 1
+            state = "first"
+        elif state == "first" and buffer[position] == "]":
+            position += 1
+            state = "done"
+        elif state == "first" or state == "value":
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if at_end:
+                    raise
+                # endif
+                end = None
+            # endtry
+
+            # A failed decode may just need more of the file, and so may a number cut off by the end
+            # of a chunk (e.g. "1" of "1.5"), which decodes fine but isn't followed by "," or "]"
+            if end is None or (not at_end and (end == len(buffer) or buffer[end] not in LIST_TERMINATORS)):
+                chunk = source[read_at:read_at + chunk_size]
+                read_at += len(chunk)
+                if with_spans:
+                    buffer_offset += known_bytes + utf8_length(buffer[known_chars:position])
+                    known_chars = 0
+                    known_bytes = 0
+                # endif
+                buffer = buffer[position:] + utf8.decode(chunk, final=read_at >= len(source))
+                position = 0
+                continue
+            # endif
+
+            if with_spans:
+                item_offset = buffer_offset + known_bytes + utf8_length(buffer[known_chars:position])
+                item_length = utf8_length(buffer[position:end])
+                known_chars = end
+                known_bytes = item_offset + item_length - buffer_offset
+                position = end
+                state = "after"
+                yield item, item_offset, item_length
+                continue
+            # endif
+
+            position = end
+            state = "after"
+            yield item
+        elif state == "after":
+            if buffer[position] == ",":
+                state = "value"
+            elif buffer[position] == "]":
+                state = "done"
+            else:
+                raise ValueError(f"Expected ',' or ']' in JSON list, found {buffer[position]!r}")
+            # endif
+            position += 1
+        else:
+            # Only whitespace may follow the list
+            if position < len(buffer):
+                raise ValueError("Extra data after JSON list")
+            # endif
+            if at_end:
+                return
+            # endif
+            chunk = source[read_at:read_at + chunk_size]
+            read_at += len(chunk)
+            buffer = utf8.decode(chunk, final=read_at >= len(source))
+            position = 0
+        # endif
+    # endwhile
+# enddef
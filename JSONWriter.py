@@ -1,22 +1,153 @@
+import hashlib
 import json
+import os
+import re
 from models.University import University
+from university_index import StoredUniversity, summarise_university, write_index
 
+# orjson is much faster than the json module, so it is used when it is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+# endtry
 
-def save_json(universities: [University]):
+# Characters json.dump writes as \uXXXX escapes (it only writes plain ASCII by default)
+NON_ASCII_PATTERN = re.compile("[\x7f-\U0010ffff]")
+
+
+def escape_non_ascii(match):
     """
-    Saves universities as JSON file.
+    Writes one character as a \\uXXXX escape the same way json.dump does
+    (characters above U+FFFF become a surrogate pair).
 
-    :param universities: List of University objects to save
-    :return: None
+    :param match: Regex match of a single character
+    :return: The escaped character
+    """
+    code = ord(match.group(0))
+    if code > 0xFFFF:
+        code -= 0x10000
+        return "\\u%04x\\u%04x" % (0xD800 | (code >> 10), 0xDC00 | (code & 0x3FF))
+    # endif
+    return "\\u%04x" % code
+
+
+# enddef
+
+def encode_university(university_dict, compact=False):
+    """
+    Turns one university dictionary into JSON bytes.
+    Pretty output is exactly what json.dump(..., indent=2) writes for the university on its own;
+    compact output has no spaces or new lines.
+
+    :param university_dict: University dictionary made by University.to_dict
+    :param compact: Leave out all the indentation (default False)
+    :return: JSON bytes
+    """
+    if orjson is not None:
+        if compact:
+            return orjson.dumps(university_dict)
+        # endif
+        encoded = orjson.dumps(university_dict, option=orjson.OPT_INDENT_2)
+        # orjson writes accented letters etc. as they are, json.dump escapes them
+        if not encoded.isascii() or b"\x7f" in encoded:
+            encoded = NON_ASCII_PATTERN.sub(escape_non_ascii, encoded.decode("utf-8")).encode("ascii")
+        # endif
+        return encoded
+    # endif
+
+    if compact:
+        return json.dumps(university_dict, separators=(",", ":")).encode("utf-8")
+    # endif
+    return json.dumps(university_dict, indent=2).encode("utf-8")
+
+
+# enddef
+
+def write_universities(path, universities, compact=False, with_index=True):
     """
+    Writes universities to a JSON file one at a time, so the whole file never has to be built in memory.
+    The file is written next to the old one and then swapped in, so a crash can't leave half a file.
+    Pretty output is byte for byte the same as json.dump(list, f, indent=2).
+    A summary index is written next to the file as well (see university_index.py).
 
-    university_json: [dict] = []
+    :param path: JSON file path to write
+    :param universities: Any iterable of university dictionaries, University objects or StoredUniversity objects
+    :param compact: Write without indentation, smaller and quicker to save (default False)
+    :param with_index: Also write the summary index (default True)
+    :return: Number of universities written
+    """
+    temp_path = path + ".tmp"
+    entries = []
+    count = 0
+    # Bytes written so far, which is where the next record starts
+    position = 0
+    with open(temp_path, "wb", buffering=1024 * 1024) as f:
+        f.write(b"[")
+        position += 1
+        for university in universities:
+            if isinstance(university, StoredUniversity) and university.compact == compact:
+                # Already in the right form in the old file, so it is copied across as it is
+                record = university.encoded()
+                entry = dict(university.entry)
+            else:
+                if isinstance(university, StoredUniversity) or isinstance(university, University):
+                    university = university.to_dict()
+                # endif
+                record = encode_university(university, compact)
+                if not compact:
+                    # Each university is indented one more level inside the list
+                    record = record.replace(b"\n", b"\n  ")
+                # endif
+                entry = None
+                if with_index:
+                    entry = summarise_university(university)
+                    entry["hash"] = hashlib.sha256(record).hexdigest()
+                # endif
+            # endif
 
-    for uni in universities:
-        university_json.append(uni.to_dict())
-    # endfor
+            if compact:
+                separator = b"," if count else b""
+            else:
+                separator = b",\n  " if count else b"\n  "
+            # endif
+            f.write(separator)
+            position += len(separator)
 
-    with open("universities.json", "w", encoding="utf-8") as f:
-        json.dump(university_json, f, indent=2)
+            if with_index:
+                entry["offset"] = position
+                entry["length"] = len(record)
+                entries.append(entry)
+            # endif
+            f.write(record)
+            position += len(record)
+            count += 1
+        # endfor
+        if count and not compact:
+            f.write(b"\n")
+        # endif
+        f.write(b"]")
+        f.flush()
+        os.fsync(f.fileno())
     # endwith
+    os.replace(temp_path, path)
+
+    if with_index:
+        write_index(path, entries, compact)
+    # endif
+    return count
+
+
+# enddef
+
+def save_json(universities: [University], path="universities.json", compact=False):
+    """
+    Saves universities as JSON file.
+
+    :param universities: List of University objects to save
+    :param path: JSON file path to write (default "universities.json")
+    :param compact: Write without indentation (default False)
+    :return: None
+    """
+    write_universities(path, universities, compact)
 # enddef
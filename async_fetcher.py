@@ -0,0 +1,94 @@
+import asyncio
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from network_helper import get_with_retry
+
+
+async def fetch_one_async(url, headers, session, executor, global_limit, host_limits, max_per_host, owner):
+    """
+    Fetches one page while respecting the global and per-host concurrency limits.
+
+    :param url: The URL to fetch
+    :param headers: Request headers dictionary
+    :param session: Optional shared session from create_session()
+    :param executor: Thread pool that runs the blocking request
+    :param global_limit: Semaphore shared by every request
+    :param host_limits: Dictionary of host name to semaphore, filled in as new hosts are seen
+    :param max_per_host: Maximum requests in flight to one host
+    :param owner: (university name, course name) recorded if the page fails
+    :return: Response object if successful, None if all retries fail
+    """
+    host = urllib.parse.urlsplit(url).netloc
+    if host not in host_limits:
+        host_limits[host] = asyncio.Semaphore(max_per_host)
+    # endif
+
+    # Take the host slot first so a slow host can't hold on to all the global slots
+    async with host_limits[host]:
+        async with global_limit:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                executor, lambda: get_with_retry(url, headers, session=session,
+                                                 university=owner[0], course=owner[1])
+            )
+        # endwith
+    # endwith
+
+
+# enddef
+
+async def fetch_all_async(urls, headers, session=None, max_concurrency=16, max_per_host=8, owners=None):
+    """
+    Fetches many pages concurrently with a global and a per-host limit.
+
+    :param urls: List of URLs to fetch
+    :param headers: Request headers dictionary
+    :param session: Optional shared session from create_session()
+    :param max_concurrency: Maximum requests in flight across all hosts (default 16)
+    :param max_per_host: Maximum requests in flight to one host (default 8)
+    :param owners: Optional list of (university name, course name) for each URL, recorded if a page fails
+    :return: List of Response objects (or None for failures) in the same order as urls
+    """
+    if not urls:
+        return []
+    # endif
+
+    if owners is None:
+        owners = [("", "")] * len(urls)
+    # endif
+
+    global_limit = asyncio.Semaphore(max_concurrency)
+    host_limits = {}
+
+    # requests is blocking, so each request runs on a worker thread while asyncio schedules them
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        tasks = []
+        for url, owner in zip(urls, owners):
+            tasks.append(fetch_one_async(url, headers, session, executor, global_limit, host_limits,
+                                         max_per_host, owner))
+        # endfor
+
+        # gather keeps the results in the same order as the urls list
+        return await asyncio.gather(*tasks)
+    # endwith
+
+
+# enddef
+
+def fetch_all(urls, headers, session=None, max_concurrency=16, max_per_host=8, owners=None):
+    """
+    Runs fetch_all_async from normal (non-async) code.
+
+    :param urls: List of URLs to fetch
+    :param headers: Request headers dictionary
+    :param session: Optional shared session from create_session()
+    :param max_concurrency: Maximum requests in flight across all hosts (default 16)
+    :param max_per_host: Maximum requests in flight to one host (default 8)
+    :param owners: Optional list of (university name, course name) for each URL, recorded if a page fails
+    :return: List of Response objects (or None for failures) in the same order as urls
+    """
+    return asyncio.run(fetch_all_async(urls, headers, session=session,
+                                       max_concurrency=max_concurrency, max_per_host=max_per_host,
+                                       owners=owners))
+# enddef
@@ -0,0 +1,180 @@
+"""
+Benchmark for the columnar export in columnar_export.py against scanning the nested JSON.
+
+The same synthetic universities are saved as JSON and exported to columns. The script checks every
+university rebuilt from the columns is the same as the one that went in, compares the sizes on disk,
+then answers a few typical questions by looking through every course in the JSON dictionaries (already
+loaded, as a job that scans many times would) and with CourseColumns.find_courses, and checks both
+ways find the same courses.
+
+Usage: python3 benchmarks/bench_columnar_export.py --universities 2000 --courses 30
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from JSONWriter import write_universities
+from bench_progress_journal import make_universities
+from bench_university_store import QUERIES
+from columnar_export import CourseColumns, export_columns
+
+
+def scan_dicts(data, max_points=None, min_points=None, subject=None, course_type=None, university=None):
+    """
+    Answers a question by looking at every course in already loaded university dictionaries.
+
+    :param data: List of university dictionaries
+    :param max_points: Same as CourseColumns.find_courses
+    :param min_points: Same as CourseColumns.find_courses
+    :param subject: Same as CourseColumns.find_courses
+    :param course_type: Same as CourseColumns.find_courses
+    :param university: Same as CourseColumns.find_courses
+    :return: List of (university name, course link) in file order
+    """
+    found = []
+    for uni in data:
+        if university is not None and uni["name"] != university:
+            continue
+        # endif
+        for course in uni["courses"]:
+            if course_type is not None and course["course_type"].lower() != course_type.lower():
+                continue
+            # endif
+            needs_requirement = max_points is not None or min_points is not None or subject is not None
+            matched = not needs_requirement
+            for req in course["requirements"]:
+                points = req["min_ucas_points"]
+                if max_points is not None and not 0 < points <= max_points:
+                    continue
+                # endif
+                if min_points is not None and points < min_points:
+                    continue
+                # endif
+                if subject is not None:
+                    subjects = [s["subject"].lower() for s in req["subject_requirements"]]
+                    if subject.lower() not in subjects:
+                        continue
+                    # endif
+                # endif
+                matched = True
+                break
+            # endfor
+            if matched:
+                found.append((uni["name"], course["link"]))
+            # endif
+        # endfor
+    # endfor
+    return found
+
+
+# enddef
+
+def folder_size(directory):
+    """
+    Adds up the size of every file in a folder.
+
+    :param directory: Folder path
+    :return: Size in bytes
+    """
+    total = 0
+    for name in os.listdir(directory):
+        total += os.path.getsize(os.path.join(directory, name))
+    # endfor
+    return total
+
+
+# enddef
+
+def main():
+    """
+    Builds the JSON file and the export, checks they agree and times the queries.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Compare the columnar export with scanning the JSON")
+    parser.add_argument("--universities", type=int, default=2000)
+    parser.add_argument("--courses", type=int, default=30, help="courses per university")
+    parser.add_argument("--repeats", type=int, default=5, help="times each question is answered")
+    args = parser.parse_args()
+
+    universities = make_universities(args.universities, args.courses)
+    work_dir = tempfile.mkdtemp(prefix="bench_columns_")
+    failed = False
+    try:
+        json_path = os.path.join(work_dir, "universities.json")
+        write_universities(json_path, universities, with_index=False)
+        columns_path = os.path.join(work_dir, "universities_columns")
+
+        started = time.perf_counter()
+        export_columns(universities, columns_path)
+        export_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        # endwith
+        load_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        columns = CourseColumns(columns_path)
+        open_ms = (time.perf_counter() - started) * 1000
+
+        different = 0
+        for row, uni in enumerate(universities):
+            if columns.university(row) != uni:
+                different += 1
+            # endif
+        # endfor
+        print(f"{args.universities} universities x {args.courses} courses, exported in {export_seconds:.2f} s")
+        print(f"JSON {os.path.getsize(json_path) / 1024 / 1024:.1f} MB (loaded in {load_seconds:.2f} s), "
+              f"columns {folder_size(columns_path) / 1024 / 1024:.1f} MB (opened in {open_ms:.1f} ms)")
+        print(f"Round trip: {'every university identical' if not different else f'{different} DIFFERENT'}")
+        failed = different > 0
+
+        print(f"{'query':40s} {'courses':>8s} {'dict scan (ms)':>15s} {'columns (ms)':>13s} {'speedup':>8s}")
+        for description, arguments in QUERIES:
+            started = time.perf_counter()
+            for _ in range(args.repeats):
+                expected = scan_dicts(data, **arguments)
+            # endfor
+            scan_ms = (time.perf_counter() - started) * 1000 / args.repeats
+
+            started = time.perf_counter()
+            for _ in range(args.repeats):
+                rows = columns.find_courses(**arguments)
+            # endfor
+            columns_ms = (time.perf_counter() - started) * 1000 / args.repeats
+
+            found = []
+            for row in rows:
+                university_row = columns.column("course_university")[row]
+                found.append((columns.text("university_name", university_row), columns.text("course_link", row)))
+            # endfor
+            if found != expected:
+                print(f"{description}: DIFFERENT RESULTS ({len(found)} vs {len(expected)})")
+                failed = True
+            # endif
+            print(f"{description:40s} {len(found):8d} {scan_ms:15.1f} {columns_ms:13.2f} {scan_ms / columns_ms:7.1f}x")
+        # endfor
+    finally:
+        shutil.rmtree(work_dir)
+    # endtry
+
+    if failed:
+        sys.exit(1)
+    # endif
+
+
+# enddef
+
+if __name__ == "__main__":
+    main()
+# endif
@@ -0,0 +1,259 @@
+"""
+End-to-end crawl benchmark: runs the full scraper.py pipeline against the local fake UCAS server
+and reports pages/sec, p50/p99 response latency and the scraper's peak memory.
+
+With --refresh it then changes the grades of a fraction of the courses (--changed-fraction) and runs
+a refresh crawl (SCRAPER_REFRESH=1) in the same folder, plus a full crawl of the changed site in a new
+folder, and checks both give the same universities.json.
+
+Usage: python3 benchmarks/bench_crawl.py --universities 20 --courses 20 --latency 0.05
+       python3 benchmarks/bench_crawl.py --refresh --changed-fraction 0.05 --no-rate-limit
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ucas_server import FakeUcasSettings, start_server
+
+SCRAPER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scraper.py")
+
+
+def percentile(values, fraction):
+    """
+    Finds a percentile of a list of numbers (nearest rank).
+
+    :param values: List of numbers
+    :param fraction: Percentile as a fraction, e.g. 0.99
+    :return: The percentile value (0 if the list is empty)
+    """
+    if not values:
+        return 0
+    # endif
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+# enddef
+
+def run_crawl(settings, work_dir, extra_env=None, port=0):
+    """
+    Runs scraper.py against a fake server with the given settings.
+
+    :param settings: FakeUcasSettings describing the fake site
+    :param work_dir: Folder the scraper runs in (its output files are written here)
+    :param extra_env: Optional extra environment variables for the scraper
+    :param port: Port for the fake server, 0 picks a free one (default 0)
+    :return: Dictionary of results
+    """
+    server, base_url = start_server(settings, port)
+
+    env = dict(os.environ)
+    env["SCRAPER_UCAS_URL"] = base_url
+    if extra_env:
+        env.update(extra_env)
+    # endif
+
+    log_path = os.path.join(work_dir, "scraper.log")
+    started = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log_file:
+        completed = subprocess.run([sys.executable, SCRAPER_PATH], cwd=work_dir, env=env,
+                                   stdout=log_file, stderr=subprocess.STDOUT)
+    # endwith
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+    server.server_close()
+
+    # ru_maxrss is in kilobytes on Linux (bytes on macOS)
+    peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    if sys.platform == "darwin":
+        peak_rss = peak_rss // 1024
+    # endif
+
+    universities = 0
+    courses = 0
+    output_path = os.path.join(work_dir, "universities.json")
+    if os.path.exists(output_path):
+        with open(output_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        # endwith
+        universities = len(data)
+        for uni in data:
+            courses += len(uni.get("courses") or [])
+        # endfor
+    # endif
+
+    return {
+        "exit_code": completed.returncode,
+        "seconds": elapsed,
+        "requests": settings.request_count,
+        "errors_injected": settings.error_count,
+        "megabytes_served": settings.bytes_sent / (1024 * 1024),
+        "pages_per_second": settings.request_count / elapsed if elapsed > 0 else 0,
+        "p50_ms": percentile(settings.latencies, 0.50) * 1000,
+        "p99_ms": percentile(settings.latencies, 0.99) * 1000,
+        "peak_rss_mb": peak_rss / 1024,
+        "universities": universities,
+        "courses": courses,
+        "log": log_path,
+        "port": server.server_address[1]
+    }
+
+
+# enddef
+
+
+def main() -> None:
+    """
+    Parses the command line, runs one benchmark crawl and prints the results.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the full scraper against a local fake UCAS")
+    parser.add_argument("--universities", type=int, default=20)
+    parser.add_argument("--courses", type=int, default=20, help="courses per university")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--page-padding-kb", type=int, default=40)
+    parser.add_argument("--no-rate-limit", action="store_true",
+                        help="turn off the scraper's adaptive rate limiter to measure raw pipeline throughput")
+    parser.add_argument("--fetch-mode", default="",
+                        help="scraper FETCH_MODE to use (sequential, async, threads or pipeline)")
+    parser.add_argument("--parse-workers", type=int, default=0,
+                        help="parser processes in pipeline mode (0 means one per CPU)")
+    parser.add_argument("--refresh", action="store_true",
+                        help="after the crawl, change some courses and compare a refresh crawl with a full one")
+    parser.add_argument("--changed-fraction", type=float, default=0.05,
+                        help="fraction of courses changed before the refresh crawl")
+    parser.add_argument("--keep", action="store_true", help="keep the scraper's working folder")
+    args = parser.parse_args()
+
+    settings = FakeUcasSettings(args.universities, args.courses, args.latency, args.error_rate, args.page_padding_kb)
+    work_dir = tempfile.mkdtemp(prefix="bench_crawl_")
+    extra_env = {}
+    if args.no_rate_limit:
+        extra_env["SCRAPER_RATE_LIMITER"] = "0"
+    # endif
+    if args.fetch_mode:
+        extra_env["SCRAPER_FETCH_MODE"] = args.fetch_mode
+    # endif
+    if args.parse_workers:
+        extra_env["SCRAPER_PARSE_WORKERS"] = str(args.parse_workers)
+    # endif
+    results = run_crawl(settings, work_dir, extra_env)
+
+    print("========================================")
+    print("CRAWL BENCHMARK")
+    print("========================================")
+    print(f"Site: {args.universities} universities x {args.courses} courses, "
+          f"latency {args.latency * 1000:.0f} ms, error rate {args.error_rate:.1%}, "
+          f"rate limiter {'off' if args.no_rate_limit else 'on'}, fetch mode {args.fetch_mode or 'default'}")
+    print(f"Scraper exit code: {results['exit_code']}")
+    print(f"Collected: {results['universities']} universities, {results['courses']} courses")
+    print(f"Wall time: {results['seconds']:.2f} s")
+    print(f"Requests served: {results['requests']} ({results['errors_injected']} injected errors, "
+          f"{results['megabytes_served']:.1f} MB)")
+    print(f"Throughput: {results['pages_per_second']:.1f} pages/sec")
+    print(f"Latency p50: {results['p50_ms']:.1f} ms, p99: {results['p99_ms']:.1f} ms")
+    print(f"Peak RSS: {results['peak_rss_mb']:.1f} MB")
+    print("========================================")
+
+    refresh_failed = False
+    if args.refresh:
+        refresh_failed = compare_refresh(args, work_dir, extra_env, results["port"])
+    # endif
+
+    if args.keep:
+        print(f"Scraper output kept in {work_dir}")
+    else:
+        for root, dirs, files in os.walk(work_dir, topdown=False):
+            for file_name in files:
+                os.remove(os.path.join(root, file_name))
+            # endfor
+            for dir_name in dirs:
+                os.rmdir(os.path.join(root, dir_name))
+            # endfor
+        # endfor
+        os.rmdir(work_dir)
+    # endif
+
+    if refresh_failed:
+        sys.exit(1)
+    # endif
+
+
+# enddef
+
+def load_without_fetch_times(path):
+    """
+    Loads universities.json without the fetched_at times, which differ between any two crawls.
+
+    :param path: JSON file path
+    :return: List of university dictionaries
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    # endwith
+    for uni in data:
+        for course in uni["courses"]:
+            course.pop("fetched_at", None)
+        # endfor
+    # endfor
+    return data
+
+
+# enddef
+
+def compare_refresh(args, work_dir, extra_env, port):
+    """
+    Changes some courses on the fake site, then refreshes the first crawl and runs a full crawl of
+    the changed site in a new folder, and compares the two. Both use the first crawl's port, because
+    the course links (and so the card fingerprints) include it.
+
+    :param args: Parsed command line
+    :param work_dir: Folder of the first crawl
+    :param extra_env: Environment variables the first crawl was run with
+    :param port: Port the first crawl's fake server was on
+    :return: True if the outputs differ
+    """
+    changed_settings = []
+    for _ in range(2):
+        changed_settings.append(FakeUcasSettings(args.universities, args.courses, args.latency, args.error_rate,
+                                                 args.page_padding_kb, revision=1,
+                                                 changed_fraction=args.changed_fraction))
+    # endfor
+
+    refresh_env = dict(extra_env)
+    refresh_env["SCRAPER_REFRESH"] = "1"
+    refresh_results = run_crawl(changed_settings[0], work_dir, refresh_env, port)
+
+    full_dir = tempfile.mkdtemp(prefix="bench_crawl_full_")
+    full_results = run_crawl(changed_settings[1], full_dir, extra_env, port)
+
+    same = load_without_fetch_times(os.path.join(work_dir, "universities.json")) == \
+        load_without_fetch_times(os.path.join(full_dir, "universities.json"))
+    shutil.rmtree(full_dir)
+
+    print(f"REFRESH AFTER CHANGING {args.changed_fraction:.0%} OF COURSES")
+    print(f"Full crawl:    {full_results['requests']:6d} requests, {full_results['seconds']:6.2f} s")
+    print(f"Refresh crawl: {refresh_results['requests']:6d} requests, {refresh_results['seconds']:6.2f} s "
+          f"({refresh_results['requests'] / max(1, full_results['requests']):.0%} of the requests)")
+    print(f"Output: {'same as the full crawl' if same else 'DIFFERENT FROM THE FULL CRAWL'}")
+    print("========================================")
+    return not same
+
+
+# enddef
+
+
+if __name__ == "__main__":
+    main()
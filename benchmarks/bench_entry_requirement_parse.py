@@ -0,0 +1,496 @@
+"""
+Corpus based equivalence check and throughput benchmark for EntryRequirement.parse
+(with and without its parse cache).
+
+legacy_parse below is the old EntryRequirement.parse, kept word for word, which searched the whole
+text once per qualification and scanned forwards from every "grade in" for the subject. The script
+builds a corpus of requirement texts (the combined texts from fake course pages, random mixes of
+real looking UCAS snippets, and a few very long texts), checks both versions give exactly the same
+EntryRequirement for every text, and reports texts/sec for each. It then parses the snippets of
+fake course pages and random snippet lists one course at a time the way the scraper does (joined with
+" | " and answered from the parse cache where possible), checks every course against the old parse and
+reports the cache's hit rate per course. The script exits with 1 if anything differs.
+
+Usage: python3 benchmarks/bench_entry_requirement_parse.py --texts 2000
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_ucas_server import FakeUcasSettings, course_detail_page
+from html_parser import make_soup
+from models.EntryRequirement import EntryRequirement, ParseCache
+import models.EntryRequirement as entry_requirement_module
+from requirement_extractor import extract_course_page
+
+# Pieces of requirement text in the styles seen on UCAS course pages
+SNIPPETS = [
+    "A level - AAB", "A level - A*AA", "A levels: BBB", "A-level - BCC-BBB", "A Level – ABB – AAB",
+    "A level AAA including Mathematics and Physics", "A level - AAB including Chemistry, plus one other science",
+    "A level - ABB including Biology or Chemistry (grade A)", "A* in Mathematics A*/A in Physics",
+    "A in Mathematics and B in Further Mathematics.", "AAB in three A levels", "A level - Not accepted",
+    "UCAS Tariff - 112 - 128 points", "UCAS Tariff - 72 points", "UCAS Tariff – 120 points", "UCAS Tariff - Not accepted",
+    "BTEC Extended Diploma - DDM", "BTEC Extended Diploma - D*D*D", "BTEC National Diploma - DDM - DMM",
+    "BTEC Level 3 Diploma - Not accepted", "BTEC Subsidiary Diploma - MMP", "Access to HE Diploma - 45 credits",
+    "Scottish Higher - AABB", "International Baccalaureate - 32 points", "No formal requirements",
+    "Requirements not specified", "Entry requirements", "Typical offer", "at grade B or above", "N/A",
+    "including Mathematics at grade A", "Further Mathematics is not required", "GCSE English at grade 4 (C)",
+    "Applicants in Year 13 should contact us.", "Courses in London and Leeds", "Interview required",
+    "A level\\n\\nAAB", "a level - abb", "UCAS Tariff • 104 points", "BTEC · DMM", "Study in the UK"
+]
+
+SEPARATORS = [" | ", " ", ". ", "\\n", " • "]
+
+
+def legacy_parse(requirement_text: str) -> EntryRequirement:
+    """
+    The old EntryRequirement.parse, with its separate regex searches and nested word loops.
+
+    :param requirement_text: The raw text from the UCAS website
+    :return: EntryRequirement object with all the parsed information
+    """
+    req = EntryRequirement()
+
+    if not requirement_text:
+        req.has_requirements = False
+        return req
+    # endif
+
+    # Clean the text first
+    text = EntryRequirement.clean_requirement_text(requirement_text)
+
+    # Check for no requirements or not accepted
+    text_lower = text.lower()
+    no_req_phrases = [
+        "no formal", "no specific", "no requirement", "requirements not specified",
+        "not available",
+        # Handle partial text issues
+        "n/a"
+    ]
+
+    for phrase in no_req_phrases:
+        if phrase in text_lower:
+            req.has_requirements = False
+            # Leave all fields empty for courses with no requirements
+            req.display_grades = ""
+            req.min_ucas_points = 0
+            req.min_grade_required = ""
+            return req
+        # endif
+    # endfor
+
+    # Parse A-level requirements
+    # Using regex to find A-level grades in the text
+    # r'A\s*levels?\s*[:–-]?\s*' matches "A level", "A levels", with optional colon/dash
+    # ([A-Z*]{3,}) matches the grade letters like AAB or BCC
+    # (?:...)? is optional and catches ranges like BCC-BBB
+    a_level_pattern = r'A\s*[-–]?\s*levels?\s*[:–-]?\s*([A-Z*]{3,}(?:\s*[-–]\s*[A-Z*]{3,})?)'
+    a_level_match = re.search(a_level_pattern, text, re.IGNORECASE)
+    if a_level_match:
+        grades = a_level_match.group(1).strip()
+        # Check if the match is actually an edge case like "Not" instead of real grades
+        if grades.lower() in ["not", "not accepted", "n/a"]:
+            req.has_requirements = False
+            req.display_grades = ""
+            req.min_ucas_points = 0
+            req.min_grade_required = ""
+            return req
+        # endif
+        req.display_grades = grades
+        req.has_requirements = True
+
+        if "-" in grades:
+            # Range like "BCC-BBB" - use minimum
+            parts = grades.split("-")
+            if len(parts) == 2:
+                min_grades = parts[0].strip()
+                req.min_ucas_points = req.calculate_a_level_points(min_grades)
+                req.min_grade_required = req.find_lowest_grade(min_grades)
+            # endif
+        else:
+            # Single grade like "AAB"
+            req.min_ucas_points = req.calculate_a_level_points(grades)
+            req.min_grade_required = req.find_lowest_grade(grades)
+
+        # Debug: Uncomment line below to see what text is being analyzed
+        # print(f"Analyzing requirement text: {text[:200]}...")
+
+        # Check for subject requirements - multiple patterns needed
+
+        # Pattern 1: "including Chemistry and Mathematics" (Newcastle style)  
+        # Look for text containing "including" followed by subject names
+        if "including" in text.lower():
+            # Find the part after "including"
+            including_pos = text.lower().find("including")
+            after_including = text[including_pos + 9:].strip()  # 9 = len("including")
+
+            # print(f"Found 'including' text: {after_including[:100]}")
+
+            # Look for subject names before any punctuation or "at grade"
+            # Split at common terminators
+            terminators = [" at grade", ".", ",", ")", "(", " Further Mathematics is"]
+            subjects_text = after_including
+            for term in terminators:
+                if term in subjects_text:
+                    subjects_text = subjects_text.split(term)[0]
+                    break
+                # endif
+            # endfor
+
+            # print(f"Extracted subjects text: {subjects_text}")
+
+            # Split subjects on "and" and "or" 
+            subject_parts = []
+
+            # Replace "and" and "or" with a separator
+            subjects_text = subjects_text.replace(" and ", "|")
+            subjects_text = subjects_text.replace(" or ", "|")
+
+            # Split on the separator
+            for part in subjects_text.split("|"):
+                clean_part = part.strip()
+                if clean_part and len(clean_part) < 50:
+                    subject_parts.append(clean_part)
+                # endif
+            # endfor
+
+            # Add each subject with the minimum required grade
+            for subject in subject_parts:
+                req.add_subject_requirement(subject, req.min_grade_required)
+                # print(f"Added subject requirement: {subject} at grade {req.min_grade_required}")
+            # endfor
+        # endif
+
+        # Pattern 2: "A* in Mathematics A*/A in Physics" (Imperial style)
+        # Look for patterns like "A* in Mathematics" or "A*/A in Physics"
+        if " in " in text:
+            # Split text into lines to process each requirement line
+            lines = text.split('\n')
+            for line in lines:
+                line = line.strip()
+
+                # Skip empty lines or lines without grade info
+                if not line or " in " not in line:
+                    continue
+                # endif
+
+                # Look for grade followed by "in" followed by subject
+                words = line.split()
+                for i in range(len(words) - 2):
+                    current_word = words[i]
+                    next_word = words[i + 1]
+
+                    # Check if current word is a grade and next word is "in"
+                    is_grade = False
+                    grade_chars = ["A", "B", "C", "D", "E", "*", "/"]
+                    for char in current_word:
+                        if char in grade_chars:
+                            is_grade = True
+                            break
+                        # endif
+                    # endfor
+
+                    if is_grade and next_word.lower() == "in":
+                        # Found "grade in" pattern, extract subject name
+                        grade = current_word
+
+                        # Get subject name (rest of the line or until parentheses/punctuation)
+                        subject_words = []
+                        for j in range(i + 2, len(words)):
+                            word = words[j]
+
+                            # Stop at punctuation or new grade patterns
+                            if word.startswith("(") or word.startswith("[") or "." in word:
+                                break
+                            # endif
+
+                            # Stop if we hit another grade
+                            is_new_grade = False
+                            for char in word:
+                                if char in grade_chars and word != "A-levels":
+                                    is_new_grade = True
+                                    break
+                                # endif
+                            # endfor
+
+                            if is_new_grade:
+                                break
+                            # endif
+
+                            subject_words.append(word)
+                        # endfor
+
+                        if subject_words:
+                            subject = " ".join(subject_words)
+                            req.add_subject_requirement(subject, grade)
+                            # print(f"Added subject requirement: {subject} at grade {grade}")
+                        # endif
+                    # endif
+                # endfor
+            # endfor
+        # endif
+    # endif
+
+    # Parse UCAS Tariff Points
+    # Handle "UCAS Tariff - 112 - 128 points" or "UCAS Tariff - 72 points"
+    # Parse UCAS tariff points with regex
+    # r'UCAS\s+Tariff\s*[-–]\s*' matches "UCAS Tariff -"
+    # (\d+) grabs the first number (minimum points)
+    # (?:\s*[-–]\s*(\d+))? optionally grabs second number for ranges like "112-128"
+    # \s*points? allows "points" or "point" at the end
+    ucas_pattern = r'UCAS\s+Tariff\s*[-–]\s*(\d+)(?:\s*[-–]\s*(\d+))?\s*points?'
+    ucas_match = re.search(ucas_pattern, text, re.IGNORECASE)
+    if ucas_match:
+        # Use the minimum points (first number) for matching
+        min_points_str = ucas_match.group(1)
+        try:
+            req.min_ucas_points = int(min_points_str)
+            req.has_requirements = True
+        except ValueError:
+            pass
+        # endtry
+    # endif
+
+    # Check if UCAS not accepted
+    if "ucas tariff" in text_lower and "not accepted" in text_lower:
+        req.accepts_ucas = False
+        req.min_ucas_points = 0
+    # endif
+
+    # Parse BTEC requirements
+    # Handle "BTEC ... - DDM - DMM" or "BTEC ... - MMP" or "BTEC ... - Not accepted"
+    if "btec" in text_lower and "not accepted" in text_lower:
+        # BTEC not accepted for this course
+        pass
+    else:
+        btec_pattern = r'BTEC.*?[-–]\s*([D*MP]+)(?:\s*[-–]\s*([D*MP]+))?'
+        btec_match = re.search(btec_pattern, text, re.IGNORECASE)
+        if btec_match:
+            # Use the minimum BTEC grade (first one) for matching
+            btec_grades = btec_match.group(1).strip().upper()
+            req.btec_grades = btec_grades
+            req.has_requirements = True
+
+            # Calculate UCAS points for BTEC
+            btec_points = EntryRequirement.calculate_btec_points(btec_grades)
+            if btec_points > 0:
+                if req.min_ucas_points == 0:
+                    req.min_ucas_points = btec_points
+                else:
+                    # Take the lower points
+                    req.min_ucas_points = min(req.min_ucas_points, btec_points)
+                # endif
+            # endif
+        # endif
+    # endif
+
+    return req
+
+
+# enddef
+
+def build_corpus(text_count, seed):
+    """
+    Builds the texts to parse: combined texts from fake course pages, random mixes of snippets
+    and a few very long texts.
+
+    :param text_count: Number of random snippet mixes
+    :param seed: Random seed so the corpus is the same every run
+    :return: List of requirement texts
+    """
+    rng = random.Random(seed)
+    corpus = ["", "   "]
+    corpus.extend(SNIPPETS)
+
+    settings = FakeUcasSettings(universities=2, courses_per_university=20, page_padding_kb=1)
+    for uni_index in range(settings.universities):
+        for course_index in range(settings.courses_per_university):
+            page = course_detail_page(settings, uni_index, course_index)
+            parts = extract_course_page(make_soup(page))
+            corpus.append(" | ".join(parts.requirement_texts))
+        # endfor
+    # endfor
+
+    for _ in range(text_count):
+        pieces = rng.sample(SNIPPETS, rng.randint(1, 8))
+        corpus.append(rng.choice(SEPARATORS).join(pieces))
+    # endfor
+
+    # Long combined texts like the ones from pages with lots of repeated sections, without the
+    # snippets that end the parse straight away
+    full_snippets = []
+    for snippet in SNIPPETS:
+        snippet_lower = snippet.lower()
+        if not any(phrase in snippet_lower for phrase in ["no formal", "not specified", "n/a", "not accepted"]):
+            full_snippets.append(snippet)
+        # endif
+    # endfor
+    for length in [50, 200, 500]:
+        pieces = [rng.choice(full_snippets) for _ in range(length)]
+        corpus.append(" | ".join(pieces))
+    # endfor
+    return corpus
+
+
+# enddef
+
+def build_snippet_lists(course_count, seed):
+    """
+    Builds the requirement snippets of many courses: those of fake course pages and random lists of snippets.
+
+    :param course_count: Number of random snippet lists
+    :param seed: Random seed so the lists are the same every run
+    :return: List of lists of snippets
+    """
+    rng = random.Random(seed)
+    snippet_lists = []
+
+    settings = FakeUcasSettings(universities=2, courses_per_university=20, page_padding_kb=1)
+    for uni_index in range(settings.universities):
+        for course_index in range(settings.courses_per_university):
+            page = course_detail_page(settings, uni_index, course_index)
+            snippet_lists.append(extract_course_page(make_soup(page)).requirement_texts)
+        # endfor
+    # endfor
+
+    for _ in range(course_count):
+        snippet_lists.append(rng.sample(SNIPPETS, rng.randint(1, 8)))
+    # endfor
+    return snippet_lists
+
+
+# enddef
+
+def uncached_parse(requirement_text):
+    """
+    EntryRequirement.parse without the parse cache, so repeats measure the parse itself.
+
+    :param requirement_text: The raw requirement text
+    :return: EntryRequirement object
+    """
+    if not requirement_text:
+        return EntryRequirement.parse(requirement_text)
+    # endif
+    return EntryRequirement.parse_cleaned_text(EntryRequirement.clean_requirement_text(requirement_text))
+
+
+# enddef
+
+def time_parser(corpus, parse_function, repeats):
+    """
+    Parses every text in the corpus and times it.
+
+    :param corpus: List of requirement texts
+    :param parse_function: Function that takes a text and returns an EntryRequirement
+    :param repeats: How many times to go over the corpus
+    :return: (texts per second, list of requirement dictionaries)
+    """
+    results = []
+    started = time.perf_counter()
+    for _ in range(repeats):
+        results = []
+        for text in corpus:
+            results.append(parse_function(text).to_dict())
+        # endfor
+    # endfor
+    elapsed = time.perf_counter() - started
+    return len(corpus) * repeats / elapsed, results
+
+
+# enddef
+
+
+def main() -> None:
+    """
+    Builds the corpus, checks the old and new parse agree on every text and times both.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Benchmark EntryRequirement.parse")
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.texts, args.seed)
+    average_length = sum(len(text) for text in corpus) / len(corpus)
+    print(f"{len(corpus)} texts, {average_length:.0f} characters each on average")
+
+    legacy_rate, legacy_results = time_parser(corpus, legacy_parse, args.repeats)
+    new_rate, new_results = time_parser(corpus, uncached_parse, args.repeats)
+
+    # Start the cached run with an empty cache so the hit rate only counts this corpus
+    entry_requirement_module.parse_cache = ParseCache()
+    cached_rate, cached_results = time_parser(corpus, EntryRequirement.parse, args.repeats)
+    cache_stats = entry_requirement_module.parse_cache.stats()
+
+    differences = 0
+    for text, legacy_result, new_result, cached_result in zip(corpus, legacy_results, new_results, cached_results):
+        if legacy_result != new_result or legacy_result != cached_result:
+            differences += 1
+            if differences <= 5:
+                print(f"Text differs: {text[:200]!r}")
+                print(f"  old:    {json.dumps(legacy_result)}")
+                print(f"  new:    {json.dumps(new_result)}")
+                print(f"  cached: {json.dumps(cached_result)}")
+            # endif
+        # endif
+    # endfor
+
+    # Changing a result mustn't change what the cache hands out next time
+    sample_text = "A level - AAB including Mathematics"
+    changed = EntryRequirement.parse(sample_text)
+    changed.add_subject_requirement("Physics", "A")
+    changed.subject_requirements[0].grade = "E"
+    if EntryRequirement.parse(sample_text).to_dict() != legacy_parse(sample_text).to_dict():
+        differences += 1
+        print("A changed result leaked into the parse cache")
+    # endif
+
+    # Courses are parsed as Course.add_parsed_requirements does it: the snippets joined into one text
+    entry_requirement_module.parse_cache = ParseCache()
+    snippet_lists = build_snippet_lists(args.texts, args.seed)
+    course_differences = 0
+    for snippets in snippet_lists:
+        combined_text = " | ".join(snippets)
+        if EntryRequirement.parse(combined_text).to_dict() != legacy_parse(combined_text).to_dict():
+            course_differences += 1
+            if course_differences <= 5:
+                print(f"Course differs: {snippets!r}")
+            # endif
+        # endif
+    # endfor
+    course_stats = entry_requirement_module.parse_cache.stats()
+
+    long_texts = corpus[-3:]
+    legacy_long_rate, _ = time_parser(long_texts, legacy_parse, args.repeats)
+    new_long_rate, _ = time_parser(long_texts, uncached_parse, args.repeats)
+
+    print(f"{'old parse':18s} {legacy_rate:10.0f} texts/sec  {legacy_long_rate:8.0f} long texts/sec")
+    print(f"{'new parse':18s} {new_rate:10.0f} texts/sec  {new_long_rate:8.0f} long texts/sec  "
+          f"{new_rate / legacy_rate:5.2f}x  {new_long_rate / legacy_long_rate:5.2f}x on long texts")
+    print(f"{'new parse, cached':18s} {cached_rate:10.0f} texts/sec  {cached_rate / legacy_rate:27.2f}x  "
+          f"hit rate {cache_stats['hit_rate']:.1%} over {args.repeats} runs")
+    print(f"{len(snippet_lists)} courses parsed as the scraper does: hit rate {course_stats['hit_rate']:.1%} "
+          f"({course_stats['entries']} different requirement texts)")
+    if differences or course_differences:
+        print(f"OUTPUT DIFFERS on {differences} of {len(corpus)} texts "
+              f"and {course_differences} of {len(snippet_lists)} courses")
+        sys.exit(1)
+    # endif
+    print(f"same output on all {len(corpus)} texts and {len(snippet_lists)} courses")
+
+
+# enddef
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Compares the old way of parsing search results pages (a full html.parser tree) with the
+parser backend in html_parser.py (lxml when installed, and only the cards and pagination kept).
+Also checks that every variant finds exactly the same cards and pagination links.
+
+Usage: python3 benchmarks/bench_html_parser.py --pages 50
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import html_parser
+from fake_ucas_server import FakeUcasSettings, course_search_page, provider_page
+
+
+def read_listing(soup):
+    """
+    Pulls out what the scraper reads from a results page, so the variants can be compared.
+
+    :param soup: BeautifulSoup tree of the page
+    :return: (list of card tuples, list of pagination labels)
+    """
+    cards = []
+    for card in soup.find_all("div", class_="content__details"):
+        header = card.select_one("a.header")
+        name = card.select_one("p.header__text")
+        details = card.select_one("p.course-display__details")
+        tariff = card.select_one("p.course-display__tariff")
+        cards.append((
+            header.get("href") if header else None,
+            header.text if header else None,
+            name.text.strip() if name else None,
+            details.get_text(strip=True) if details else None,
+            tariff.text.strip() if tariff else None
+        ))
+    # endfor
+
+    labels = []
+    for page_list in soup.find_all("ul", class_="pagination__list"):
+        for link in page_list.find_all("a"):
+            labels.append(link.get("aria-label"))
+        # endfor
+    # endfor
+    return cards, labels
+
+
+# enddef
+
+def time_variant(pages, parse_function, repeats):
+    """
+    Times how long a parse function takes over all the pages.
+
+    :param pages: List of HTML strings
+    :param parse_function: Function that takes HTML and returns a soup
+    :param repeats: How many times to go over the pages
+    :return: (milliseconds per page, list of read_listing results)
+    """
+    results = []
+    started = time.perf_counter()
+    for _ in range(repeats):
+        results = []
+        for page in pages:
+            results.append(read_listing(parse_function(page)))
+        # endfor
+    # endfor
+    elapsed = time.perf_counter() - started
+    return elapsed * 1000 / (len(pages) * repeats), results
+
+
+# enddef
+
+
+def main() -> None:
+    """
+    Builds fake results pages, times every parser variant and checks they agree.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Benchmark listing page parsing")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--page-padding-kb", type=int, default=40)
+    args = parser.parse_args()
+
+    settings = FakeUcasSettings(universities=args.pages, courses_per_university=10,
+                                page_padding_kb=args.page_padding_kb)
+    pages = []
+    for index in range(args.pages):
+        if index % 2 == 0:
+            pages.append(provider_page(settings, 1))
+        else:
+            pages.append(course_search_page(settings, "http://127.0.0.1", settings.university_name(index), 1, "query="))
+        # endif
+    # endfor
+
+    strainer = SoupStrainer(class_=html_parser.is_listing_element)
+    variants = [("html.parser, full tree (old)", lambda page: BeautifulSoup(page, "html.parser")),
+                ("html.parser, cards only", lambda page: BeautifulSoup(page, "html.parser", parse_only=strainer))]
+    if html_parser.PARSER_BACKEND == "lxml":
+        variants.append(("lxml, full tree", lambda page: BeautifulSoup(page, "lxml")))
+        variants.append(("lxml, cards only", lambda page: BeautifulSoup(page, "lxml", parse_only=strainer)))
+    else:
+        print("lxml is not installed, only html.parser variants are timed")
+    # endif
+
+    average_kb = sum(len(page) for page in pages) / len(pages) / 1024
+    print(f"{len(pages)} pages, {average_kb:.0f} KB each on average, backend in use: {html_parser.PARSER_BACKEND}")
+
+    baseline_ms = None
+    baseline_results = None
+    for label, parse_function in variants:
+        ms_per_page, results = time_variant(pages, parse_function, args.repeats)
+        if baseline_ms is None:
+            baseline_ms = ms_per_page
+            baseline_results = results
+        # endif
+        same = "same output" if results == baseline_results else "OUTPUT DIFFERS"
+        print(f"{label:32s} {ms_per_page:8.2f} ms/page  {baseline_ms / ms_per_page:5.1f}x  {same}")
+    # endfor
+
+
+# enddef
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Checks the JSON-LD fast path in Course.parse_requirements against the full tree parse and times both.
+
+Every fake course page is parsed with use_json_ld=False (always build the tree) and with the fast
+path switched on. The two must give exactly the same Course, and the script shows how many pages
+the fast path handled and how long each way took. The fake pages write the course options the same
+way in the JSON-LD and on the page, so a hand written page whose JSON-LD writes them the schema.org
+way checks the fast path still takes them from the page. Two more hand written pages show grades
+in their accordion and table that differ from their JSON-LD, and the fast path must turn them down.
+
+Usage: python3 benchmarks/bench_json_ld.py --pages 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_ucas_server import FakeUcasSettings, course_detail_page
+from models.Course import Course
+from requirement_extractor import extract_json_ld_requirements
+
+# A page whose JSON-LD writes the course options differently from the options bar, like schema.org does
+MISMATCHED_JSON_LD_PAGE = (
+    '<html><head><script type="application/ld+json">{"@type": "Course", "educationalCredentialAwarded": "BSc",'
+    '"hasCourseInstance": [{"courseMode": "FullTime", "startDate": "2026-09-21", "location": {"name": "Main"},'
+    '"courseSchedule": {"duration": "P3Y"}}], "coursePrerequisites": ['
+    '{"educationalFramework": "A level", "targetName": "AAA"},'
+    '{"educationalFramework": "BTEC Extended Diploma", "targetName": "DDD"},'
+    '{"educationalFramework": "UCAS Tariff", "targetName": "144 points"}]}</script></head>'
+    '<body><div class="options-bar">'
+    '<div data-options-bar-item-value="BSc (Hons)"><span>Qualification</span></div>'
+    '<div data-options-bar-item-value="Full-time"><span>Study mode</span></div>'
+    '<div data-options-bar-item-value="September 2026"><span>Start date</span></div>'
+    '<div data-options-bar-item-value="Main Site"><span>Location</span></div>'
+    '<div data-options-bar-item-value="3 Years"><span>Duration</span></div>'
+    '</div><p>A level - AAA</p></body></html>'
+)
+
+# Pages whose accordion or table shows different grades from the JSON-LD (a range on the page, one
+# value in the JSON-LD). The full parse reads the page's text first, so the fast path can't be used
+DIFFERENT_GRADES_PAGES = [
+    '<html><head><script type="application/ld+json">{"@type": "Course", "coursePrerequisites": ['
+    '{"educationalFramework": "A level", "targetName": "AAB"},'
+    '{"educationalFramework": "BTEC Extended Diploma", "targetName": "DDD"},'
+    '{"educationalFramework": "UCAS Tariff", "targetName": "136 points"}]}</script></head>'
+    '<body><ul class="accordion"><li class="accordion__child"><h2 class="accordion__label">A level</h2>'
+    '<div class="accordion__inner-wrapper"><p>A level - BBB - AAB</p></div></li></ul></body></html>',
+    '<html><head><script type="application/ld+json">{"@type": "Course", "coursePrerequisites": ['
+    '{"educationalFramework": "A level", "targetName": "AAB"},'
+    '{"educationalFramework": "BTEC Extended Diploma", "targetName": "DDD"},'
+    '{"educationalFramework": "UCAS Tariff", "targetName": "136 points"}]}</script></head>'
+    '<body><dl class="entry-grades"><dt>A level</dt><dd>ABB</dd></dl>'
+    '<p>UCAS Tariff - 128 - 136 points</p></body></html>'
+]
+
+
+def parse_pages(pages, use_json_ld, repeats):
+    """
+    Parses every page into a Course and times it.
+
+    :param pages: List of HTML strings
+    :param use_json_ld: Whether to try the JSON-LD fast path first
+    :param repeats: How many times to go over the pages
+    :return: (milliseconds per page, list of course dictionaries)
+    """
+    results = []
+    started = time.perf_counter()
+    for _ in range(repeats):
+        results = []
+        for page in pages:
+            course = Course()
+            course.parse_requirements(page, use_json_ld=use_json_ld)
+            results.append(course.to_dict())
+        # endfor
+    # endfor
+    elapsed = time.perf_counter() - started
+    return elapsed * 1000 / (len(pages) * repeats), results
+
+
+# enddef
+
+
+def main() -> None:
+    """
+    Builds fake course pages, checks the fast path gives the same courses as the full parse and times both.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the JSON-LD fast path for course pages")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--page-padding-kb", type=int, default=40)
+    args = parser.parse_args()
+
+    courses_per_university = 20
+    settings = FakeUcasSettings(universities=args.pages // courses_per_university + 1,
+                                courses_per_university=courses_per_university,
+                                page_padding_kb=args.page_padding_kb)
+    pages = [MISMATCHED_JSON_LD_PAGE] + DIFFERENT_GRADES_PAGES
+    for index in range(args.pages):
+        pages.append(course_detail_page(settings, index // courses_per_university, index % courses_per_university))
+    # endfor
+
+    fast_pages = []
+    differences = 0
+    for page in pages:
+        if extract_json_ld_requirements(page) is not None:
+            fast_pages.append(page)
+            if page in DIFFERENT_GRADES_PAGES:
+                differences += 1
+                print(f"Page {pages.index(page)} shows different grades from its JSON-LD but used the fast path")
+            # endif
+        # endif
+    # endfor
+
+    average_kb = sum(len(page) for page in pages) / len(pages) / 1024
+    print(f"{len(pages)} pages, {average_kb:.0f} KB each on average, "
+          f"{len(fast_pages)} handled by the JSON-LD fast path")
+
+    tree_ms, tree_results = parse_pages(pages, False, args.repeats)
+    fast_ms, fast_results = parse_pages(pages, True, args.repeats)
+
+    for index, (tree_course, fast_course) in enumerate(zip(tree_results, fast_results)):
+        if tree_course != fast_course:
+            differences += 1
+            print(f"Page {index} differs:")
+            print(f"  tree:    {json.dumps(tree_course)}")
+            print(f"  JSON-LD: {json.dumps(fast_course)}")
+        # endif
+    # endfor
+
+    print(f"{'full tree parse':24s} {tree_ms:8.3f} ms/page")
+    print(f"{'JSON-LD fast path':24s} {fast_ms:8.3f} ms/page  {tree_ms / fast_ms:6.1f}x")
+    if fast_pages:
+        fast_only_ms, _ = parse_pages(fast_pages, True, args.repeats)
+        tree_only_ms, _ = parse_pages(fast_pages, False, args.repeats)
+        print(f"{'  pages with full JSON-LD':24s} {fast_only_ms:8.3f} ms/page  {tree_only_ms / fast_only_ms:6.1f}x "
+              f"(full tree parse {tree_only_ms:.3f} ms/page)")
+    # endif
+    if differences:
+        print(f"OUTPUT DIFFERS on {differences} of {len(pages)} pages")
+        sys.exit(1)
+    # endif
+    print(f"same output on all {len(pages)} pages")
+
+
+# enddef
+
+
+if __name__ == "__main__":
+    main()
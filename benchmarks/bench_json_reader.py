@@ -0,0 +1,128 @@
+"""
+Benchmark for the incremental reader in JSONReader.py.
+
+The old way of reading universities.json (json.loads(path.read_text()), as generate_unis_without_requirements.py
+did) holds the whole text and every decoded university in memory at once. The script saves synthetic
+universities, then summarises every university the old way, with iter_universities using the summary index
+and with iter_universities decoding the list a chunk at a time (index deleted). It checks all three give the
+same summaries and reports time and peak memory.
+
+Usage: python3 benchmarks/bench_json_reader.py --universities 2000 --courses 30
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from JSONReader import iter_universities
+from JSONWriter import write_universities
+from bench_json_writer import UNUSUAL_NAMES, measure
+from bench_progress_journal import make_universities
+from university_index import index_path, summarise_university
+
+
+def legacy_summaries(path):
+    """
+    Summarises every university after loading the whole file the old way.
+
+    :param path: JSON file path
+    :return: List of summaries
+    """
+    data = json.loads(Path(path).read_text())
+    return [summarise_university(uni) for uni in data]
+
+
+# enddef
+
+def reader_summaries(path):
+    """
+    Summarises every university read one at a time with iter_universities.
+
+    :param path: JSON file path
+    :return: List of summaries
+    """
+    return [summarise_university(uni) for uni in iter_universities(path)]
+
+
+# enddef
+
+def main():
+    """
+    Reads the file every way, checks the summaries and prints the results.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Compare loading universities.json whole with the incremental reader")
+    parser.add_argument("--universities", type=int, default=2000)
+    parser.add_argument("--courses", type=int, default=30, help="courses per university")
+    args = parser.parse_args()
+
+    universities = make_universities(args.universities, args.courses)
+    for index, name in enumerate(UNUSUAL_NAMES):
+        if index < len(universities):
+            universities[index]["name"] = name
+        # endif
+    # endfor
+
+    work_dir = tempfile.mkdtemp(prefix="bench_json_reader_")
+    failed = False
+    try:
+        indexed_path = os.path.join(work_dir, "indexed.json")
+        write_universities(indexed_path, universities)
+        plain_path = os.path.join(work_dir, "plain.json")
+        shutil.copyfile(indexed_path, plain_path)
+        universities = None
+
+        variants = [
+            ("json.loads whole file", lambda: legacy_summaries(plain_path)),
+            ("reader, with index", lambda: reader_summaries(indexed_path)),
+            ("reader, no index", lambda: reader_summaries(plain_path))
+        ]
+
+        file_mb = os.path.getsize(indexed_path) / 1024 / 1024
+        print(f"{args.universities} universities x {args.courses} courses, {file_mb:.1f} MB file")
+        print(f"{'reader':24s} {'seconds':>8s} {'peak MB':>8s}  check")
+        expected = None
+        for label, read_function in variants:
+            summaries = []
+            seconds, peak_mb = measure(lambda: summaries.extend(read_function()))
+
+            # Summaries from the index include the hash and position, which aren't compared
+            for summary in summaries:
+                for key in ("hash", "offset", "length"):
+                    summary.pop(key, None)
+                # endfor
+            # endfor
+
+            if expected is None:
+                expected = summaries
+                check = "-"
+            else:
+                same = summaries == expected
+                check = "same summaries" if same else "DIFFERENT SUMMARIES"
+                failed = failed or not same
+            # endif
+            print(f"{label:24s} {seconds:8.2f} {peak_mb:8.1f}  {check}")
+        # endfor
+        print(f"(the index is {os.path.getsize(index_path(indexed_path)) / 1024:.0f} KB)")
+    finally:
+        shutil.rmtree(work_dir)
+    # endtry
+
+    if failed:
+        sys.exit(1)
+    # endif
+
+
+# enddef
+
+if __name__ == "__main__":
+    main()
+# endif
@@ -0,0 +1,158 @@
+"""
+Benchmark for the streaming JSON writer in JSONWriter.py.
+
+The old save_json is kept below word for word: it builds the whole list of dictionaries and then
+calls json.dump(..., indent=2). The script saves the same synthetic universities (a few with
+accented names and emoji) the old way, with the streaming writer using the json module, with orjson
+if it is installed, and in compact mode. It checks the pretty files are byte for byte the same as
+the old one and that the compact file loads back to the same data, and reports time and peak memory.
+
+Usage: python3 benchmarks/bench_json_writer.py --universities 2000 --courses 30
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import JSONWriter
+from JSONWriter import write_universities
+from bench_progress_journal import make_universities
+from models.University import University
+
+# Names json.dump has to escape
+UNUSUAL_NAMES = ["Université de Café", "Ysgol Gelf Caerdydd – Cymru", "Emoji University \U0001F393", "Tab\tand\x7f"]
+
+
+def legacy_save_json(universities: [University], path):
+    """
+    Saves universities as JSON file.
+
+    :param universities: List of University objects to save
+    :param path: JSON file path to write
+    :return: None
+    """
+
+    university_json: [dict] = []
+
+    for uni in universities:
+        university_json.append(uni.to_dict())
+    # endfor
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(university_json, f, indent=2)
+    # endwith
+
+
+# enddef
+
+def measure(save_function):
+    """
+    Runs one save and measures how long it took and the most memory it allocated.
+
+    :param save_function: Function with no arguments that saves the file
+    :return: (seconds, peak MB)
+    """
+    tracemalloc.start()
+    started = time.perf_counter()
+    save_function()
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 1024 / 1024
+
+
+# enddef
+
+def main():
+    """
+    Saves the universities every way, checks the files and prints the results.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Compare the old save_json with the streaming JSON writer")
+    parser.add_argument("--universities", type=int, default=2000)
+    parser.add_argument("--courses", type=int, default=30, help="courses per university")
+    args = parser.parse_args()
+
+    university_dicts = make_universities(args.universities, args.courses)
+    for index, name in enumerate(UNUSUAL_NAMES):
+        if index < len(university_dicts):
+            university_dicts[index]["name"] = name
+            university_dicts[index]["courses"][0]["name"] = name
+        # endif
+    # endfor
+    universities = [University.from_dict(uni) for uni in university_dicts]
+
+    orjson_module = JSONWriter.orjson
+    work_dir = tempfile.mkdtemp(prefix="bench_json_writer_")
+    failed = False
+    try:
+        legacy_path = os.path.join(work_dir, "legacy.json")
+        variants = [("old save_json", legacy_path, lambda: legacy_save_json(universities, legacy_path))]
+
+        json_path = os.path.join(work_dir, "stream_json.json")
+        variants.append(("streaming, json module", json_path, None))
+        if orjson_module is not None:
+            orjson_path = os.path.join(work_dir, "stream_orjson.json")
+            variants.append(("streaming, orjson", orjson_path, None))
+        # endif
+        compact_path = os.path.join(work_dir, "compact.json")
+        variants.append(("streaming, compact", compact_path, None))
+
+        print(f"{args.universities} universities x {args.courses} courses")
+        print(f"{'writer':26s} {'seconds':>8s} {'peak MB':>8s} {'file MB':>8s}  check")
+        legacy_bytes = b""
+        for label, path, save_function in variants:
+            # Pick the backend for the streaming variants
+            if label == "streaming, json module":
+                JSONWriter.orjson = None
+            else:
+                JSONWriter.orjson = orjson_module
+            # endif
+            if save_function is None:
+                compact = label == "streaming, compact"
+                save_function = lambda p=path, c=compact: write_universities(p, universities, compact=c)
+            # endif
+
+            seconds, peak_mb = measure(save_function)
+            with open(path, "rb") as f:
+                written = f.read()
+            # endwith
+
+            if label == "old save_json":
+                legacy_bytes = written
+                check = "-"
+            elif label == "streaming, compact":
+                same = json.loads(written) == json.loads(legacy_bytes)
+                check = "same data" if same else "DIFFERENT DATA"
+                failed = failed or not same
+            else:
+                same = written == legacy_bytes
+                check = "identical bytes" if same else "DIFFERENT BYTES"
+                failed = failed or not same
+            # endif
+            print(f"{label:26s} {seconds:8.2f} {peak_mb:8.1f} {len(written) / 1024 / 1024:8.1f}  {check}")
+        # endfor
+        JSONWriter.orjson = orjson_module
+    finally:
+        shutil.rmtree(work_dir)
+    # endtry
+
+    if failed:
+        sys.exit(1)
+    # endif
+
+
+# enddef
+
+if __name__ == "__main__":
+    main()
+# endif
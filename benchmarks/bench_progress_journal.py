@@ -0,0 +1,303 @@
+"""
+Benchmark for saving crawl progress: the old way (replace the university in the list and rewrite
+the whole of universities.json after every university) against the append-only ProgressJournal.
+
+The old functions are kept below word for word. Both are run over the same synthetic universities,
+then the script checks the compacted universities.json is byte for byte the same as the old one,
+and that resuming from a journal that was never compacted (as after a crash) gives the same data.
+
+The old way rewrites a file that keeps growing, so its total cost is quadratic. When there are more
+universities than --legacy-limit, it is only timed at a sample of sizes and the total is estimated.
+
+Usage: python3 benchmarks/bench_progress_journal.py --universities 1000 10000
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from progress_journal import ProgressJournal
+from university_index import summarise_university
+
+SUBJECTS = ["Computer Science", "History", "Law", "Medicine", "Mathematics", "English Literature", "Physics"]
+GRADES = ["A*AA", "AAA", "AAB", "ABB", "BBB", "BBC", "BCC-BBB"]
+
+
+def legacy_replace_university(existing_data: list[dict], university_dict: dict) -> list[dict]:
+    """
+    Replaces an existing university entry with the same name, or appends if new.
+
+    :param existing_data: Existing list of university dictionaries
+    :param university_dict: New university dictionary
+    :return: Updated list of university dictionaries
+    """
+    name_value = university_dict.get("name")
+    if name_value is None:
+        name_value = ""
+    # endif
+    target_name = name_value.strip()
+    if not target_name:
+        return existing_data
+    # endif
+
+    updated = []
+    for item in existing_data:
+        if not isinstance(item, dict):
+            updated.append(item)
+            continue
+        # endif
+        item_name_value = item.get("name")
+        if item_name_value is None:
+            item_name_value = ""
+        # endif
+        item_name = item_name_value.strip()
+        if item_name == target_name:
+            continue
+        # endif
+        updated.append(item)
+    # endfor
+
+    updated.append(university_dict)
+    return updated
+
+
+# enddef
+
+def legacy_save_progress(path: str, data: list[dict]) -> None:
+    """
+    Saves scraped data to disk for resume support.
+
+    :param path: JSON file path to save
+    :param data: List of university dictionaries
+    :return: None
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    # endwith
+
+
+# enddef
+
+def make_universities(count, courses_per_university, seed=1):
+    """
+    Makes synthetic university dictionaries shaped like University.to_dict.
+
+    :param count: Number of universities
+    :param courses_per_university: Courses in each university
+    :param seed: Random seed so runs are repeatable
+    :return: List of university dictionaries
+    """
+    rng = random.Random(seed)
+    universities = []
+    for uni_index in range(count):
+        courses = []
+        for course_index in range(courses_per_university):
+            grades = rng.choice(GRADES)
+            courses.append({
+                "name": f"{rng.choice(SUBJECTS)} {course_index}",
+                "course_type": "BSc (Hons)",
+                "duration": "3 years",
+                "mode": "Full-time",
+                "location": "Main Site",
+                "start_date": "September 2026",
+                "link": f"https://www.ucas.com/explore/courses/{uni_index}/{course_index}",
+                "requirements": [{
+                    "min_ucas_points": rng.choice([96, 112, 128, 144]),
+                    "min_grade_required": grades[-1],
+                    "subject_requirements": [{"subject": rng.choice(SUBJECTS), "grade": "A"}],
+                    "display_grades": grades,
+                    "btec_grades": "DDM",
+                    "accepts_ucas": True,
+                    "has_requirements": True
+                }],
+                "fingerprint": f"{rng.getrandbits(160):040x}",
+                "fetched_at": 1790000000 + uni_index * courses_per_university + course_index
+            })
+        # endfor
+        universities.append({
+            "name": f"University {uni_index}",
+            "location": "Somewhere",
+            "link": f"https://www.ucas.com/explore/unis/{uni_index}",
+            "link_all_courses": f"https://www.ucas.com/explore/search/courses?university={uni_index}",
+            "courses": courses
+        })
+    # endfor
+    return universities
+
+
+# enddef
+
+def time_legacy(universities, work_dir, legacy_limit):
+    """
+    Times saving progress the old way after every university.
+
+    :param universities: List of university dictionaries
+    :param work_dir: Folder to write into
+    :param legacy_limit: Above this many universities only a sample of saves is timed
+    :return: (seconds, True if the time was estimated from samples, path of the final file)
+    """
+    path = os.path.join(work_dir, "legacy.json")
+
+    if len(universities) <= legacy_limit:
+        existing_data = []
+        started = time.perf_counter()
+        for university_dict in universities:
+            existing_data = legacy_replace_university(existing_data, university_dict)
+            legacy_save_progress(path, existing_data)
+        # endfor
+        return time.perf_counter() - started, False, path
+    # endif
+
+    # Time one save at a few sizes and add up the cost of every save in between
+    sample_sizes = []
+    for step in range(1, 11):
+        sample_sizes.append(len(universities) * step // 10)
+    # endfor
+
+    sample_seconds = []
+    for size in sample_sizes:
+        existing_data = universities[:size - 1]
+        started = time.perf_counter()
+        existing_data = legacy_replace_university(existing_data, universities[size - 1])
+        legacy_save_progress(path, existing_data)
+        sample_seconds.append(time.perf_counter() - started)
+    # endfor
+
+    total = 0.0
+    previous_size = 0
+    previous_seconds = 0.0
+    for size, seconds in zip(sample_sizes, sample_seconds):
+        total += (size - previous_size) * (previous_seconds + seconds) / 2
+        previous_size = size
+        previous_seconds = seconds
+    # endfor
+    return total, True, path
+
+
+# enddef
+
+def time_journal(universities, work_dir, compact_interval):
+    """
+    Times saving progress with the journal after every university, including the final compaction.
+
+    :param universities: List of university dictionaries
+    :param work_dir: Folder to write into
+    :param compact_interval: Seconds between compactions
+    :return: (seconds, path of the final file)
+    """
+    path = os.path.join(work_dir, "journal.json")
+    started = time.perf_counter()
+    journal = ProgressJournal(path, compact_interval=compact_interval)
+    journal.load()
+    for university_dict in universities:
+        journal.append(university_dict)
+    # endfor
+    journal.close()
+    return time.perf_counter() - started, path
+
+
+# enddef
+
+def check_resume(universities, work_dir):
+    """
+    Appends everything without compacting (as if the crawl was killed), then resumes from the journal.
+
+    :param universities: List of university dictionaries
+    :param work_dir: Folder to write into
+    :return: (True if the resumed data matches, seconds taken to resume)
+    """
+    path = os.path.join(work_dir, "crashed.json")
+    journal = ProgressJournal(path, compact_interval=0)
+    journal.load()
+    for university_dict in universities:
+        journal.append(university_dict)
+    # endfor
+
+    # Half a record at the end, as if the crawl died while writing it
+    with open(journal.journal_path, "ab") as f:
+        f.write(b'{"name": "Half writ')
+    # endwith
+
+    started = time.perf_counter()
+    resumed = ProgressJournal(path, compact_interval=0)
+    summaries = resumed.load()
+    seconds = time.perf_counter() - started
+    resumed.close()
+
+    # Resuming only hands back summaries, the full records are checked in the compacted file
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    # endwith
+    expected_summaries = [summarise_university(uni) for uni in universities]
+    return summaries == expected_summaries and data == universities, seconds
+
+
+# enddef
+
+def main():
+    """
+    Runs the benchmark for each size given on the command line.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Compare rewriting universities.json with the progress journal")
+    parser.add_argument("--universities", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--courses", type=int, default=10, help="courses per university")
+    parser.add_argument("--compact-interval", type=float, default=600, help="seconds between compactions")
+    parser.add_argument("--legacy-limit", type=int, default=2000,
+                        help="above this many universities the old way is estimated from samples")
+    args = parser.parse_args()
+
+    print(f"{'universities':>12s} {'old (s)':>10s} {'journal (s)':>12s} {'speedup':>8s} {'resume (s)':>11s}  checks")
+    failed = False
+    for count in args.universities:
+        universities = make_universities(count, args.courses)
+        work_dir = tempfile.mkdtemp(prefix="bench_journal_")
+        try:
+            legacy_seconds, estimated, legacy_path = time_legacy(universities, work_dir, args.legacy_limit)
+            journal_seconds, journal_path = time_journal(universities, work_dir, args.compact_interval)
+
+            if estimated:
+                # Only part of the old file was written, so compare with a full save of the same list
+                legacy_save_progress(legacy_path, universities)
+            # endif
+            with open(legacy_path, "rb") as f:
+                legacy_bytes = f.read()
+            # endwith
+            with open(journal_path, "rb") as f:
+                journal_bytes = f.read()
+            # endwith
+            same_output = legacy_bytes == journal_bytes
+            resume_ok, resume_seconds = check_resume(universities, work_dir)
+        finally:
+            shutil.rmtree(work_dir)
+        # endtry
+
+        checks = ("output identical" if same_output else "OUTPUT DIFFERS") + ", " + \
+                 ("resume ok" if resume_ok else "RESUME DIFFERS")
+        legacy_text = f"{'~' if estimated else ''}{legacy_seconds:.2f}"
+        print(f"{count:12d} {legacy_text:>10s} {journal_seconds:12.2f} {legacy_seconds / journal_seconds:7.1f}x "
+              f"{resume_seconds:11.2f}  {checks}")
+        if not same_output or not resume_ok:
+            failed = True
+        # endif
+    # endfor
+
+    print("(~ means the old way was timed at 10 sizes and the total estimated)")
+    if failed:
+        sys.exit(1)
+    # endif
+
+
+# enddef
+
+if __name__ == "__main__":
+    main()
+# endif
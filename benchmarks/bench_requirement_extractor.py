@@ -0,0 +1,407 @@
+"""
+Differential check and benchmark for the single-pass requirement extractor.
+
+legacy_parse_requirements below is the old Course.parse_requirements, kept word for word
+(apart from self -> course), which walked the whole soup once per kind of snippet. The benchmark
+parses every course page both ways, checks that the resulting Course records are identical,
+and times the two.
+
+Usage: python3 benchmarks/bench_requirement_extractor.py --pages 200
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_ucas_server import FakeUcasSettings, course_detail_page
+from html_parser import make_soup
+from models.Course import Course
+from models.EntryRequirement import EntryRequirement
+
+
+def legacy_parse_requirements(course, page_html):
+    """
+    The old multi-pass version of Course.parse_requirements.
+
+    :param course: Course object to fill in
+    :param page_html: HTML text of the course page
+    :return: None
+    """
+    single_course_soup = make_soup(page_html)
+
+    # Look for course options information in different places
+    # Check for the options bar with course details
+    options_bar = single_course_soup.find("div", class_="options-bar")
+    if not options_bar:
+        options_bar = single_course_soup.find("div", class_="options-bar-custom")
+
+    if options_bar:
+        # Extract course details from data-options-bar-item-value attributes
+        # Find all elements that have the data-options-bar-item-value attribute
+        all_elements = options_bar.find_all()
+        elements_with_values = []
+        for element in all_elements:
+            if element.has_attr("data-options-bar-item-value"):
+                elements_with_values.append(element)
+            # endif
+        # endfor
+
+        if elements_with_values:
+            for elem in elements_with_values:
+                value = elem.get("data-options-bar-item-value", "")
+                label_text = elem.get_text(strip=True).lower()
+
+                # Map the values to course fields based on label
+                if "qualification" in label_text:
+                    course.course_type = value
+                elif "location" in label_text:
+                    course.location = value
+                elif "start" in label_text:
+                    course.start_date = value
+                elif "study mode" in label_text or "mode" in label_text:
+                    course.mode = value
+                elif "duration" in label_text:
+                    course.duration = value
+                # endif
+            # endfor
+        # endif
+
+    # Check if there's a course options table (for courses with multiple options)
+    course_options_table = single_course_soup.find("table")
+    if course_options_table:
+        # Extract course details from the first row in the table
+        tbody = course_options_table.find("tbody")
+        if tbody:
+            first_row = tbody.find("tr")
+            if first_row:
+                tds = first_row.find_all("td")
+
+                # Different table structures based on number of columns
+                if len(tds) >= 5:  # Standard table with at least 5 columns
+                    # Extract details from table columns
+                    # Column 0: Location
+                    course.location = tds[0].get_text(strip=True)
+
+                    # Column 1: Qualification
+                    qual_div = tds[1].find("strong")
+                    if qual_div:
+                        course.course_type = qual_div.get_text(strip=True)
+                    else:
+                        # Try getting text directly if no strong tag
+                        course.course_type = tds[1].get_text(strip=True)
+                    # endif
+
+                    # Column 2: Study mode
+                    course.mode = tds[2].get_text(strip=True)
+
+                    # Column 3: Duration
+                    course.duration = tds[3].get_text(strip=True)
+
+                    # Column 4: Start date
+                    course.start_date = tds[4].get_text(strip=True)
+                # endif
+            # endif
+        # endif
+    # endif
+
+    # Try multiple selectors for entry requirements
+    requirement_texts = []
+
+    # Look for accordion labels AND their detailed content (common on UCAS)
+    accordion_labels = single_course_soup.find_all("h2", class_="accordion__label")
+    for label in accordion_labels:
+        # Check if any of the qualifications are in the label text
+        found_qual = False
+        for qual in ["A level", "UCAS", "BTEC"]:
+            if qual in label.text:
+                found_qual = True
+                break
+            # endif
+        # endfor
+        if found_qual:
+            # Add the label text
+            requirement_texts.append(label.text.strip())
+
+            # Also try to get the detailed content from the accordion
+            # Find the parent accordion item
+            accordion_item = label.find_parent("li", class_="accordion__child")
+            if accordion_item:
+                # Look for the accordion content div
+                content_div = accordion_item.find("div", class_="accordion__inner-wrapper")
+                if content_div:
+                    detailed_text = content_div.get_text(strip=True)
+                    if detailed_text and len(detailed_text) < 1000:  # Reasonable length
+                        requirement_texts.append(detailed_text)
+                        # print(f"Found detailed accordion content: {detailed_text[:150]}...")
+                    # endif
+                # endif
+            # endif
+        # endif
+    # endfor
+
+    # Look for requirement sections
+    # Find sections with class names containing requirement words
+    all_divs = single_course_soup.find_all("div")
+    req_sections = []
+    for div in all_divs:
+        if div.has_attr("class"):
+            class_names = div.get("class", [])
+            for class_name in class_names:
+                class_name_lower = class_name.lower()
+                if ("requirement" in class_name_lower or
+                        "entry" in class_name_lower or
+                        "qualification" in class_name_lower):
+                    req_sections.append(div)
+                    break
+                # endif
+            # endfor
+        # endif
+    # endfor
+
+    for section in req_sections:
+        text = section.get_text(strip=True)
+        if text and len(text) < 1500:  # Skip really long text
+            requirement_texts.append(text)
+        # endif
+    # endfor
+
+    # Capture requirement tables where labels and grades are in separate cells
+    for row in single_course_soup.find_all("tr"):
+        cells = row.find_all(["th", "td"])
+        if len(cells) < 2:
+            continue
+        # endif
+        left_text = cells[0].get_text(" ", strip=True)
+        right_text = cells[1].get_text(" ", strip=True)
+        if not left_text or not right_text:
+            continue
+        # endif
+        if re.search(r"A\s*[-–]?\s*levels?|UCAS\s*Tariff|BTEC", left_text, re.IGNORECASE):
+            combined_row = f"{left_text} {right_text}"
+            if len(combined_row) < 500:
+                requirement_texts.append(combined_row)
+            # endif
+        # endif
+    # endfor
+
+    # Capture definition lists (dt/dd pairs) for entry requirements
+    for dl in single_course_soup.find_all("dl"):
+        dts = dl.find_all("dt")
+        dds = dl.find_all("dd")
+        for dt, dd in zip(dts, dds):
+            left_text = dt.get_text(" ", strip=True)
+            right_text = dd.get_text(" ", strip=True)
+            if not left_text or not right_text:
+                continue
+            # endif
+            if re.search(r"A\s*[-–]?\s*levels?|UCAS\s*Tariff|BTEC", left_text, re.IGNORECASE):
+                combined_pair = f"{left_text} {right_text}"
+                if len(combined_pair) < 500:
+                    requirement_texts.append(combined_pair)
+                # endif
+            # endif
+        # endfor
+    # endfor
+
+    # Fallback: grab nearby text around key requirement keywords
+    keyword_pattern = re.compile(r"A\s*[-–]?\s*levels?|UCAS\s*Tariff|BTEC", re.IGNORECASE)
+    for text_node in single_course_soup.find_all(string=keyword_pattern):
+        parent = text_node.parent
+        if not parent:
+            continue
+        # endif
+        candidate = parent.get_text(" ", strip=True)
+        if candidate and len(candidate) < 500:
+            requirement_texts.append(candidate)
+        # endif
+    # endfor
+
+    # JSON-LD fallback (UCAS often embeds structured requirements here)
+    json_ld_requirements = []
+    for script in single_course_soup.find_all("script", type="application/ld+json"):
+        raw = script.string
+        if not raw:
+            continue
+        # endif
+        try:
+            data = json.loads(raw)
+        except Exception:
+            continue
+        # endtry
+
+        items = data if isinstance(data, list) else [data]
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            # endif
+            if item.get("@type") != "Course":
+                continue
+            # endif
+            prereqs = item.get("coursePrerequisites") or []
+            if not isinstance(prereqs, list):
+                continue
+            # endif
+            for prereq in prereqs:
+                if not isinstance(prereq, dict):
+                    continue
+                # endif
+                framework = prereq.get("educationalFramework") or ""
+                target = prereq.get("targetName") or ""
+                if not framework or not target:
+                    continue
+                # endif
+                framework_lower = framework.lower()
+                if "a level" in framework_lower:
+                    json_ld_requirements.append(f"A level - {target}")
+                elif "btec" in framework_lower:
+                    json_ld_requirements.append(f"BTEC - {target}")
+                elif "ucas tariff" in framework_lower:
+                    json_ld_requirements.append(f"UCAS Tariff - {target}")
+                # endif
+            # endfor
+        # endfor
+    # endfor
+
+    if json_ld_requirements:
+        requirement_texts.extend(json_ld_requirements)
+
+    # Parse all requirement texts and combine into one requirement
+    if requirement_texts:
+        # Combine all requirement texts into one string
+        combined_text = " | ".join(requirement_texts)
+
+        try:
+            parsed_req = EntryRequirement.parse(combined_text)
+            # Only add if there are actual requirements
+            if parsed_req.has_requirements:
+                course.requirements.append(parsed_req)
+            # endif
+        except Exception as e:
+            print(f"Error parsing requirements: {e}")
+            # Don't add any requirements if parsing fails
+        # endtry
+    # endif
+
+    # Clean up requirements - remove any empty ones if we have real ones
+    course.clean_up_requirements()
+
+
+# enddef
+
+# Hand written pages for structures the fake course pages don't have
+EDGE_PAGES = [
+    # Definition list, custom options bar and a keyword inside a comment
+    '<html><body><div class="options-bar-custom"><div data-options-bar-item-value="BA (Hons)">'
+    '<span>Qualification</span></div></div><!-- A level grades are below -->'
+    '<dl><dt>A levels</dt><dd>ABB including History</dd><dt>BTEC</dt><dd>DDM</dd>'
+    '<dt>Interview</dt><dd>Yes</dd></dl></body></html>',
+    # The same requirement repeated in many places
+    '<html><body><div class="entry-requirements"><p>A level - AAA</p><p>A level - AAA</p></div>'
+    '<div class="qualification-box"><p>A level - AAA</p></div>'
+    '<table><tr><th>A-level</th><td>AAA</td></tr><tr><th>A-level</th><td>AAA</td></tr></table>'
+    '<p>UCAS Tariff 144 points</p><p>UCAS Tariff 144 points</p></body></html>',
+    # JSON-LD only, as a list, with an unknown framework and a broken script
+    '<html><head><script type="application/ld+json">[{"@type": "Course", "coursePrerequisites": ['
+    '{"educationalFramework": "A level", "targetName": "BBB"},'
+    '{"educationalFramework": "IB", "targetName": "32 points"}]}]</script>'
+    '<script type="application/ld+json">{not json</script></head><body><p>Nothing here</p></body></html>',
+    # No requirements at all
+    '<html><body><h1>Foundation Year</h1><p>Contact the university for details.</p></body></html>'
+]
+
+
+def parse_pages(pages, parse_function, repeats):
+    """
+    Parses every page into a Course and times it.
+
+    :param pages: List of HTML strings
+    :param parse_function: Function that takes a Course and HTML and fills the Course in
+    :param repeats: How many times to go over the pages
+    :return: (milliseconds per page, list of course dictionaries)
+    """
+    results = []
+    started = time.perf_counter()
+    for _ in range(repeats):
+        results = []
+        for page in pages:
+            course = Course()
+            parse_function(course, page)
+            results.append(course.to_dict())
+        # endfor
+    # endfor
+    elapsed = time.perf_counter() - started
+    return elapsed * 1000 / (len(pages) * repeats), results
+
+
+# enddef
+
+
+def main() -> None:
+    """
+    Builds fake course pages, checks the old and new parse give the same courses and times both.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Benchmark course page requirement extraction")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--page-padding-kb", type=int, default=40)
+    args = parser.parse_args()
+
+    courses_per_university = 20
+    settings = FakeUcasSettings(universities=args.pages // courses_per_university + 1,
+                                courses_per_university=courses_per_university,
+                                page_padding_kb=args.page_padding_kb)
+    pages = list(EDGE_PAGES)
+    for index in range(args.pages):
+        pages.append(course_detail_page(settings, index // courses_per_university, index % courses_per_university))
+    # endfor
+
+    average_kb = sum(len(page) for page in pages) / len(pages) / 1024
+    print(f"{len(pages)} pages, {average_kb:.0f} KB each on average")
+
+    legacy_ms, legacy_results = parse_pages(pages, legacy_parse_requirements, args.repeats)
+    new_ms, new_results = parse_pages(pages, lambda course, page: course.parse_requirements(page, use_json_ld=False),
+                                  args.repeats)
+
+    differences = 0
+    for index, (legacy_course, new_course) in enumerate(zip(legacy_results, new_results)):
+        if legacy_course != new_course:
+            differences += 1
+            print(f"Page {index} differs:")
+            print(f"  old: {json.dumps(legacy_course)}")
+            print(f"  new: {json.dumps(new_course)}")
+        # endif
+    # endfor
+
+    # Both versions build the same tree first, so time that on its own to show the search cost
+    started = time.perf_counter()
+    for _ in range(args.repeats):
+        for page in pages:
+            make_soup(page)
+        # endfor
+    # endfor
+    tree_ms = (time.perf_counter() - started) * 1000 / (len(pages) * args.repeats)
+
+    print(f"{'building the tree':20s} {tree_ms:8.2f} ms/page (same for both)")
+    print(f"{'multi-pass (old)':20s} {legacy_ms:8.2f} ms/page  {legacy_ms - tree_ms:6.2f} ms/page after the tree")
+    print(f"{'single pass':20s} {new_ms:8.2f} ms/page  {new_ms - tree_ms:6.2f} ms/page after the tree  "
+          f"{legacy_ms / new_ms:5.2f}x overall  {(legacy_ms - tree_ms) / max(new_ms - tree_ms, 0.001):5.2f}x after the tree")
+    if differences:
+        print(f"OUTPUT DIFFERS on {differences} of {len(pages)} pages")
+        sys.exit(1)
+    # endif
+    print(f"same output on all {len(pages)} pages")
+
+
+# enddef
+
+
+if __name__ == "__main__":
+    main()
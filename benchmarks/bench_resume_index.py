@@ -0,0 +1,238 @@
+"""
+Benchmark for resuming a crawl and for generate_unis_without_requirements.py with the summary index.
+
+The old load_existing_universities from scraper.py is kept below word for word: it parses the whole
+of universities.json and walks every course. The script saves synthetic universities with
+write_universities (which writes universities.json.index as well), then times:
+  - the old resume against ProgressJournal.load, which only reads the index
+  - generate_unis_without_requirements.py with the index and with the index deleted
+and checks both ways give the same names and counts.
+
+Usage: python3 benchmarks/bench_resume_index.py --universities 2000 10000 --courses 30
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_unis_without_requirements
+from JSONWriter import write_universities
+from bench_progress_journal import make_universities
+from progress_journal import ProgressJournal
+from university_index import index_path
+
+
+def legacy_load_existing_universities(path: str) -> tuple[list[dict], set[str], int, int]:
+    """
+    Loads existing university data to enable resume behavior.
+
+    :param path: JSON file path to load
+    :return: (existing_data, existing_names, count_with_req, count_without_req)
+    """
+    if not os.path.exists(path):
+        return [], set(), 0, 0
+    #endif
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return [], set(), 0, 0
+    # endtry
+
+    if not isinstance(data, list):
+        return [], set(), 0, 0
+    # endif
+
+    existing_names = set()
+    with_req = 0
+    without_req = 0
+
+    for uni in data:
+        if not isinstance(uni, dict):
+            continue
+        # endif
+        name_value = uni.get("name")
+        if name_value is None:
+            name_value = ""
+        # endif
+        name = name_value.strip()
+        if name:
+            existing_names.add(name)
+        # endif
+
+        uni_has_requirements = False
+        courses = uni.get("courses")
+        if courses is None:
+            courses = []
+        # endif
+        for course in courses:
+            requirements = course.get("requirements")
+            if requirements is None:
+                requirements = []
+            # endif
+            for req in requirements:
+                if not isinstance(req, dict):
+                    continue
+                # endif
+                has_requirements = req.get("has_requirements")
+                min_points = req.get("min_ucas_points")
+                display_grades = req.get("display_grades")
+                if min_points is None:
+                    min_points = 0
+                # endif
+                if has_requirements and (min_points > 0 or display_grades):
+                    uni_has_requirements = True
+                    break
+                # endif
+            # endfor
+            if uni_has_requirements:
+                break
+            # endif
+        # endfor
+
+        if uni_has_requirements:
+            with_req += 1
+        else:
+            without_req += 1
+        # endif
+    # endfor
+
+    return data, existing_names, with_req, without_req
+
+
+# enddef
+
+def index_resume(path):
+    """
+    Resumes the way scraper.py does now: summaries from the index, then names and counts from them.
+
+    :param path: JSON file path to load
+    :return: (existing_names, count_with_req, count_without_req)
+    """
+    journal = ProgressJournal(path, compact_interval=0)
+    summaries = journal.load()
+    journal.close()
+
+    existing_names = set()
+    with_req = 0
+    without_req = 0
+    for summary in summaries:
+        if summary["name"]:
+            existing_names.add(summary["name"])
+        # endif
+        if summary["has_requirements"]:
+            with_req += 1
+        else:
+            without_req += 1
+        # endif
+    # endfor
+    return existing_names, with_req, without_req
+
+
+# enddef
+
+def time_generate(work_dir):
+    """
+    Runs generate_unis_without_requirements.py in work_dir and reads what it wrote.
+
+    :param work_dir: Folder holding universities.json
+    :return: (seconds, text of unis_without_requirements.txt)
+    """
+    previous_dir = os.getcwd()
+    os.chdir(work_dir)
+    # The script prints a line when it is done, which isn't wanted in the table
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        started = time.perf_counter()
+        generate_unis_without_requirements.main()
+        seconds = time.perf_counter() - started
+        with open("unis_without_requirements.txt", "r", encoding="utf-8") as f:
+            text = f.read()
+        # endwith
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+        os.chdir(previous_dir)
+    # endtry
+    return seconds, text
+
+
+# enddef
+
+def main():
+    """
+    Runs the benchmark for each size given on the command line.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Compare resuming from the full JSON with the summary index")
+    parser.add_argument("--universities", type=int, nargs="+", default=[2000, 10000])
+    parser.add_argument("--courses", type=int, default=30, help="courses per university")
+    args = parser.parse_args()
+
+    print(f"{'universities':>12s} {'resume old':>11s} {'resume idx':>11s} {'generate old':>13s} "
+          f"{'generate idx':>13s}  checks")
+    failed = False
+    for count in args.universities:
+        universities = make_universities(count, args.courses)
+        # Give some universities courses without requirements so both checks have something to find
+        for position, uni in enumerate(universities):
+            if position % 7 == 0:
+                uni["courses"][0]["requirements"] = []
+            # endif
+            if position % 11 == 0:
+                for course in uni["courses"]:
+                    course["requirements"] = []
+                # endfor
+            # endif
+        # endfor
+        work_dir = tempfile.mkdtemp(prefix="bench_resume_")
+        try:
+            path = os.path.join(work_dir, "universities.json")
+            write_universities(path, universities)
+
+            started = time.perf_counter()
+            _, old_names, old_with, old_without = legacy_load_existing_universities(path)
+            old_resume_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            new_names, new_with, new_without = index_resume(path)
+            new_resume_seconds = time.perf_counter() - started
+
+            new_generate_seconds, new_text = time_generate(work_dir)
+            os.remove(index_path(path))
+            old_generate_seconds, old_text = time_generate(work_dir)
+        finally:
+            shutil.rmtree(work_dir)
+        # endtry
+
+        resume_ok = (old_names, old_with, old_without) == (new_names, new_with, new_without)
+        generate_ok = old_text == new_text
+        checks = ("resume same" if resume_ok else "RESUME DIFFERS") + ", " + \
+                 ("names same" if generate_ok else "NAMES DIFFER")
+        print(f"{count:12d} {old_resume_seconds:11.2f} {new_resume_seconds:11.2f} {old_generate_seconds:13.2f} "
+              f"{new_generate_seconds:13.2f}  {checks}")
+        if not resume_ok or not generate_ok:
+            failed = True
+        # endif
+    # endfor
+
+    if failed:
+        sys.exit(1)
+    # endif
+
+
+# enddef
+
+if __name__ == "__main__":
+    main()
+# endif
@@ -0,0 +1,264 @@
+"""
+Equivalence check and benchmark for the tariff engine in models/TariffEngine.py.
+
+The old EntryRequirement point functions are kept below word for word (they strip A* and D*
+with repeated str.replace and use list.index). The script checks the engine gives exactly the
+same answers for every grade string in a large random set, including odd ones like "AA**" or
+" bcc ", then times single lookups against the old functions and the NumPy batch functions.
+
+Usage: python3 benchmarks/bench_tariff_engine.py --strings 200000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.TariffEngine import A_LEVEL_POINTS, BTEC_GRADE_VALUES, TariffEngine, np, tariff_engine
+
+# Characters the random grade strings are made from, including ones that should be ignored
+A_LEVEL_CHARACTERS = "A*BCDEabcde *-X"
+BTEC_CHARACTERS = "D*MPdmp *-X"
+COMMON_A_LEVEL_GRADES = ["A*A*A*", "A*AA", "AAA", "AAB", "ABB", "BBB", "BBC", "BCC", "CCC", "BCC-BBB", "ABB-AAB"]
+COMMON_BTEC_GRADES = ["D*D*D*", "D*D*D", "DDD", "DDM", "DMM", "MMM", "MMP"]
+
+
+def legacy_a_level_points(grades: str) -> int:
+    """
+    Calculates UCAS points from A-level grades.
+
+    :param grades: A string of A-level grades (e.g., "AAB", "A*AA", "BCC")
+    :return: Total UCAS points for these grades
+    """
+    if not grades:
+        return 0
+    # endif
+
+    total_points = 0
+    grades = grades.strip().upper()
+
+    # Handle A* grades
+    while 'A*' in grades:
+        total_points += A_LEVEL_POINTS['A*']
+        grades = grades.replace('A*', '', 1)
+    # endwhile
+
+    # Process remaining grades
+    for grade in grades:
+        if grade in A_LEVEL_POINTS:
+            total_points += A_LEVEL_POINTS[grade]
+        # endif
+    # endfor
+
+    return total_points
+
+# enddef
+
+def legacy_lowest_grade(grades: str) -> str:
+    """
+    Finds the lowest grade in a set of A-level grades.
+
+    :param grades: A string of A-level grades (e.g., "AAB", "BCC")
+    :return: The lowest grade found (e.g., "B", "C")
+    """
+    if not grades:
+        return ""
+    # endif
+
+    grades = grades.strip().upper()
+    grade_order = ['A*', 'A', 'B', 'C', 'D', 'E']
+    lowest_grade = ""
+    lowest_index = -1
+
+    # Handle A* grades
+    while 'A*' in grades:
+        if lowest_index < grade_order.index('A*'):
+            lowest_grade = 'A*'
+            lowest_index = grade_order.index('A*')
+        # endif
+        grades = grades.replace('A*', '', 1)
+    # endwhile
+
+    # Check remaining grades
+    for grade in grades:
+        if grade in grade_order:
+            grade_index = grade_order.index(grade)
+            if grade_index > lowest_index:
+                lowest_grade = grade
+                lowest_index = grade_index
+            # endif
+        # endif
+    # endfor
+
+    return lowest_grade
+
+# enddef
+
+def legacy_btec_points(grades: str) -> int:
+    """
+    Calculates BTEC points from grade string.
+
+    :param grades: A string of BTEC grades (e.g., "DDD", "DMM", "D*D*D*")
+    :return: Total UCAS points for these BTEC grades
+    """
+    if not grades:
+        return 0
+    # endif
+
+    total = 0
+
+    # Normalize by capitalizing it always
+    grades = grades.upper()
+
+    # Handle D* grades first as it's different
+    # from the single letter grades
+    while 'D*' in grades:
+        total += BTEC_GRADE_VALUES['D*']
+
+        # remove it once handled
+        grades = grades.replace('D*', '', 1)
+    # endwhile
+
+    # Process remaining single grades
+    for grade in grades:
+        if grade in BTEC_GRADE_VALUES:
+            total += BTEC_GRADE_VALUES[grade]
+        # endif
+    # endfor
+
+    return total
+
+# enddef
+
+
+def random_grades(rng, characters, count):
+    """
+    Makes random grade strings, mixing real looking ones with random characters.
+
+    :param rng: random.Random
+    :param characters: Characters to build random strings from
+    :param count: How many strings to make
+    :return: List of grade strings
+    """
+    strings = ["", " ", "*", "A*", "AA**", "A**A", "D**", "DD**D*"]
+    for _ in range(count):
+        strings.append("".join(rng.choice(characters) for _ in range(rng.randint(1, 8))))
+    # endfor
+    return strings
+
+
+# enddef
+
+def time_calls(function, values, repeats):
+    """
+    Times a function over a list of values.
+
+    :param function: Function taking one value
+    :param values: List of values
+    :param repeats: How many times to go over the list
+    :return: Calls per second
+    """
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for value in values:
+            function(value)
+        # endfor
+    # endfor
+    return len(values) * repeats / (time.perf_counter() - started)
+
+
+# enddef
+
+
+def main() -> None:
+    """
+    Checks the engine against the old functions and times single and batch lookups.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the tariff engine")
+    parser.add_argument("--strings", type=int, default=200000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    a_level_strings = random_grades(rng, A_LEVEL_CHARACTERS, 20000)
+    btec_strings = random_grades(rng, BTEC_CHARACTERS, 20000)
+
+    # A fresh engine so the remembered answers don't hide mistakes in the tables
+    engine = TariffEngine()
+    differences = 0
+    for grades in a_level_strings:
+        expected = (legacy_a_level_points(grades), legacy_lowest_grade(grades))
+        if engine.a_level(grades) != expected or engine.a_level(grades) != expected:
+            differences += 1
+            print(f"A level {grades!r} differs: old {expected}, new {engine.a_level(grades)}")
+        # endif
+    # endfor
+    for grades in btec_strings:
+        if engine.btec_points(grades) != legacy_btec_points(grades):
+            differences += 1
+            print(f"BTEC {grades!r} differs: old {legacy_btec_points(grades)}, new {engine.btec_points(grades)}")
+        # endif
+    # endfor
+
+    # What downstream analytics look up: mostly the common grades, over and over
+    workload = [rng.choice(COMMON_A_LEVEL_GRADES) for _ in range(args.strings)]
+    btec_workload = [rng.choice(COMMON_BTEC_GRADES) for _ in range(args.strings)]
+
+    def legacy_range_points(grades):
+        if "-" in grades:
+            parts = grades.split("-")
+            return legacy_a_level_points(parts[0].strip()) if len(parts) == 2 else 0
+        # endif
+        return legacy_a_level_points(grades)
+
+    # enddef
+
+    print(f"{len(a_level_strings) + len(btec_strings)} random strings checked, "
+          f"{args.strings} lookups timed")
+    legacy_rate = time_calls(legacy_range_points, workload, args.repeats)
+    engine_rate = time_calls(lambda grades: tariff_engine.a_level_range(grades)[0], workload, args.repeats)
+    legacy_btec_rate = time_calls(legacy_btec_points, btec_workload, args.repeats)
+    engine_btec_rate = time_calls(tariff_engine.btec_points, btec_workload, args.repeats)
+    print(f"{'A level, old':22s} {legacy_rate:12.0f} lookups/sec")
+    print(f"{'A level, engine':22s} {engine_rate:12.0f} lookups/sec  {engine_rate / legacy_rate:5.1f}x")
+    print(f"{'BTEC, old':22s} {legacy_btec_rate:12.0f} lookups/sec")
+    print(f"{'BTEC, engine':22s} {engine_btec_rate:12.0f} lookups/sec  {engine_btec_rate / legacy_btec_rate:5.1f}x")
+
+    if np is not None:
+        started = time.perf_counter()
+        for _ in range(args.repeats):
+            batch_points = tariff_engine.a_level_points_array(workload)
+        # endfor
+        batch_rate = len(workload) * args.repeats / (time.perf_counter() - started)
+        if batch_points.tolist() != [legacy_range_points(grades) for grades in workload]:
+            differences += 1
+            print("A level batch results differ")
+        # endif
+        if tariff_engine.btec_points_array(btec_workload).tolist() != [legacy_btec_points(g) for g in btec_workload]:
+            differences += 1
+            print("BTEC batch results differ")
+        # endif
+        print(f"{'A level, NumPy batch':22s} {batch_rate:12.0f} lookups/sec  {batch_rate / legacy_rate:5.1f}x")
+    else:
+        print("NumPy is not installed, batch functions not timed")
+    # endif
+
+    if differences:
+        print(f"OUTPUT DIFFERS for {differences} checks")
+        sys.exit(1)
+    # endif
+    print("same output for every grade string")
+
+
+# enddef
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Benchmark for the SQLite university store against loading universities.json and scanning it.
+
+The same synthetic universities are saved as JSON and into a UniversityStore. The script checks
+every university comes back out of the database exactly as it went in, then times a few typical
+questions both ways and checks they find the same courses.
+
+Usage: python3 benchmarks/bench_university_store.py --universities 2000 --courses 30
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_progress_journal import make_universities
+from university_store import UniversityStore
+
+# (description, find_courses arguments)
+QUERIES = [
+    ("at most 112 points and Mathematics", {"max_points": 112, "subject": "mathematics"}),
+    ("at least 144 points", {"min_points": 144}),
+    ("one university", {"university": "University 7"}),
+]
+
+
+def scan_json(path, max_points=None, min_points=None, subject=None, course_type=None, university=None):
+    """
+    Answers a question the way consumers did before: load the whole JSON file and look at every course.
+
+    :param path: Path of universities.json
+    :param max_points: Same as UniversityStore.find_courses
+    :param min_points: Same as UniversityStore.find_courses
+    :param subject: Same as UniversityStore.find_courses
+    :param course_type: Same as UniversityStore.find_courses
+    :param university: Same as UniversityStore.find_courses
+    :return: List of (university name, course link) sorted the same way as find_courses
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    # endwith
+
+    found = []
+    for uni in data:
+        if university is not None and uni["name"] != university:
+            continue
+        # endif
+        for course in uni["courses"]:
+            if course_type is not None and course["course_type"].lower() != course_type.lower():
+                continue
+            # endif
+            needs_requirement = max_points is not None or min_points is not None or subject is not None
+            matched = not needs_requirement
+            for req in course["requirements"]:
+                points = req["min_ucas_points"]
+                if max_points is not None and not 0 < points <= max_points:
+                    continue
+                # endif
+                if min_points is not None and points < min_points:
+                    continue
+                # endif
+                if subject is not None:
+                    subjects = [s["subject"].lower() for s in req["subject_requirements"]]
+                    if subject.lower() not in subjects:
+                        continue
+                    # endif
+                # endif
+                matched = True
+                break
+            # endfor
+            if matched:
+                found.append((uni["name"], course["link"]))
+            # endif
+        # endfor
+    # endfor
+    found.sort(key=lambda item: item[0])
+    return found
+
+
+# enddef
+
+def main():
+    """
+    Builds the JSON file and the database, checks they agree and times the queries.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Compare the SQLite university store with scanning the JSON")
+    parser.add_argument("--universities", type=int, default=2000)
+    parser.add_argument("--courses", type=int, default=30, help="courses per university")
+    args = parser.parse_args()
+
+    universities = make_universities(args.universities, args.courses)
+    work_dir = tempfile.mkdtemp(prefix="bench_store_")
+    failed = False
+    try:
+        json_path = os.path.join(work_dir, "universities.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(universities, f, indent=2)
+        # endwith
+
+        started = time.perf_counter()
+        store = UniversityStore(os.path.join(work_dir, "universities.db"))
+        store.save_universities(universities)
+        build_seconds = time.perf_counter() - started
+
+        different = 0
+        for uni in universities:
+            if store.get_university(uni["name"]) != uni:
+                different += 1
+            # endif
+        # endfor
+        print(f"{args.universities} universities x {args.courses} courses, "
+              f"JSON {os.path.getsize(json_path) / 1024 / 1024:.1f} MB, database built in {build_seconds:.2f} s")
+        print(f"Round trip: {'every university identical' if not different else f'{different} DIFFERENT'}")
+        failed = different > 0
+
+        print(f"{'query':40s} {'courses':>8s} {'JSON scan (ms)':>15s} {'SQLite (ms)':>12s} {'speedup':>8s}")
+        for description, arguments in QUERIES:
+            started = time.perf_counter()
+            expected = scan_json(json_path, **arguments)
+            scan_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            courses = store.find_courses(**arguments)
+            store_ms = (time.perf_counter() - started) * 1000
+
+            found = [(course["university"], course["link"]) for course in courses]
+            if found != expected:
+                print(f"{description}: DIFFERENT RESULTS ({len(found)} vs {len(expected)})")
+                failed = True
+            # endif
+            print(f"{description:40s} {len(found):8d} {scan_ms:15.1f} {store_ms:12.1f} {scan_ms / store_ms:7.1f}x")
+        # endfor
+        store.close()
+    finally:
+        shutil.rmtree(work_dir)
+    # endtry
+
+    if failed:
+        sys.exit(1)
+    # endif
+
+
+# enddef
+
+if __name__ == "__main__":
+    main()
+# endif
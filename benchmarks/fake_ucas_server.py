@@ -0,0 +1,477 @@
+"""
+A local stand-in for the parts of the UCAS website the scraper uses, so the whole crawl can be
+run and timed without touching production. It serves:
+
+- /explore/search/providers        provider search pages with a pagination__list
+- /explore/search/courses          course search pages filtered with refinementList parameters
+- /course/<uni>/<course>           course detail pages with an options bar, accordions, tables and JSON-LD
+
+Latency, error rate and size (number of universities and courses) can all be configured.
+Run it on its own with: python3 benchmarks/fake_ucas_server.py --port 8800
+"""
+
+import argparse
+import html
+import json
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RESULTS_PER_PAGE = 10
+
+A_LEVEL_OPTIONS = ["A*AA", "AAA", "AAB", "ABB", "BBB", "BBC", "BCC", "CCC", "BCC-BBB", "ABB-AAB"]
+BTEC_OPTIONS = ["D*D*D", "DDD", "DDM", "DMM", "MMM"]
+SUBJECT_OPTIONS = ["Mathematics", "Physics", "Chemistry", "Biology", "English Literature", "History", "Psychology"]
+QUALIFICATION_OPTIONS = ["BSc (Hons)", "BA (Hons)", "BEng (Hons)", "MEng (Hons)", "LLB (Hons)"]
+CITY_OPTIONS = ["London", "Manchester", "Leeds", "Newcastle", "Bristol", "Cardiff", "Glasgow", "Belfast"]
+TARIFF_FOR_GRADES = {"A*AA": 152, "AAA": 144, "AAB": 136, "ABB": 128, "BBB": 120, "BBC": 112, "BCC": 104,
+                     "CCC": 96, "BCC-BBB": 104, "ABB-AAB": 128}
+
+
+class FakeUcasSettings:
+    """
+    Holds the size and behaviour of the fake site, plus the statistics collected while serving it.
+    """
+
+    def __init__(self, universities=20, courses_per_university=20, latency=0.05, error_rate=0.0,
+                 page_padding_kb=40, seed=1, revision=0, changed_fraction=0.0):
+        """
+        Creates the settings for a fake site.
+
+        :param universities: Number of universities in the provider search (default 20)
+        :param courses_per_university: Number of courses each university offers (default 20)
+        :param latency: Seconds each response is delayed by (default 0.05)
+        :param error_rate: Fraction of requests answered with a 503 (default 0.0)
+        :param page_padding_kb: Kilobytes of navigation markup added to each page to make it realistic (default 40)
+        :param seed: Random seed so the site is the same on every run (default 1)
+        :param revision: Version of the site, each revision above 0 changes the grades of some courses (default 0)
+        :param changed_fraction: Fraction of courses whose grades change in each revision (default 0.0)
+        :return: None
+        """
+        self.universities = universities
+        self.courses_per_university = courses_per_university
+        self.latency = latency
+        self.error_rate = error_rate
+        self.page_padding_kb = page_padding_kb
+        self.seed = seed
+        self.revision = revision
+        self.changed_fraction = changed_fraction
+
+        self.request_count = 0
+        self.error_count = 0
+        self.bytes_sent = 0
+        self.latencies: list[float] = []
+        self._lock = threading.Lock()
+        self._error_random = random.Random(seed)
+
+    # enddef
+
+    def university_name(self, index):
+        """
+        Gets the name of a fake university.
+
+        :param index: University number
+        :return: University name
+        """
+        return f"University of Testshire {index:05d}"
+
+    # enddef
+
+    def record(self, seconds, size, is_error):
+        """
+        Saves the statistics for one request.
+
+        :param seconds: Time taken to serve the request
+        :param size: Bytes in the response body
+        :param is_error: Whether an error was returned on purpose
+        :return: None
+        """
+        with self._lock:
+            self.request_count += 1
+            self.bytes_sent += size
+            self.latencies.append(seconds)
+            if is_error:
+                self.error_count += 1
+            # endif
+        # endwith
+
+    # enddef
+
+    def should_fail(self):
+        """
+        Decides whether this request gets an injected 503.
+
+        :return: True to fail the request
+        """
+        if self.error_rate <= 0:
+            return False
+        # endif
+        with self._lock:
+            return self._error_random.random() < self.error_rate
+        # endwith
+    # enddef
+# endclass
+
+
+def padding(settings):
+    """
+    Builds navigation markup to pad pages out to a realistic size.
+
+    :param settings: FakeUcasSettings
+    :return: HTML string
+    """
+    links = []
+    for index in range(settings.page_padding_kb * 10):
+        links.append(f'<li class="nav__item"><a class="nav__link" href="/explore/{index}">Explore link {index}</a></li>')
+    # endfor
+    return f'<nav class="site-nav"><ul class="nav__list">{"".join(links)}</ul></nav>'
+
+
+# enddef
+
+def pagination(base_path, query, current_page, total_pages):
+    """
+    Builds a pagination__list like the one UCAS uses, including the "Last Page, Page N" label.
+
+    :param base_path: Path of the search page
+    :param query: Query string without the page parameter
+    :param current_page: Page being shown
+    :param total_pages: Total number of pages
+    :return: HTML string
+    """
+    items = []
+    for page_number in range(1, total_pages + 1):
+        label = f"Page {page_number}"
+        if page_number == total_pages:
+            label = f"Last Page, Page {page_number}"
+        # endif
+        href = html.escape(f"{base_path}?{query}&page={page_number}")
+        items.append(f'<li class="pagination__item"><a href="{href}" aria-label="{label}">{page_number}</a></li>')
+    # endfor
+    return f'<ul class="pagination__list">{"".join(items)}</ul>'
+
+
+# enddef
+
+def provider_page(settings, page_number):
+    """
+    Builds one page of the provider search.
+
+    :param settings: FakeUcasSettings
+    :param page_number: Page number, starting at 1
+    :return: HTML string
+    """
+    total_pages = max(1, -(-settings.universities // RESULTS_PER_PAGE))
+    cards = []
+    first = (page_number - 1) * RESULTS_PER_PAGE
+    for index in range(first, min(first + RESULTS_PER_PAGE, settings.universities)):
+        city = CITY_OPTIONS[index % len(CITY_OPTIONS)]
+        cards.append(
+            '<div class="content__details">'
+            f'<a class="header" href="/explore/unis/{index:08x}/testshire">{settings.university_name(index)}</a>'
+            f'<p class="location-display__location">{city}</p>'
+            '</div>'
+        )
+    # endfor
+    return (f"<html><head><title>Providers</title></head><body>{padding(settings)}"
+            f'<div class="search-results">{"".join(cards)}</div>'
+            f'{pagination("/explore/search/providers", "query=", page_number, total_pages)}</body></html>')
+
+
+# enddef
+
+def course_values(settings, uni_index, course_index):
+    """
+    Picks the (deterministic) details of a fake course.
+
+    :param settings: FakeUcasSettings
+    :param uni_index: University number
+    :param course_index: Course number within the university
+    :return: Dictionary of course details
+    """
+    rng = random.Random(settings.seed * 1000003 + uni_index * 1009 + course_index)
+    grades = rng.choice(A_LEVEL_OPTIONS)
+    values = {
+        "name": f"{rng.choice(SUBJECT_OPTIONS)} {course_index}",
+        "qualification": rng.choice(QUALIFICATION_OPTIONS),
+        "location": CITY_OPTIONS[uni_index % len(CITY_OPTIONS)],
+        "duration": f"{rng.choice([3, 4])} years",
+        "mode": "Full-time",
+        "start": "September 2026",
+        "grades": grades,
+        "btec": rng.choice(BTEC_OPTIONS),
+        "tariff": TARIFF_FOR_GRADES[grades],
+        "subjects": rng.sample(SUBJECT_OPTIONS, rng.choice([0, 1, 2])),
+        "multiple_options": rng.random() < 0.2
+    }
+
+    # Later revisions of the site change the grades (and so the tariff on the card) of a few courses
+    for revision in range(1, settings.revision + 1):
+        change_rng = random.Random(f"{settings.seed}-{revision}-{uni_index}-{course_index}")
+        if change_rng.random() < settings.changed_fraction:
+            values["grades"] = change_rng.choice(A_LEVEL_OPTIONS)
+            values["tariff"] = TARIFF_FOR_GRADES[values["grades"]]
+        # endif
+    # endfor
+    return values
+
+
+# enddef
+
+def course_search_page(settings, base_url, university_name, page_number, query):
+    """
+    Builds one page of the course search for a university.
+
+    :param settings: FakeUcasSettings
+    :param base_url: Address of this server, used for absolute course links
+    :param university_name: University from the refinementList parameter
+    :param page_number: Page number, starting at 1
+    :param query: Query string without the page parameter
+    :return: HTML string, or None if the university doesn't exist
+    """
+    uni_index = None
+    for index in range(settings.universities):
+        if settings.university_name(index) == university_name:
+            uni_index = index
+            break
+        # endif
+    # endfor
+    if uni_index is None:
+        return None
+    # endif
+
+    total_pages = max(1, -(-settings.courses_per_university // RESULTS_PER_PAGE))
+    cards = []
+    first = (page_number - 1) * RESULTS_PER_PAGE
+    for course_index in range(first, min(first + RESULTS_PER_PAGE, settings.courses_per_university)):
+        values = course_values(settings, uni_index, course_index)
+        if values["multiple_options"]:
+            details = "3 Options available"
+        else:
+            details = " · ".join([values["qualification"], values["duration"], values["mode"],
+                                  values["location"], values["start"]])
+        # endif
+        cards.append(
+            '<div class="content__details">'
+            f'<a class="header" href="{base_url}/course/{uni_index}/{course_index}">'
+            f'<p class="header__text">{values["name"]}</p></a>'
+            f'<p class="course-display__details">{details}</p>'
+            f'<p class="course-display__tariff">UCAS points: {values["tariff"]} - {values["tariff"] + 16}</p>'
+            '</div>'
+        )
+    # endfor
+    return (f"<html><head><title>Courses</title></head><body>{padding(settings)}"
+            f'<div class="search-results">{"".join(cards)}</div>'
+            f'{pagination("/explore/search/courses", query, page_number, total_pages)}</body></html>')
+
+
+# enddef
+
+def course_detail_page(settings, uni_index, course_index):
+    """
+    Builds a course detail page with the structures Course.parse_requirements looks for.
+
+    :param settings: FakeUcasSettings
+    :param uni_index: University number
+    :param course_index: Course number within the university
+    :return: HTML string, or None if the course doesn't exist
+    """
+    if uni_index >= settings.universities or course_index >= settings.courses_per_university:
+        return None
+    # endif
+
+    values = course_values(settings, uni_index, course_index)
+    including = ""
+    if values["subjects"]:
+        including = " including " + " and ".join(values["subjects"])
+    # endif
+
+    options_bar = (
+        '<div class="options-bar">'
+        f'<div data-options-bar-item-value="{values["qualification"]}"><span>Qualification</span></div>'
+        f'<div data-options-bar-item-value="{values["location"]}"><span>Location</span></div>'
+        f'<div data-options-bar-item-value="{values["start"]}"><span>Start date</span></div>'
+        f'<div data-options-bar-item-value="{values["mode"]}"><span>Study mode</span></div>'
+        f'<div data-options-bar-item-value="{values["duration"]}"><span>Duration</span></div>'
+        '</div>'
+    )
+    options_table = (
+        '<table class="course-options"><thead><tr><th>Location</th><th>Qualification</th><th>Mode</th>'
+        '<th>Duration</th><th>Start</th></tr></thead><tbody>'
+        f'<tr><td>{values["location"]}</td><td><strong>{values["qualification"]}</strong></td>'
+        f'<td>{values["mode"]}</td><td>{values["duration"]}</td><td>{values["start"]}</td></tr>'
+        '</tbody></table>'
+    )
+    accordions = (
+        '<ul class="accordion">'
+        '<li class="accordion__child"><h2 class="accordion__label">A level</h2>'
+        f'<div class="accordion__inner-wrapper"><p>A level - {values["grades"]}{including}.</p></div></li>'
+        '<li class="accordion__child"><h2 class="accordion__label">BTEC Extended Diploma</h2>'
+        f'<div class="accordion__inner-wrapper"><p>BTEC Extended Diploma - {values["btec"]}</p></div></li>'
+        '<li class="accordion__child"><h2 class="accordion__label">UCAS Tariff</h2>'
+        f'<div class="accordion__inner-wrapper"><p>UCAS Tariff - {values["tariff"]} points</p></div></li>'
+        '</ul>'
+    )
+    requirements_table = (
+        '<div class="entry-requirements__table"><table><tbody>'
+        f'<tr><th>A level</th><td>{values["grades"]}</td></tr>'
+        f'<tr><th>BTEC Extended Diploma</th><td>{values["btec"]}</td></tr>'
+        f'<tr><th>UCAS Tariff</th><td>{values["tariff"]} points</td></tr>'
+        '</tbody></table></div>'
+    )
+    json_ld = json.dumps({
+        "@context": "https://schema.org",
+        "@type": "Course",
+        "name": values["name"],
+        "educationalCredentialAwarded": values["qualification"],
+        "hasCourseInstance": [{
+            "@type": "CourseInstance",
+            "courseMode": values["mode"],
+            "location": {"@type": "Place", "name": values["location"]},
+            "startDate": values["start"],
+            "courseSchedule": {"@type": "Schedule", "duration": values["duration"]}
+        }],
+        "coursePrerequisites": [
+            {"@type": "AlignmentObject", "educationalFramework": "A level", "targetName": values["grades"]},
+            {"@type": "AlignmentObject", "educationalFramework": "BTEC Extended Diploma",
+             "targetName": values["btec"]},
+            {"@type": "AlignmentObject", "educationalFramework": "UCAS Tariff",
+             "targetName": f"{values['tariff']} points"}
+        ]
+    })
+    return (f'<html><head><title>{values["name"]}</title>'
+            f'<script type="application/ld+json">{json_ld}</script></head><body>{padding(settings)}'
+            f'<main><h1>{values["name"]}</h1>{options_bar}{options_table}'
+            f'<section class="entry-requirements">{accordions}{requirements_table}</section></main></body></html>')
+
+
+# enddef
+
+def make_handler(settings):
+    """
+    Builds the request handler class for a fake site.
+
+    :param settings: FakeUcasSettings
+    :return: BaseHTTPRequestHandler subclass
+    """
+
+    class FakeUcasHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            # Keep the benchmark output clean
+            pass
+
+        # enddef
+
+        def do_GET(self):
+            started = time.perf_counter()
+            if settings.latency > 0:
+                time.sleep(settings.latency)
+            # endif
+
+            if settings.should_fail():
+                self.send_response(503)
+                self.send_header("Retry-After", "1")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                settings.record(time.perf_counter() - started, 0, True)
+                return
+            # endif
+
+            parsed = urllib.parse.urlsplit(self.path)
+            params = urllib.parse.parse_qs(parsed.query, keep_blank_values=True)
+            page_number = int(params.get("page", ["1"])[0] or 1)
+            query_without_page = urllib.parse.urlencode(
+                [(key, value) for key, values in params.items() if key != "page" for value in values]
+            )
+            host = self.headers.get("Host", "127.0.0.1")
+
+            body = None
+            if parsed.path == "/explore/search/providers":
+                body = provider_page(settings, page_number)
+            elif parsed.path == "/explore/search/courses":
+                university_name = params.get("refinementList[university][0]", [""])[0]
+                body = course_search_page(settings, f"http://{host}", university_name, page_number,
+                                          query_without_page)
+            elif parsed.path.startswith("/course/"):
+                parts = parsed.path.split("/")
+                if len(parts) == 4 and parts[2].isdigit() and parts[3].isdigit():
+                    body = course_detail_page(settings, int(parts[2]), int(parts[3]))
+                # endif
+            # endif
+
+            if body is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                settings.record(time.perf_counter() - started, 0, False)
+                return
+            # endif
+
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            settings.record(time.perf_counter() - started, len(data), False)
+
+        # enddef
+    # endclass
+
+    return FakeUcasHandler
+
+
+# enddef
+
+def start_server(settings, port=0):
+    """
+    Starts the fake site on a background thread.
+
+    :param settings: FakeUcasSettings
+    :param port: Port to listen on, 0 picks a free one (default 0)
+    :return: (server, base URL)
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(settings))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# enddef
+
+
+def main() -> None:
+    """
+    Runs the fake site in the foreground until interrupted.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Local stand-in for the UCAS pages the scraper uses")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--universities", type=int, default=20)
+    parser.add_argument("--courses", type=int, default=20, help="courses per university")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--page-padding-kb", type=int, default=40)
+    args = parser.parse_args()
+
+    settings = FakeUcasSettings(args.universities, args.courses, args.latency, args.error_rate, args.page_padding_kb)
+    server, base_url = start_server(settings, args.port)
+    print(f"Fake UCAS running at {base_url} (SCRAPER_UCAS_URL={base_url} python3 scraper.py)")
+    try:
+        while True:
+            time.sleep(1)
+        # endwhile
+    except KeyboardInterrupt:
+        server.shutdown()
+    # endtry
+
+
+# enddef
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,550 @@
+"""
+Columnar copy of the scraped data for analytics, so a job that looks at every course many times
+doesn't have to walk nested JSON dictionaries each time.
+
+University -> Course -> EntryRequirement -> SubjectRequirement is flattened into four tables
+(universities, courses, requirements, subjects). Each table is a set of NumPy arrays with one
+value per row, saved as one .npy file each in a folder, so they can be memory mapped:
+  - repeated text (course type, mode, location, start date, grades, subjects...) is stored as integer
+    codes, with the list of values each code stands for in metadata.json
+  - text that is mostly different on every row (names, links and card fingerprints) is stored as UTF-8
+    bytes with offsets
+  - min_ucas_points is an int16 column and course_fetched_at an int64 column
+  - "<table>_<child>_offsets" gives each row's children, e.g. the courses of university i are rows
+    university_course_offsets[i] to university_course_offsets[i + 1] of the course table, and
+    "<child>_<table>" gives the row each child belongs to
+
+Build it from an existing universities.json with: python3 columnar_export.py [universities.json] [universities_columns]
+"""
+
+import json
+import os
+import shutil
+import sys
+from array import array
+
+from JSONReader import iter_universities
+from models.University import University
+
+# NumPy is only needed for the columnar export, so the scraper still runs without it
+try:
+    import numpy as np
+except ImportError:
+    np = None
+# endtry
+
+COLUMNS_VERSION = 2
+
+# Columns whose values repeat a lot, stored as integer codes
+CATEGORICAL_COLUMNS = [
+    "university_location", "course_type", "course_duration", "course_mode", "course_location", "course_start_date",
+    "min_grade_required", "display_grades", "btec_grades", "subject", "subject_grade"
+]
+
+# Columns that are different on nearly every row, stored as UTF-8 bytes with offsets
+TEXT_COLUMNS = ["university_name", "university_link", "university_link_all_courses", "course_name", "course_link",
+                "course_fingerprint"]
+
+# Number columns and the array typecode they are built with ("q" int64, "i" int32, "h" int16, "B" bool)
+NUMBER_COLUMNS = {
+    "university_course_offsets": "q",
+    "course_university": "i",
+    "course_fetched_at": "q",
+    "course_requirement_offsets": "q",
+    "requirement_course": "i",
+    "min_ucas_points": "h",
+    "accepts_ucas": "B",
+    "has_requirements": "B",
+    "requirement_subject_offsets": "q",
+    "subject_requirement": "i"
+}
+
+# NumPy type each number column is saved as
+NUMBER_DTYPES = {"q": "int64", "i": "int32", "h": "int16", "B": "bool"}
+
+# Largest value an int16 column can hold
+INT16_MAX = 32767
+
+
+class ColumnBuilder:
+    """
+    Collects the columns one university at a time in compact arrays (not lists of Python objects),
+    so a big export never holds the nested dictionaries for more than one university.
+    """
+
+    def __init__(self):
+        """
+        Starts empty columns.
+
+        :return: None
+        """
+        self.numbers = {}
+        for name, typecode in NUMBER_COLUMNS.items():
+            self.numbers[name] = array(typecode)
+        # endfor
+
+        # Value -> code for each categorical column, in the order the values were first seen
+        self.categories = {}
+        self.codes = {}
+        for name in CATEGORICAL_COLUMNS:
+            self.categories[name] = {}
+            self.codes[name] = array("i")
+        # endfor
+
+        self.text = {}
+        self.text_offsets = {}
+        for name in TEXT_COLUMNS:
+            self.text[name] = bytearray()
+            self.text_offsets[name] = array("q", [0])
+        # endfor
+
+        # Every offsets column starts at row 0
+        self.numbers["university_course_offsets"].append(0)
+        self.numbers["course_requirement_offsets"].append(0)
+        self.numbers["requirement_subject_offsets"].append(0)
+
+    # enddef
+
+    def add_category(self, name, value):
+        """
+        Adds one value to a categorical column.
+
+        :param name: Column name
+        :param value: Text value
+        :return: None
+        """
+        categories = self.categories[name]
+        code = categories.get(value)
+        if code is None:
+            code = len(categories)
+            categories[value] = code
+        # endif
+        self.codes[name].append(code)
+
+    # enddef
+
+    def add_text(self, name, value):
+        """
+        Adds one value to a text column.
+
+        :param name: Column name
+        :param value: Text value
+        :return: None
+        """
+        self.text[name] += value.encode("utf-8")
+        self.text_offsets[name].append(len(self.text[name]))
+
+    # enddef
+
+    def add_university(self, university_dict):
+        """
+        Flattens one university and everything under it into the columns.
+
+        :param university_dict: University dictionary made by University.to_dict
+        :return: True if it was added (universities without a name are left out)
+        """
+        # Going through the models fills in defaults for anything missing, the same as loading the JSON
+        university = University.from_dict(university_dict)
+        name = university.name.strip()
+        if not name:
+            return False
+        # endif
+
+        university_row = len(self.text_offsets["university_name"]) - 1
+        self.add_text("university_name", name)
+        self.add_category("university_location", university.location)
+        self.add_text("university_link", university.link)
+        self.add_text("university_link_all_courses", university.link_all_courses)
+
+        for course in university.courses:
+            course_row = len(self.numbers["course_university"])
+            self.numbers["course_university"].append(university_row)
+            self.add_text("course_name", course.name)
+            self.add_category("course_type", course.course_type)
+            self.add_category("course_duration", course.duration)
+            self.add_category("course_mode", course.mode)
+            self.add_category("course_location", course.location)
+            self.add_category("course_start_date", course.start_date)
+            self.add_text("course_link", course.link)
+            # Kept so a refresh crawl can tell which courses have changed
+            self.add_text("course_fingerprint", course.fingerprint)
+            self.numbers["course_fetched_at"].append(int(course.fetched_at))
+
+            for req in course.requirements:
+                requirement_row = len(self.numbers["requirement_course"])
+                self.numbers["requirement_course"].append(course_row)
+                # Tariff points are never near the int16 limit, but a broken value can't overflow it
+                self.numbers["min_ucas_points"].append(max(0, min(int(req.min_ucas_points), INT16_MAX)))
+                self.add_category("min_grade_required", req.min_grade_required)
+                self.add_category("display_grades", req.display_grades)
+                self.add_category("btec_grades", req.btec_grades)
+                self.numbers["accepts_ucas"].append(1 if req.accepts_ucas else 0)
+                self.numbers["has_requirements"].append(1 if req.has_requirements else 0)
+
+                for subject_req in req.subject_requirements:
+                    self.numbers["subject_requirement"].append(requirement_row)
+                    self.add_category("subject", subject_req.subject)
+                    self.add_category("subject_grade", subject_req.grade)
+                # endfor
+                self.numbers["requirement_subject_offsets"].append(len(self.numbers["subject_requirement"]))
+            # endfor
+            self.numbers["course_requirement_offsets"].append(len(self.numbers["requirement_course"]))
+        # endfor
+        self.numbers["university_course_offsets"].append(len(self.numbers["course_university"]))
+        return True
+
+    # enddef
+
+    def save(self, directory):
+        """
+        Saves every column as a .npy file plus metadata.json into a folder.
+
+        :param directory: Folder to write (created if needed)
+        :return: Dictionary of row counts for each table
+        """
+        os.makedirs(directory, exist_ok=True)
+
+        for name, values in self.numbers.items():
+            np.save(os.path.join(directory, name + ".npy"), np.frombuffer(values, dtype=NUMBER_DTYPES[values.typecode]))
+        # endfor
+
+        categories = {}
+        for name in CATEGORICAL_COLUMNS:
+            categories[name] = list(self.categories[name])
+            codes = np.frombuffer(self.codes[name], dtype=np.int32)
+            # Most columns have only a few different values, so the codes fit in a smaller type
+            if len(categories[name]) <= INT16_MAX:
+                codes = codes.astype(np.int16)
+            # endif
+            np.save(os.path.join(directory, name + ".npy"), codes)
+        # endfor
+
+        for name in TEXT_COLUMNS:
+            np.save(os.path.join(directory, name + ".npy"), np.frombuffer(bytes(self.text[name]), dtype=np.uint8))
+            offsets = np.frombuffer(self.text_offsets[name], dtype=np.int64)
+            np.save(os.path.join(directory, name + "_offsets.npy"), offsets)
+        # endfor
+
+        counts = {
+            "universities": len(self.text_offsets["university_name"]) - 1,
+            "courses": len(self.numbers["course_university"]),
+            "requirements": len(self.numbers["requirement_course"]),
+            "subjects": len(self.numbers["subject_requirement"])
+        }
+        metadata = {
+            "version": COLUMNS_VERSION,
+            "counts": counts,
+            "categories": categories,
+            "text_columns": TEXT_COLUMNS,
+            "number_columns": list(NUMBER_COLUMNS)
+        }
+        with open(os.path.join(directory, "metadata.json"), "w", encoding="utf-8") as f:
+            json.dump(metadata, f)
+        # endwith
+        return counts
+    # enddef
+# endclass
+
+
+def export_columns(universities, directory):
+    """
+    Flattens universities into columns and saves them into a folder.
+    The folder is written next to the old one and then swapped in, so a crash can't leave half an export.
+
+    :param universities: Any iterable of university dictionaries, e.g. iter_universities("universities.json")
+    :param directory: Folder to write, e.g. "universities_columns"
+    :return: Dictionary of row counts for each table
+    """
+    if np is None:
+        raise ImportError("NumPy is needed for the columnar export: pip install numpy")
+    # endif
+
+    builder = ColumnBuilder()
+    for university_dict in universities:
+        if isinstance(university_dict, dict):
+            builder.add_university(university_dict)
+        # endif
+    # endfor
+
+    directory = directory.rstrip("/\\")
+    temp_directory = directory + ".tmp"
+    old_directory = directory + ".old"
+    for leftover in (temp_directory, old_directory):
+        if os.path.exists(leftover):
+            shutil.rmtree(leftover)
+        # endif
+    # endfor
+
+    counts = builder.save(temp_directory)
+    if os.path.exists(directory):
+        os.rename(directory, old_directory)
+    # endif
+    os.rename(temp_directory, directory)
+    if os.path.exists(old_directory):
+        shutil.rmtree(old_directory)
+    # endif
+    return counts
+
+
+# enddef
+
+class CourseColumns:
+    """
+    Opens a columnar export. Columns are memory mapped, so opening it is instant and only the parts
+    of the files a job actually looks at are read from disk.
+    """
+
+    def __init__(self, directory="universities_columns"):
+        """
+        Reads metadata.json from an export folder.
+
+        :param directory: Folder written by export_columns (default "universities_columns")
+        :return: None
+        """
+        if np is None:
+            raise ImportError("NumPy is needed for the columnar export: pip install numpy")
+        # endif
+
+        self.directory = directory
+        with open(os.path.join(directory, "metadata.json"), "r", encoding="utf-8") as f:
+            self.metadata = json.load(f)
+        # endwith
+        if self.metadata.get("version") != COLUMNS_VERSION:
+            raise ValueError(f"{directory} was exported by a different version, export it again")
+        # endif
+        self.counts = self.metadata["counts"]
+        self._arrays = {}
+
+        # University name -> row numbers, worked out the first time a university is searched for
+        self._university_rows = None
+
+    # enddef
+
+    def column(self, name):
+        """
+        Gets one column as a (memory mapped, read only) NumPy array.
+        Categorical columns come back as their integer codes.
+
+        :param name: Column name, e.g. "min_ucas_points" or "course_type"
+        :return: NumPy array
+        """
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.directory, name + ".npy"), mmap_mode="r")
+        # endif
+        return self._arrays[name]
+
+    # enddef
+
+    def categories(self, name):
+        """
+        Gets the values the codes of a categorical column stand for.
+
+        :param name: Categorical column name, e.g. "course_type"
+        :return: List of values, code i is the i-th value
+        """
+        return self.metadata["categories"][name]
+
+    # enddef
+
+    def codes_for(self, name, value):
+        """
+        Finds the codes of a categorical column that match a value (not case sensitive).
+
+        :param name: Categorical column name
+        :param value: Text to look for
+        :return: List of matching codes
+        """
+        wanted = value.strip().lower()
+        codes = []
+        for code, category in enumerate(self.categories(name)):
+            if category.lower() == wanted:
+                codes.append(code)
+            # endif
+        # endfor
+        return codes
+
+    # enddef
+
+    def text(self, name, row):
+        """
+        Gets one value from a text column.
+
+        :param name: Text column name, e.g. "course_link"
+        :param row: Row number
+        :return: Text value
+        """
+        offsets = self.column(name + "_offsets")
+        return bytes(self.column(name)[offsets[row]:offsets[row + 1]]).decode("utf-8")
+
+    # enddef
+
+    def texts(self, name):
+        """
+        Gets every value of a text column, decoding the whole column at once.
+
+        :param name: Text column name, e.g. "university_name"
+        :return: List of text values
+        """
+        offsets = self.column(name + "_offsets").tolist()
+        data = bytes(self.column(name))
+        values = []
+        for row in range(len(offsets) - 1):
+            values.append(data[offsets[row]:offsets[row + 1]].decode("utf-8"))
+        # endfor
+        return values
+
+    # enddef
+
+    def value(self, name, row):
+        """
+        Gets one value from a categorical column.
+
+        :param name: Categorical column name
+        :param row: Row number
+        :return: Text value
+        """
+        return self.categories(name)[self.column(name)[row]]
+
+    # enddef
+
+    def find_courses(self, max_points=None, min_points=None, subject=None, course_type=None, university=None):
+        """
+        Finds courses with whole-column NumPy operations. Works the same as UniversityStore.find_courses:
+        every filter given has to match, and the points and subject have to match on the same entry requirement.
+        e.g. columns.find_courses(max_points=112, subject="Mathematics")
+
+        :param max_points: Only courses asking for at most this many UCAS points (courses with no points are left out)
+        :param min_points: Only courses asking for at least this many UCAS points
+        :param subject: Only courses with a requirement in this subject (not case sensitive)
+        :param course_type: Only this type of course, e.g. "BSc (Hons)" (not case sensitive)
+        :param university: Only courses at the university with this name
+        :return: NumPy array of course row numbers in the order they were exported
+        """
+        matches = np.ones(self.counts["courses"], dtype=bool)
+
+        if course_type is not None:
+            matches &= np.isin(self.column("course_type"), self.codes_for("course_type", course_type))
+        # endif
+
+        if university is not None:
+            if self._university_rows is None:
+                self._university_rows = {}
+                for row, name in enumerate(self.texts("university_name")):
+                    self._university_rows.setdefault(name, []).append(row)
+                # endfor
+            # endif
+            matches &= np.isin(self.column("course_university"), self._university_rows.get(university.strip(), []))
+        # endif
+
+        if max_points is not None or min_points is not None or subject is not None:
+            requirement_matches = np.ones(self.counts["requirements"], dtype=bool)
+            points = self.column("min_ucas_points")
+            if max_points is not None:
+                requirement_matches &= (points > 0) & (points <= max_points)
+            # endif
+            if min_points is not None:
+                requirement_matches &= points >= min_points
+            # endif
+            if subject is not None:
+                subject_rows = np.isin(self.column("subject"), self.codes_for("subject", subject))
+                with_subject = np.zeros(self.counts["requirements"], dtype=bool)
+                with_subject[self.column("subject_requirement")[subject_rows]] = True
+                requirement_matches &= with_subject
+            # endif
+
+            # A course matches if any of its requirements does
+            course_has_match = np.zeros(self.counts["courses"], dtype=bool)
+            course_has_match[self.column("requirement_course")[requirement_matches]] = True
+            matches &= course_has_match
+        # endif
+
+        return np.flatnonzero(matches)
+
+    # enddef
+
+    def course(self, row):
+        """
+        Rebuilds one course in the same shape as Course.to_dict.
+
+        :param row: Course row number
+        :return: Course dictionary
+        """
+        requirements = []
+        offsets = self.column("course_requirement_offsets")
+        for requirement_row in range(offsets[row], offsets[row + 1]):
+            subject_requirements = []
+            subject_offsets = self.column("requirement_subject_offsets")
+            for subject_row in range(subject_offsets[requirement_row], subject_offsets[requirement_row + 1]):
+                subject_requirements.append({
+                    "subject": self.value("subject", subject_row),
+                    "grade": self.value("subject_grade", subject_row)
+                })
+            # endfor
+            requirements.append({
+                "min_ucas_points": int(self.column("min_ucas_points")[requirement_row]),
+                "min_grade_required": self.value("min_grade_required", requirement_row),
+                "subject_requirements": subject_requirements,
+                "display_grades": self.value("display_grades", requirement_row),
+                "btec_grades": self.value("btec_grades", requirement_row),
+                "accepts_ucas": bool(self.column("accepts_ucas")[requirement_row]),
+                "has_requirements": bool(self.column("has_requirements")[requirement_row])
+            })
+        # endfor
+
+        return {
+            "name": self.text("course_name", row),
+            "course_type": self.value("course_type", row),
+            "duration": self.value("course_duration", row),
+            "mode": self.value("course_mode", row),
+            "location": self.value("course_location", row),
+            "start_date": self.value("course_start_date", row),
+            "link": self.text("course_link", row),
+            "requirements": requirements,
+            "fingerprint": self.text("course_fingerprint", row),
+            "fetched_at": int(self.column("course_fetched_at")[row])
+        }
+
+    # enddef
+
+    def university(self, row):
+        """
+        Rebuilds one university and its courses in the same shape as University.to_dict.
+
+        :param row: University row number
+        :return: University dictionary
+        """
+        offsets = self.column("university_course_offsets")
+        courses = []
+        for course_row in range(offsets[row], offsets[row + 1]):
+            courses.append(self.course(course_row))
+        # endfor
+        return {
+            "name": self.text("university_name", row),
+            "location": self.value("university_location", row),
+            "link": self.text("university_link", row),
+            "link_all_courses": self.text("university_link_all_courses", row),
+            "courses": courses
+        }
+    # enddef
+# endclass
+
+
+def main():
+    """
+    Exports the columns from a universities.json file.
+
+    :return: None
+    """
+    input_path = sys.argv[1] if len(sys.argv) > 1 else "universities.json"
+    output_path = sys.argv[2] if len(sys.argv) > 2 else "universities_columns"
+
+    counts = export_columns(iter_universities(input_path), output_path)
+    print(f"Exported {counts['universities']} universities, {counts['courses']} courses, "
+          f"{counts['requirements']} requirements and {counts['subjects']} subject requirements to {output_path}")
+
+
+# enddef
+
+if __name__ == "__main__":
+    main()
+# endif
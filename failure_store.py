@@ -0,0 +1,123 @@
+import sqlite3
+import threading
+import time
+
+
+class FailureStore:
+    """
+    Keeps every URL that failed during a crawl in a small SQLite database,
+    along with why it failed, how many attempts it took and which university and course it belongs to.
+    replay_failed.py reads it back to re-fetch only those pages.
+    """
+
+    def __init__(self, path="failed_urls.db"):
+        """
+        Opens (or creates) the failure database.
+
+        :param path: SQLite file to store failures in (default "failed_urls.db")
+        :return: None
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        # The store is shared by the fetch threads, the lock keeps writes one at a time
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS failed_urls ("
+            "url TEXT PRIMARY KEY, "
+            "reason TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "university TEXT NOT NULL DEFAULT '', "
+            "course TEXT NOT NULL DEFAULT '', "
+            "first_failed_at REAL NOT NULL, "
+            "last_failed_at REAL NOT NULL, "
+            "resolved INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_failed_university ON failed_urls (university)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_failed_resolved ON failed_urls (resolved)")
+        self._connection.commit()
+
+    # enddef
+
+    def record(self, url, reason, attempts=1, university="", course=""):
+        """
+        Saves a failure. If the URL has failed before, the attempts are added on and the reason updated.
+
+        :param url: The URL that failed
+        :param reason: Short reason for the failure
+        :param attempts: Number of attempts made before giving up (default 1)
+        :param university: Name of the university the page belongs to, if known
+        :param course: Name of the course the page belongs to, if known
+        :return: None
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO failed_urls (url, reason, attempts, university, course, first_failed_at, last_failed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (url) DO UPDATE SET "
+                "reason = excluded.reason, "
+                "attempts = failed_urls.attempts + excluded.attempts, "
+                "university = CASE WHEN excluded.university != '' THEN excluded.university ELSE failed_urls.university END, "
+                "course = CASE WHEN excluded.course != '' THEN excluded.course ELSE failed_urls.course END, "
+                "last_failed_at = excluded.last_failed_at, "
+                "resolved = 0",
+                (url, reason, attempts, university, course, now, now)
+            )
+            self._connection.commit()
+        # endwith
+
+    # enddef
+
+    def pending(self):
+        """
+        Gets every failure that hasn't been fixed by a replay yet.
+
+        :return: List of dictionaries with url, reason, attempts, university and course
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT url, reason, attempts, university, course FROM failed_urls "
+                "WHERE resolved = 0 ORDER BY university, first_failed_at"
+            ).fetchall()
+        # endwith
+
+        failures = []
+        for url, reason, attempts, university, course in rows:
+            failures.append({
+                "url": url,
+                "reason": reason,
+                "attempts": attempts,
+                "university": university,
+                "course": course
+            })
+        # endfor
+        return failures
+
+    # enddef
+
+    def mark_resolved(self, url):
+        """
+        Marks a failed URL as fixed so it isn't replayed again.
+
+        :param url: The URL that has now been fetched successfully
+        :return: None
+        """
+        with self._lock:
+            self._connection.execute("UPDATE failed_urls SET resolved = 1 WHERE url = ?", (url,))
+            self._connection.commit()
+        # endwith
+
+    # enddef
+
+    def close(self):
+        """
+        Closes the database connection.
+
+        :return: None
+        """
+        with self._lock:
+            self._connection.close()
+        # endwith
+    # enddef
+# endclass
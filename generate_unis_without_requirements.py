@@ -1,37 +1,8 @@
-import json
 from pathlib import Path
 
-
-def is_bachelor_course(course_type: str) -> bool:
-    """
-    Checks if a course type looks like a bachelor or integrated bachelor/masters.
-
-    :param course_type: Course type text from the JSON
-    :return: True if it is a bachelor-level course
-    """
-    if not course_type:
-        return False
-    # endif
-
-    text = course_type.strip().lower()
-
-    bachelor_keywords = [
-        "ba", "bsc", "beng", "llb", "bba", "bcs",
-        "bachelor", "certhe", "diphe", "fda", "fdsc",
-        # integrated masters that still use A-level requirements
-        "meng", "msci", "mphys", "mchem", "mmath"
-    ]
-
-    for keyword in bachelor_keywords:
-        if keyword in text:
-            return True
-        # endif
-    # endfor
-
-    return False
-
-
-# enddef
+from JSONReader import iter_universities
+from progress_journal import fold_journal
+from university_index import has_missing_bachelor_requirements, is_bachelor_course, read_index
 
 
 def has_any_requirements(courses: list[dict]) -> bool:
@@ -69,32 +40,6 @@ def has_any_requirements(courses: list[dict]) -> bool:
     return False
 
 
-# enddef
-
-def has_missing_bachelor_requirements(courses: list[dict]) -> bool:
-    """
-    Checks whether any bachelor-level course is missing entry requirements.
-
-    :param courses: List of course dictionaries from the JSON file
-    :return: True if any bachelor course has empty requirements
-    """
-    for course in courses:
-        course_type = course.get("course_type") or ""
-        if not is_bachelor_course(course_type):
-            continue
-        # endif
-
-        requirements = course.get("requirements")
-        if requirements is None:
-            requirements = []
-        # endif
-        if not requirements:
-            return True
-        # endif
-    # endfor
-    return False
-
-
 # enddef
 
 
@@ -107,10 +52,32 @@ def main() -> None:
     input_path = Path("universities.json")
     output_path = Path("unis_without_requirements.txt")
 
-    data = json.loads(input_path.read_text())
+    # Universities saved since the crawl last compacted are only in the journal
+    folded = fold_journal(str(input_path))
+    if folded:
+        print(f"Folded {folded} universities from the progress journal into {input_path}")
+    # endif
+
+    # The summary index already says which universities are missing bachelor requirements,
+    # so the whole JSON file only has to be read if there is no up to date index
+    index = read_index(str(input_path))
+    if index is not None:
+        entries, _ = index
+        missing = []
+        for entry in entries:
+            if entry["name"] and entry["missing_bachelor"]:
+                missing.append(entry["name"])
+            # endif
+        # endfor
+
+        output_path.write_text("\n".join(missing))
+        print(f"Wrote {len(missing)} university names to {output_path}")
+        return
+    # endif
 
+    # Read one university at a time so a huge file never has to fit in memory
     missing = []
-    for uni in data:
+    for uni in iter_universities(input_path):
         if not isinstance(uni, dict):
             continue
         # endif
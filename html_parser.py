@@ -0,0 +1,147 @@
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Use lxml if it is installed because it builds the tree in C and is a lot faster,
+# otherwise fall back to Python's built-in html.parser
+try:
+    import lxml  # noqa: F401
+
+    PARSER_BACKEND = "lxml"
+except ImportError:
+    PARSER_BACKEND = "html.parser"
+# endtry
+
+# The only parts of a search results page we ever read
+LISTING_CLASSES = ["content__details", "pagination__list"]
+
+# The divs of a course page that hold its course options (tables are kept as well)
+OPTIONS_CLASSES = ["options-bar", "options-bar-custom"]
+
+
+def is_listing_element(class_value):
+    """
+    Checks whether an element is a result card or the pagination list.
+    While parsing, the class attribute can still be one string like "card content__details",
+    so it is split into separate class names first.
+
+    :param class_value: The element's class attribute (string, list or None)
+    :return: True if the element should be kept
+    """
+    if not class_value:
+        return False
+    # endif
+
+    if isinstance(class_value, str):
+        class_value = class_value.split()
+    # endif
+
+    for class_name in class_value:
+        if class_name in LISTING_CLASSES:
+            return True
+        # endif
+    # endfor
+    return False
+
+
+# enddef
+
+def is_options_tag(name, attrs=None):
+    """
+    Checks whether a tag is an options bar or a table, the only places course options are read from.
+
+    :param name: Tag name
+    :param attrs: Dictionary of the tag's attributes (the class can still be one string while parsing)
+    :return: True if the tag should be kept
+    """
+    if name == "table":
+        return True
+    # endif
+    if name != "div" or not attrs:
+        return False
+    # endif
+
+    class_value = attrs.get("class")
+    if not class_value:
+        return False
+    # endif
+    if isinstance(class_value, str):
+        class_value = class_value.split()
+    # endif
+
+    for class_name in class_value:
+        if class_name in OPTIONS_CLASSES:
+            return True
+        # endif
+    # endfor
+    return False
+
+
+# enddef
+
+
+class OptionsStrainer(SoupStrainer):
+    """
+    Only lets options bars and tables (and everything inside them) into the tree while a course page is parsed.
+    """
+
+    def __init__(self):
+        """
+        Creates the strainer. Versions of bs4 before 4.13 call the name function with the tag's name and attributes.
+
+        :return: None
+        """
+        super().__init__(is_options_tag)
+
+    # enddef
+
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        """
+        Called by bs4 4.13 and later before each top-level tag is made.
+
+        :param nsprefix: Namespace prefix of the tag
+        :param name: Tag name
+        :param attrs: Dictionary of the tag's attributes
+        :return: True if the tag should be kept
+        """
+        return is_options_tag(name, attrs)
+    # enddef
+
+
+# endclass
+
+def make_soup(markup):
+    """
+    Builds a full BeautifulSoup tree with the fastest parser available.
+
+    :param markup: HTML text (or bytes) of the page
+    :return: BeautifulSoup object
+    """
+    return BeautifulSoup(markup, PARSER_BACKEND)
+
+
+# enddef
+
+def make_listing_soup(markup):
+    """
+    Builds a BeautifulSoup tree that only contains the result cards (div.content__details)
+    and the pagination list (ul.pagination__list) of a search results page.
+    Everything else on the page (navigation, footer, scripts) is skipped while parsing,
+    so far fewer tags are created.
+
+    :param markup: HTML text (or bytes) of the search results page
+    :return: BeautifulSoup object holding only the cards and pagination
+    """
+    return BeautifulSoup(markup, PARSER_BACKEND, parse_only=SoupStrainer(class_=is_listing_element))
+
+
+# enddef
+
+def make_options_soup(markup):
+    """
+    Builds a BeautifulSoup tree that only contains the options bars (div.options-bar and
+    div.options-bar-custom) and tables of a course page, which is all Course.read_course_options needs.
+
+    :param markup: HTML text (or bytes) of the course page
+    :return: BeautifulSoup object holding only the options bars and tables
+    """
+    return BeautifulSoup(markup, PARSER_BACKEND, parse_only=OptionsStrainer())
+# enddef
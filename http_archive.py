@@ -0,0 +1,260 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+from response_cache import ResponseCache
+
+# Only these headers are kept with an archived page, the rest aren't needed to rebuild it
+KEPT_HEADERS = ["Content-Type", "ETag", "Last-Modified", "Date"]
+
+# How much of the archive is read at a time when the index has to be rebuilt by scanning it
+SCAN_CHUNK_SIZE = 1024 * 1024
+
+
+class HttpArchive:
+    """
+    Records every page a crawl downloads into one compact archive file, and can serve a crawl
+    back from that file with no network access at all (like a WARC file).
+
+    Each record is its own gzip member holding a JSON header line and then the raw body, so the
+    archive is just the records appended one after another. A small ".idx" file next to it stores
+    the offset, length and body hash of every record, so replay can jump straight to the page it needs
+    and recording can skip a page whose body is the same as the copy already archived (e.g. one served
+    from the response cache on a rerun). If the same URL was recorded more than once, the latest copy is used.
+    """
+
+    def __init__(self, path="crawl_archive.gz", mode="record"):
+        """
+        Opens an archive for recording or replaying.
+
+        :param path: Archive file path (default "crawl_archive.gz")
+        :param mode: "record" to append downloaded pages, "replay" to serve pages from the archive
+        :return: None
+        """
+        if mode not in ["record", "replay"]:
+            raise ValueError(f"Unknown archive mode: {mode}")
+        # endif
+
+        self.path = path
+        self.index_path = path + ".idx"
+        self.mode = mode
+
+        # url -> (offset, length) of the latest record for that URL
+        self.index: dict[str, tuple[int, int]] = {}
+
+        # url -> SHA-1 of the body of the latest record for that URL (missing for records from old indexes)
+        self.body_hashes: dict[str, str] = {}
+
+        # Where the last complete record ends, if the index had to be rebuilt by scanning the archive
+        self.scanned_end = None
+        self._lock = threading.Lock()
+
+        if mode == "replay":
+            self._load_index()
+            self._file = open(self.path, "rb")
+        else:
+            # Pages already in the archive are needed to tell whether a page has changed
+            rebuilt = os.path.exists(self.path) and not os.path.exists(self.index_path)
+            if os.path.exists(self.path):
+                self._load_index()
+            # endif
+
+            # A crash part way through writing a record leaves half a gzip member at the end.
+            # It is cut off so the next record doesn't follow on from a broken one
+            if rebuilt and self.scanned_end < os.path.getsize(self.path):
+                print(f"Dropping an incomplete record at the end of {self.path}")
+                os.truncate(self.path, self.scanned_end)
+            # endif
+            self._file = open(self.path, "ab")
+            self._index_file = open(self.index_path, "a", encoding="utf-8")
+
+            # An index rebuilt by scanning is saved, otherwise it would only list the pages recorded from now on
+            if rebuilt:
+                for url, (offset, length) in sorted(self.index.items(), key=lambda item: item[1][0]):
+                    self._index_file.write(f"{offset}\t{length}\t{self.body_hashes[url]}\t{url}\n")
+                # endfor
+                self._index_file.flush()
+            # endif
+        # endif
+
+    # enddef
+
+    def _load_index(self):
+        """
+        Reads the ".idx" file, or rebuilds the index (and body hashes) by scanning the archive if it is missing.
+
+        :return: None
+        """
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    # Lines are "offset, length, body hash, url", or "offset, length, url" in older indexes
+                    parts = line.rstrip("\n").split("\t", 3)
+                    if len(parts) == 4:
+                        offset, length, body_hash, url = parts
+                        self.body_hashes[url] = body_hash
+                    elif len(parts) == 3:
+                        offset, length, url = parts
+                        self.body_hashes.pop(url, None)
+                    else:
+                        continue
+                    # endif
+                    self.index[url] = (int(offset), int(length))
+                # endfor
+            # endwith
+            return
+        # endif
+
+        # No index, so rebuild it by scanning the archive
+        self._scan_archive()
+
+    # enddef
+
+    def _scan_archive(self):
+        """
+        Walks through the gzip members of the archive one by one to find where each record starts.
+        The file is read a chunk at a time, so the scan takes one pass however big the archive is.
+        It stops at a record that is cut off or can't be read (e.g. after a crash part way through
+        writing it) and sets scanned_end to where the last complete record ends.
+
+        :return: None
+        """
+        offset = 0
+        with open(self.path, "rb") as f:
+            pending = b""
+            while True:
+                # Decompress one member, feeding it chunks until the end of its gzip stream
+                decompressor = zlib.decompressobj(wbits=31)
+                record_parts = []
+                length = 0
+                try:
+                    while not decompressor.eof:
+                        chunk = pending or f.read(SCAN_CHUNK_SIZE)
+                        pending = b""
+                        if not chunk:
+                            break
+                        # endif
+                        record_parts.append(decompressor.decompress(chunk))
+                        length += len(chunk)
+                    # endwhile
+                except zlib.error:
+                    break
+                # endtry
+
+                if not decompressor.eof:
+                    # Either the end of the archive, or a record that was cut off
+                    break
+                # endif
+
+                # Whatever came after the end of this member is the start of the next one
+                pending = decompressor.unused_data
+                length -= len(pending)
+
+                record = b"".join(record_parts)
+                if b"\n" not in record:
+                    break
+                # endif
+                header_line, body = record.split(b"\n", 1)
+                try:
+                    url = json.loads(header_line)["url"]
+                except (ValueError, KeyError, TypeError):
+                    break
+                # endtry
+
+                self.index[url] = (offset, length)
+                self.body_hashes[url] = hashlib.sha1(body).hexdigest()
+                offset += length
+            # endwhile
+        # endwith
+        self.scanned_end = offset
+
+    # enddef
+
+    def record(self, url, response):
+        """
+        Appends a downloaded page to the archive, unless the latest copy of the URL has the same body.
+
+        :param url: The URL that was requested
+        :param response: The Response object to archive
+        :return: None
+        """
+        body_hash = hashlib.sha1(response.content).hexdigest()
+        with self._lock:
+            if self.body_hashes.get(url) == body_hash:
+                return
+            # endif
+        # endwith
+
+        stored_headers = {}
+        for header_name in KEPT_HEADERS:
+            value = response.headers.get(header_name)
+            if value:
+                stored_headers[header_name] = value
+            # endif
+        # endfor
+
+        header = {
+            "url": url,
+            "status_code": response.status_code,
+            "encoding": response.encoding,
+            "headers": stored_headers,
+            "recorded_at": time.time()
+        }
+        record_bytes = gzip.compress(json.dumps(header).encode("utf-8") + b"\n" + response.content)
+
+        with self._lock:
+            # Another thread may have archived the same page while this one was compressing it
+            if self.body_hashes.get(url) == body_hash:
+                return
+            # endif
+            offset = self._file.tell()
+            self._file.write(record_bytes)
+            self._file.flush()
+            self._index_file.write(f"{offset}\t{len(record_bytes)}\t{body_hash}\t{url}\n")
+            self._index_file.flush()
+            self.index[url] = (offset, len(record_bytes))
+            self.body_hashes[url] = body_hash
+        # endwith
+
+    # enddef
+
+    def replay(self, url):
+        """
+        Reads a page back out of the archive.
+
+        :param url: The URL being requested
+        :return: Response object rebuilt from the archive, or None if the URL was never recorded
+        """
+        if url not in self.index:
+            return None
+        # endif
+
+        offset, length = self.index[url]
+        with self._lock:
+            self._file.seek(offset)
+            record_bytes = self._file.read(length)
+        # endwith
+
+        header_line, body = gzip.decompress(record_bytes).split(b"\n", 1)
+        return ResponseCache.build_response((json.loads(header_line), body))
+
+    # enddef
+
+    def close(self):
+        """
+        Closes the archive files.
+
+        :return: None
+        """
+        with self._lock:
+            self._file.close()
+            if self.mode == "record":
+                self._index_file.close()
+            # endif
+        # endwith
+    # enddef
+# endclass
@@ -1,10 +1,12 @@
-import json
-import re
+import hashlib
+import time
+from email.utils import parsedate_to_datetime
 
-from bs4 import BeautifulSoup
 from requests import Response
 from .EntryRequirement import EntryRequirement
 from network_helper import get_with_retry
+from html_parser import make_options_soup, make_soup
+from requirement_extractor import extract_course_page, extract_json_ld_requirements
 
 
 class Course:
@@ -28,10 +30,49 @@ class Course:
         self.start_date = ""
         self.link = ""
 
+        # Hash of the course's card on the results page, so a refresh can tell if the course has changed
+        self.fingerprint = ""
+        # When the course page was downloaded (seconds since 1970), 0 if it never has been
+        self.fetched_at = 0
+
         self.requirements: [EntryRequirement] = []
 
     # enddef
 
+    @staticmethod
+    def card_fingerprint(card_texts):
+        """
+        Makes a fingerprint of the text on a course's card (name, link, details line and tariff).
+        If any of it changes on UCAS the fingerprint changes too.
+
+        :param card_texts: List of text from the card
+        :return: Hex string
+        """
+        return hashlib.sha1("\n".join(card_texts).encode("utf-8")).hexdigest()
+
+    # enddef
+
+    @staticmethod
+    def page_fetched_at(response):
+        """
+        Works out when a course page was downloaded, from its Date header if it has one
+        (a page from the disk cache or the crawl archive was downloaded before this run).
+
+        :param response: Response of the course page
+        :return: Seconds since 1970
+        """
+        date_header = response.headers.get("Date")
+        if date_header:
+            try:
+                return int(parsedate_to_datetime(date_header).timestamp())
+            except (TypeError, ValueError):
+                pass
+            # endtry
+        # endif
+        return int(time.time())
+
+    # enddef
+
     def print(self):
         """
         Prints the course link and entry requirements to the console.
@@ -43,16 +84,19 @@ class Course:
 
     # enddef
 
-    def fetch_requirements(self, headers):
+    def fetch_requirements(self, headers, session=None, university_name=""):
         """
         Visits the specific webpage for this course to get the entry requirements.
         Checks for different HTML structures like 'options-bar' divs or tables.
 
         :param headers: Request headers dictionary for HTTP requests
+        :param session: Optional shared session so connections are reused across pages
+        :param university_name: Name of the university this course belongs to, recorded if the page fails
         :return: None
         """
 
-        single_course_page: Response = get_with_retry(self.link, headers)
+        single_course_page: Response = get_with_retry(self.link, headers, session=session,
+                                                      university=university_name, course=self.name)
 
         # Check if the request failed
         if single_course_page is None:
@@ -61,14 +105,64 @@ class Course:
             return
         # endif
 
-        single_course_soup = BeautifulSoup(single_course_page.text, "html.parser")
+        self.parse_requirements(single_course_page.text)
+        self.fetched_at = Course.page_fetched_at(single_course_page)
+
+    # enddef
+
+    def parse_requirements(self, page_html, use_json_ld=True):
+        """
+        Reads the course details and entry requirements out of an already downloaded course page.
+        This is split from fetch_requirements so pages fetched concurrently can be parsed the same way.
+
+        :param page_html: HTML text (or bytes) of the course page
+        :param use_json_ld: Try the JSON-LD fast path before building a tree (default True)
+        :return: None
+        """
+        # Most course pages have all their requirements in their JSON-LD, which is much quicker to read
+        # than building the whole tree. The course options still come from the page itself, from a
+        # tree of just the options bars and tables
+        if use_json_ld:
+            requirement_texts = extract_json_ld_requirements(page_html)
+            if requirement_texts is not None:
+                options_soup = make_options_soup(page_html)
+                options_bar = options_soup.find("div", class_="options-bar")
+                if not options_bar:
+                    options_bar = options_soup.find("div", class_="options-bar-custom")
+                # endif
+                self.read_course_options(options_bar, options_soup.find("table"))
+                self.add_parsed_requirements(requirement_texts)
+                return
+            # endif
+        # endif
+
+        single_course_soup = make_soup(page_html)
+
+        # One walk over the page collects everything we need below
+        page_parts = extract_course_page(single_course_soup)
 
-        # Look for course options information in different places
         # Check for the options bar with course details
-        options_bar = single_course_soup.find("div", class_="options-bar")
+        options_bar = page_parts.options_bar
         if not options_bar:
-            options_bar = single_course_soup.find("div", class_="options-bar-custom")
+            options_bar = page_parts.options_bar_custom
+        # endif
+        self.read_course_options(options_bar, page_parts.options_table)
+
+        # Requirement snippets from accordions, requirement sections, tables, definition lists,
+        # text around requirement keywords and JSON-LD, with repeated snippets removed
+        self.add_parsed_requirements(page_parts.requirement_texts)
 
+    # enddef
+
+    def read_course_options(self, options_bar, course_options_table):
+        """
+        Reads the course details (qualification, location, start date, study mode and duration)
+        from the options bar and the first row of the course options table.
+
+        :param options_bar: div.options-bar (or div.options-bar-custom) element, or None
+        :param course_options_table: First table on the page, or None
+        :return: None
+        """
         if options_bar:
             # Extract course details from data-options-bar-item-value attributes
             # Find all elements that have the data-options-bar-item-value attribute
@@ -101,7 +195,6 @@ class Course:
             # endif
 
         # Check if there's a course options table (for courses with multiple options)
-        course_options_table = single_course_soup.find("table")
         if course_options_table:
             # Extract course details from the first row in the table
             tbody = course_options_table.find("tbody")
@@ -138,167 +231,15 @@ class Course:
             # endif
         # endif
 
-        # Try multiple selectors for entry requirements
-        requirement_texts = []
-
-        # Look for accordion labels AND their detailed content (common on UCAS)
-        accordion_labels = single_course_soup.find_all("h2", class_="accordion__label")
-        for label in accordion_labels:
-            # Check if any of the qualifications are in the label text
-            found_qual = False
-            for qual in ["A level", "UCAS", "BTEC"]:
-                if qual in label.text:
-                    found_qual = True
-                    break
-                # endif
-            # endfor
-            if found_qual:
-                # Add the label text
-                requirement_texts.append(label.text.strip())
-
-                # Also try to get the detailed content from the accordion
-                # Find the parent accordion item
-                accordion_item = label.find_parent("li", class_="accordion__child")
-                if accordion_item:
-                    # Look for the accordion content div
-                    content_div = accordion_item.find("div", class_="accordion__inner-wrapper")
-                    if content_div:
-                        detailed_text = content_div.get_text(strip=True)
-                        if detailed_text and len(detailed_text) < 1000:  # Reasonable length
-                            requirement_texts.append(detailed_text)
-                            # print(f"Found detailed accordion content: {detailed_text[:150]}...")
-                        # endif
-                    # endif
-                # endif
-            # endif
-        # endfor
-
-        # Look for requirement sections
-        # Find sections with class names containing requirement words
-        all_divs = single_course_soup.find_all("div")
-        req_sections = []
-        for div in all_divs:
-            if div.has_attr("class"):
-                class_names = div.get("class", [])
-                for class_name in class_names:
-                    class_name_lower = class_name.lower()
-                    if ("requirement" in class_name_lower or
-                            "entry" in class_name_lower or
-                            "qualification" in class_name_lower):
-                        req_sections.append(div)
-                        break
-                    # endif
-                # endfor
-            # endif
-        # endfor
-
-        for section in req_sections:
-            text = section.get_text(strip=True)
-            if text and len(text) < 1500:  # Skip really long text
-                requirement_texts.append(text)
-            # endif
-        # endfor
-
-        # Capture requirement tables where labels and grades are in separate cells
-        for row in single_course_soup.find_all("tr"):
-            cells = row.find_all(["th", "td"])
-            if len(cells) < 2:
-                continue
-            # endif
-            left_text = cells[0].get_text(" ", strip=True)
-            right_text = cells[1].get_text(" ", strip=True)
-            if not left_text or not right_text:
-                continue
-            # endif
-            if re.search(r"A\s*[-–]?\s*levels?|UCAS\s*Tariff|BTEC", left_text, re.IGNORECASE):
-                combined_row = f"{left_text} {right_text}"
-                if len(combined_row) < 500:
-                    requirement_texts.append(combined_row)
-                # endif
-            # endif
-        # endfor
-
-        # Capture definition lists (dt/dd pairs) for entry requirements
-        for dl in single_course_soup.find_all("dl"):
-            dts = dl.find_all("dt")
-            dds = dl.find_all("dd")
-            for dt, dd in zip(dts, dds):
-                left_text = dt.get_text(" ", strip=True)
-                right_text = dd.get_text(" ", strip=True)
-                if not left_text or not right_text:
-                    continue
-                # endif
-                if re.search(r"A\s*[-–]?\s*levels?|UCAS\s*Tariff|BTEC", left_text, re.IGNORECASE):
-                    combined_pair = f"{left_text} {right_text}"
-                    if len(combined_pair) < 500:
-                        requirement_texts.append(combined_pair)
-                    # endif
-                # endif
-            # endfor
-        # endfor
-
-        # Fallback: grab nearby text around key requirement keywords
-        keyword_pattern = re.compile(r"A\s*[-–]?\s*levels?|UCAS\s*Tariff|BTEC", re.IGNORECASE)
-        for text_node in single_course_soup.find_all(string=keyword_pattern):
-            parent = text_node.parent
-            if not parent:
-                continue
-            # endif
-            candidate = parent.get_text(" ", strip=True)
-            if candidate and len(candidate) < 500:
-                requirement_texts.append(candidate)
-            # endif
-        # endfor
-
-        # JSON-LD fallback (UCAS often embeds structured requirements here)
-        json_ld_requirements = []
-        for script in single_course_soup.find_all("script", type="application/ld+json"):
-            raw = script.string
-            if not raw:
-                continue
-            # endif
-            try:
-                data = json.loads(raw)
-            except Exception:
-                continue
-            # endtry
-
-            items = data if isinstance(data, list) else [data]
-            for item in items:
-                if not isinstance(item, dict):
-                    continue
-                # endif
-                if item.get("@type") != "Course":
-                    continue
-                # endif
-                prereqs = item.get("coursePrerequisites") or []
-                if not isinstance(prereqs, list):
-                    continue
-                # endif
-                for prereq in prereqs:
-                    if not isinstance(prereq, dict):
-                        continue
-                    # endif
-                    framework = prereq.get("educationalFramework") or ""
-                    target = prereq.get("targetName") or ""
-                    if not framework or not target:
-                        continue
-                    # endif
-                    framework_lower = framework.lower()
-                    if "a level" in framework_lower:
-                        json_ld_requirements.append(f"A level - {target}")
-                    elif "btec" in framework_lower:
-                        json_ld_requirements.append(f"BTEC - {target}")
-                    elif "ucas tariff" in framework_lower:
-                        json_ld_requirements.append(f"UCAS Tariff - {target}")
-                    # endif
-                # endfor
-            # endfor
-        # endfor
+    # enddef
 
-        if json_ld_requirements:
-            requirement_texts.extend(json_ld_requirements)
+    def add_parsed_requirements(self, requirement_texts):
+        """
+        Combines the requirement snippets found on a course page and parses them into one EntryRequirement.
 
+        :param requirement_texts: List of requirement snippets
+        :return: None
+        """
         # Parse all requirement texts and combine into one requirement
         if requirement_texts:
             # Combine all requirement texts into one string
@@ -366,6 +307,39 @@ class Course:
     #     # endif
     # enddef
 
+    @staticmethod
+    def from_dict(course_dict: dict) -> 'Course':
+        """
+        Rebuilds a Course object from a dictionary made by to_dict (e.g. loaded from universities.json).
+
+        :param course_dict: Dictionary containing course information
+        :return: Course object
+        """
+        course = Course()
+        course.name = course_dict.get("name") or ""
+        course.course_type = course_dict.get("course_type") or ""
+        course.duration = course_dict.get("duration") or ""
+        course.mode = course_dict.get("mode") or ""
+        course.location = course_dict.get("location") or ""
+        course.start_date = course_dict.get("start_date") or ""
+        course.link = course_dict.get("link") or ""
+        course.fingerprint = course_dict.get("fingerprint") or ""
+        course.fetched_at = course_dict.get("fetched_at") or 0
+
+        requirements = course_dict.get("requirements")
+        if requirements is None:
+            requirements = []
+        # endif
+        for requirement_dict in requirements:
+            if isinstance(requirement_dict, dict):
+                course.requirements.append(EntryRequirement.from_dict(requirement_dict))
+            # endif
+        # endfor
+
+        return course
+
+    # enddef
+
     def to_dict(self):
         """
         Converts the Course object to a dictionary representation.
@@ -386,7 +360,9 @@ class Course:
             "location": self.location,
             "start_date": self.start_date,
             "link": self.link,
-            "requirements": requirements_list
+            "requirements": requirements_list,
+            "fingerprint": self.fingerprint,
+            "fetched_at": self.fetched_at
         }
         return result
     # enddef
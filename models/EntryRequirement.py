@@ -3,27 +3,42 @@ This module handles entry requirements for university courses.
 It can parse text from UCAS and calculate UCAS points from A-level and BTEC grades.
 """
 
+import hashlib
 import re
+import threading
+from collections import OrderedDict
 
-# UCAS Tariff Points for A-level grades
-# Each A-level grade has a certain number of points
-A_LEVEL_POINTS = {
-    'A*': 56,  # Top grade
-    'A': 48,
-    'B': 40,
-    'C': 32,
-    'D': 24,
-    'E': 16  # Lowest passing grade
-}
-
-# BTEC grade values for calculating UCAS points
-# BTEC qualifications have different grades from A-levels
-BTEC_GRADE_VALUES = {
-    'D*': 56,  # Distinction* (highest)
-    'D': 48,  # Distinction
-    'M': 32,  # Merit
-    'P': 16  # Pass (lowest)
-}
+# The tariff tables live in TariffEngine, A_LEVEL_POINTS and BTEC_GRADE_VALUES are imported
+# here as well so code that used them from this module still works
+from .TariffEngine import A_LEVEL_POINTS, BTEC_GRADE_VALUES, tariff_engine
+
+# Phrases that mean a course has no entry requirements we can use
+NO_REQUIREMENT_PHRASES = [
+    "no formal", "no specific", "no requirement", "requirements not specified",
+    "not available",
+    # Handle partial text issues
+    "n/a"
+]
+
+# r'A\s*levels?\s*[:–-]?\s*' matches "A level", "A levels", with optional colon/dash
+# ([A-Z*]{3,}) matches the grade letters like AAB or BCC
+# (?:...)? is optional and catches ranges like BCC-BBB
+A_LEVEL_PATTERN = re.compile(r'A\s*[-–]?\s*levels?\s*[:–-]?\s*([A-Z*]{3,}(?:\s*[-–]\s*[A-Z*]{3,})?)', re.IGNORECASE)
+
+# r'UCAS\s+Tariff\s*[-–]\s*' matches "UCAS Tariff -"
+# (\d+) grabs the first number (minimum points)
+# (?:\s*[-–]\s*(\d+))? optionally grabs second number for ranges like "112-128"
+# \s*points? allows "points" or "point" at the end
+UCAS_TARIFF_PATTERN = re.compile(r'UCAS\s+Tariff\s*[-–]\s*(\d+)(?:\s*[-–]\s*(\d+))?\s*points?', re.IGNORECASE)
+
+# "BTEC ... - DDM - DMM" or "BTEC ... - MMP"
+BTEC_PATTERN = re.compile(r'BTEC.*?[-–]\s*([D*MP]+)(?:\s*[-–]\s*([D*MP]+))?', re.IGNORECASE)
+
+# Where the subject list after "including" ends
+INCLUDING_TERMINATORS = [" at grade", ".", ",", ")", "(", " Further Mathematics is"]
+
+# A word with any of these in it counts as a grade in "A* in Mathematics"
+GRADE_CHARACTERS = frozenset("ABCDE*/")
 
 
 class SubjectRequirement:
@@ -52,11 +67,118 @@ class SubjectRequirement:
         :return: Dictionary with 'subject' and 'grade' keys
         """
         return {"subject": self.subject, "grade": self.grade}
+
+    # enddef
+
+    @staticmethod
+    def from_dict(subject_dict: dict) -> 'SubjectRequirement':
+        """
+        Rebuilds a subject requirement from a dictionary made by to_dict.
+
+        :param subject_dict: Dictionary with 'subject' and 'grade' keys
+        :return: SubjectRequirement object
+        """
+        return SubjectRequirement(subject_dict.get("subject") or "", subject_dict.get("grade") or "")
+    # enddef
+
+
+# endclass
+
+class ParseCache:
+    """
+    Remembers the results of EntryRequirement.parse for recently seen requirement texts.
+    Lots of courses (e.g. every course in a department) have exactly the same requirement text,
+    so most of them don't need parsing again. Results are keyed on a hash of the cleaned text,
+    and only the most recent max_entries are kept so memory stays bounded.
+    """
+
+    def __init__(self, max_entries=4096):
+        """
+        Creates an empty cache.
+
+        :param max_entries: Maximum number of parse results kept (default 4096)
+        :return: None
+        """
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    # enddef
+
+    @staticmethod
+    def make_key(cleaned_text: str) -> bytes:
+        """
+        Makes the cache key for a cleaned requirement text.
+
+        :param cleaned_text: Text returned by EntryRequirement.clean_requirement_text
+        :return: SHA-256 digest of the text
+        """
+        return hashlib.sha256(cleaned_text.encode("utf-8")).digest()
+
     # enddef
 
+    def lookup(self, key: bytes):
+        """
+        Gets a copy of a remembered parse result.
+
+        :param key: Key from make_key
+        :return: EntryRequirement the caller can change freely, or None if the text hasn't been seen
+        """
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is None:
+                self.misses += 1
+                return None
+            # endif
+            self.hits += 1
+            self._results.move_to_end(key)
+        # endwith
+        return cached.copy()
+
+    # enddef
+
+    def store(self, key: bytes, requirement: 'EntryRequirement') -> None:
+        """
+        Remembers a parse result. A copy is kept so later changes to the caller's object don't affect it.
+
+        :param key: Key from make_key
+        :param requirement: EntryRequirement returned by the parse
+        :return: None
+        """
+        cached = requirement.copy()
+        with self._lock:
+            self._results[key] = cached
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+            # endwhile
+        # endwith
 
+    # enddef
+
+    def stats(self):
+        """
+        Gets the hit and miss counters for this run.
+
+        :return: Dictionary with hits, misses, hit_rate (0 to 1) and entries
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            hit_rate = self.hits / total if total else 0.0
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": hit_rate, "entries": len(self._results)}
+        # endwith
+    # enddef
 # endclass
 
+
+# Shared by every parse in this process
+parse_cache = ParseCache()
+
+
 class EntryRequirement:
     """
     Stores all the entry requirements for a university course.
@@ -140,34 +262,64 @@ class EntryRequirement:
 
     # enddef
 
-    def calculate_a_level_points(self, grades: str) -> int:
+    @staticmethod
+    def from_dict(requirement_dict: dict) -> 'EntryRequirement':
         """
-        Calculates UCAS points from A-level grades.
+        Rebuilds an entry requirement from a dictionary made by to_dict (e.g. loaded from universities.json).
 
-        :param grades: A string of A-level grades (e.g., "AAB", "A*AA", "BCC")
-        :return: Total UCAS points for these grades
+        :param requirement_dict: Dictionary containing requirement information
+        :return: EntryRequirement object
         """
-        if not grades:
-            return 0
+        req = EntryRequirement()
+        req.min_ucas_points = requirement_dict.get("min_ucas_points") or 0
+        req.min_grade_required = requirement_dict.get("min_grade_required") or ""
+        req.display_grades = requirement_dict.get("display_grades") or ""
+        req.btec_grades = requirement_dict.get("btec_grades") or ""
+        req.accepts_ucas = requirement_dict.get("accepts_ucas", True)
+        req.has_requirements = requirement_dict.get("has_requirements", False)
+
+        subject_requirements = requirement_dict.get("subject_requirements")
+        if subject_requirements is None:
+            subject_requirements = []
         # endif
+        for subject_dict in subject_requirements:
+            if isinstance(subject_dict, dict):
+                req.subject_requirements.append(SubjectRequirement.from_dict(subject_dict))
+            # endif
+        # endfor
 
-        total_points = 0
-        grades = grades.strip().upper()
+        return req
 
-        # Handle A* grades
-        while 'A*' in grades:
-            total_points += A_LEVEL_POINTS['A*']
-            grades = grades.replace('A*', '', 1)
-        # endwhile
+    # enddef
 
-        # Process remaining grades
-        for grade in grades:
-            if grade in A_LEVEL_POINTS:
-                total_points += A_LEVEL_POINTS[grade]
-            # endif
+    def copy(self) -> 'EntryRequirement':
+        """
+        Makes a copy of this entry requirement with its own list of subject requirements.
+
+        :return: EntryRequirement object
+        """
+        req = EntryRequirement()
+        req.min_ucas_points = self.min_ucas_points
+        req.min_grade_required = self.min_grade_required
+        req.display_grades = self.display_grades
+        req.btec_grades = self.btec_grades
+        req.accepts_ucas = self.accepts_ucas
+        req.has_requirements = self.has_requirements
+        for subject_req in self.subject_requirements:
+            req.subject_requirements.append(SubjectRequirement(subject_req.subject, subject_req.grade))
         # endfor
+        return req
+
+    # enddef
 
-        return total_points
+    def calculate_a_level_points(self, grades: str) -> int:
+        """
+        Calculates UCAS points from A-level grades.
+
+        :param grades: A string of A-level grades (e.g., "AAB", "A*AA", "BCC")
+        :return: Total UCAS points for these grades
+        """
+        return tariff_engine.a_level_points(grades)
 
     # enddef
 
@@ -178,36 +330,7 @@ class EntryRequirement:
         :param grades: A string of A-level grades (e.g., "AAB", "BCC")
         :return: The lowest grade found (e.g., "B", "C")
         """
-        if not grades:
-            return ""
-        # endif
-
-        grades = grades.strip().upper()
-        grade_order = ['A*', 'A', 'B', 'C', 'D', 'E']
-        lowest_grade = ""
-        lowest_index = -1
-
-        # Handle A* grades
-        while 'A*' in grades:
-            if lowest_index < grade_order.index('A*'):
-                lowest_grade = 'A*'
-                lowest_index = grade_order.index('A*')
-            # endif
-            grades = grades.replace('A*', '', 1)
-        # endwhile
-
-        # Check remaining grades
-        for grade in grades:
-            if grade in grade_order:
-                grade_index = grade_order.index(grade)
-                if grade_index > lowest_index:
-                    lowest_grade = grade
-                    lowest_index = grade_index
-                # endif
-            # endif
-        # endfor
-
-        return lowest_grade
+        return tariff_engine.lowest_grade(grades)
 
     # enddef
 
@@ -219,32 +342,7 @@ class EntryRequirement:
         :param grades: A string of BTEC grades (e.g., "DDD", "DMM", "D*D*D*")
         :return: Total UCAS points for these BTEC grades
         """
-        if not grades:
-            return 0
-        # endif
-
-        total = 0
-
-        # Normalize by capitalizing it always
-        grades = grades.upper()
-
-        # Handle D* grades first as it's different
-        # from the single letter grades
-        while 'D*' in grades:
-            total += BTEC_GRADE_VALUES['D*']
-
-            # remove it once handled
-            grades = grades.replace('D*', '', 1)
-        # endwhile
-
-        # Process remaining single grades
-        for grade in grades:
-            if grade in BTEC_GRADE_VALUES:
-                total += BTEC_GRADE_VALUES[grade]
-            # endif
-        # endfor
-
-        return total
+        return tariff_engine.btec_points(grades)
 
     # enddef
 
@@ -283,12 +381,15 @@ class EntryRequirement:
         Takes requirement text from UCAS and converts it into an EntryRequirement object.
         Parses A-level grades, UCAS tariff points, BTEC grades, and subject requirements.
 
+        The patterns are compiled once for the module, the text is only lowered once, and the
+        subject pass reads each word a fixed number of times, so long combined texts stay quick.
+        Texts that have been parsed before are answered from parse_cache.
+
         :param requirement_text: The raw text from the UCAS website
         :return: EntryRequirement object with all the parsed information
         """
-        req = EntryRequirement()
-
         if not requirement_text:
+            req = EntryRequirement()
             req.has_requirements = False
             return req
         # endif
@@ -296,16 +397,30 @@ class EntryRequirement:
         # Clean the text first
         text = EntryRequirement.clean_requirement_text(requirement_text)
 
+        # Lots of courses share exactly the same requirement text
+        cache_key = ParseCache.make_key(text)
+        req = parse_cache.lookup(cache_key)
+        if req is None:
+            req = EntryRequirement.parse_cleaned_text(text)
+            parse_cache.store(cache_key, req)
+        # endif
+        return req
+
+    # enddef
+
+    @staticmethod
+    def parse_cleaned_text(text: str) -> 'EntryRequirement':
+        """
+        Parses requirement text that has already been through clean_requirement_text, without the cache.
+
+        :param text: Cleaned requirement text
+        :return: EntryRequirement object with all the parsed information
+        """
+        req = EntryRequirement()
+
         # Check for no requirements or not accepted
         text_lower = text.lower()
-        no_req_phrases = [
-            "no formal", "no specific", "no requirement", "requirements not specified",
-            "not available",
-            # Handle partial text issues
-            "n/a"
-        ]
-
-        for phrase in no_req_phrases:
+        for phrase in NO_REQUIREMENT_PHRASES:
             if phrase in text_lower:
                 req.has_requirements = False
                 # Leave all fields empty for courses with no requirements
@@ -317,12 +432,7 @@ class EntryRequirement:
         # endfor
 
         # Parse A-level requirements
-        # Using regex to find A-level grades in the text
-        # r'A\s*levels?\s*[:–-]?\s*' matches "A level", "A levels", with optional colon/dash
-        # ([A-Z*]{3,}) matches the grade letters like AAB or BCC
-        # (?:...)? is optional and catches ranges like BCC-BBB
-        a_level_pattern = r'A\s*[-–]?\s*levels?\s*[:–-]?\s*([A-Z*]{3,}(?:\s*[-–]\s*[A-Z*]{3,})?)'
-        a_level_match = re.search(a_level_pattern, text, re.IGNORECASE)
+        a_level_match = A_LEVEL_PATTERN.search(text)
         if a_level_match:
             grades = a_level_match.group(1).strip()
             # Check if the match is actually an edge case like "Not" instead of real grades
@@ -336,147 +446,45 @@ class EntryRequirement:
             req.display_grades = grades
             req.has_requirements = True
 
-            if "-" in grades:
-                # Range like "BCC-BBB" - use minimum
-                parts = grades.split("-")
-                if len(parts) == 2:
-                    min_grades = parts[0].strip()
-                    req.min_ucas_points = req.calculate_a_level_points(min_grades)
-                    req.min_grade_required = req.find_lowest_grade(min_grades)
-                # endif
-            else:
-                # Single grade like "AAB"
-                req.min_ucas_points = req.calculate_a_level_points(grades)
-                req.min_grade_required = req.find_lowest_grade(grades)
-
-            # Debug: Uncomment line below to see what text is being analyzed
-            # print(f"Analyzing requirement text: {text[:200]}...")
-
-            # Check for subject requirements - multiple patterns needed
+            # Single grades like "AAB", or ranges like "BCC-BBB" which use the minimum
+            req.min_ucas_points, req.min_grade_required = tariff_engine.a_level_range(grades)
 
-            # Pattern 1: "including Chemistry and Mathematics" (Newcastle style)  
-            # Look for text containing "including" followed by subject names
-            if "including" in text.lower():
-                # Find the part after "including"
-                including_pos = text.lower().find("including")
+            # Pattern 1: "including Chemistry and Mathematics" (Newcastle style)
+            including_pos = text_lower.find("including")
+            if including_pos >= 0:
                 after_including = text[including_pos + 9:].strip()  # 9 = len("including")
 
-                # print(f"Found 'including' text: {after_including[:100]}")
-
                 # Look for subject names before any punctuation or "at grade"
                 # Split at common terminators
-                terminators = [" at grade", ".", ",", ")", "(", " Further Mathematics is"]
                 subjects_text = after_including
-                for term in terminators:
+                for term in INCLUDING_TERMINATORS:
                     if term in subjects_text:
                         subjects_text = subjects_text.split(term)[0]
                         break
                     # endif
                 # endfor
 
-                # print(f"Extracted subjects text: {subjects_text}")
-
-                # Split subjects on "and" and "or" 
-                subject_parts = []
-
-                # Replace "and" and "or" with a separator
+                # Split subjects on "and" and "or"
                 subjects_text = subjects_text.replace(" and ", "|")
                 subjects_text = subjects_text.replace(" or ", "|")
-
-                # Split on the separator
                 for part in subjects_text.split("|"):
                     clean_part = part.strip()
                     if clean_part and len(clean_part) < 50:
-                        subject_parts.append(clean_part)
+                        # Add each subject with the minimum required grade
+                        req.add_subject_requirement(clean_part, req.min_grade_required)
                     # endif
                 # endfor
-
-                # Add each subject with the minimum required grade
-                for subject in subject_parts:
-                    req.add_subject_requirement(subject, req.min_grade_required)
-                    # print(f"Added subject requirement: {subject} at grade {req.min_grade_required}")
-                # endfor
             # endif
 
             # Pattern 2: "A* in Mathematics A*/A in Physics" (Imperial style)
-            # Look for patterns like "A* in Mathematics" or "A*/A in Physics"
             if " in " in text:
-                # Split text into lines to process each requirement line
-                lines = text.split('\n')
-                for line in lines:
-                    line = line.strip()
-
-                    # Skip empty lines or lines without grade info
-                    if not line or " in " not in line:
-                        continue
-                    # endif
-
-                    # Look for grade followed by "in" followed by subject
-                    words = line.split()
-                    for i in range(len(words) - 2):
-                        current_word = words[i]
-                        next_word = words[i + 1]
-
-                        # Check if current word is a grade and next word is "in"
-                        is_grade = False
-                        grade_chars = ["A", "B", "C", "D", "E", "*", "/"]
-                        for char in current_word:
-                            if char in grade_chars:
-                                is_grade = True
-                                break
-                            # endif
-                        # endfor
-
-                        if is_grade and next_word.lower() == "in":
-                            # Found "grade in" pattern, extract subject name
-                            grade = current_word
-
-                            # Get subject name (rest of the line or until parentheses/punctuation)
-                            subject_words = []
-                            for j in range(i + 2, len(words)):
-                                word = words[j]
-
-                                # Stop at punctuation or new grade patterns
-                                if word.startswith("(") or word.startswith("[") or "." in word:
-                                    break
-                                # endif
-
-                                # Stop if we hit another grade
-                                is_new_grade = False
-                                for char in word:
-                                    if char in grade_chars and word != "A-levels":
-                                        is_new_grade = True
-                                        break
-                                    # endif
-                                # endfor
-
-                                if is_new_grade:
-                                    break
-                                # endif
-
-                                subject_words.append(word)
-                            # endfor
-
-                            if subject_words:
-                                subject = " ".join(subject_words)
-                                req.add_subject_requirement(subject, grade)
-                                # print(f"Added subject requirement: {subject} at grade {grade}")
-                            # endif
-                        # endif
-                    # endfor
-                # endfor
+                EntryRequirement.add_grade_in_subject_requirements(req, text)
             # endif
         # endif
 
         # Parse UCAS Tariff Points
         # Handle "UCAS Tariff - 112 - 128 points" or "UCAS Tariff - 72 points"
-        # Parse UCAS tariff points with regex
-        # r'UCAS\s+Tariff\s*[-–]\s*' matches "UCAS Tariff -"
-        # (\d+) grabs the first number (minimum points)
-        # (?:\s*[-–]\s*(\d+))? optionally grabs second number for ranges like "112-128"
-        # \s*points? allows "points" or "point" at the end
-        ucas_pattern = r'UCAS\s+Tariff\s*[-–]\s*(\d+)(?:\s*[-–]\s*(\d+))?\s*points?'
-        ucas_match = re.search(ucas_pattern, text, re.IGNORECASE)
+        ucas_match = UCAS_TARIFF_PATTERN.search(text)
         if ucas_match:
             # Use the minimum points (first number) for matching
             min_points_str = ucas_match.group(1)
@@ -489,19 +497,19 @@ class EntryRequirement:
         # endif
 
         # Check if UCAS not accepted
-        if "ucas tariff" in text_lower and "not accepted" in text_lower:
+        not_accepted = "not accepted" in text_lower
+        if not_accepted and "ucas tariff" in text_lower:
             req.accepts_ucas = False
             req.min_ucas_points = 0
         # endif
 
         # Parse BTEC requirements
         # Handle "BTEC ... - DDM - DMM" or "BTEC ... - MMP" or "BTEC ... - Not accepted"
-        if "btec" in text_lower and "not accepted" in text_lower:
+        if not_accepted and "btec" in text_lower:
             # BTEC not accepted for this course
             pass
         else:
-            btec_pattern = r'BTEC.*?[-–]\s*([D*MP]+)(?:\s*[-–]\s*([D*MP]+))?'
-            btec_match = re.search(btec_pattern, text, re.IGNORECASE)
+            btec_match = BTEC_PATTERN.search(text)
             if btec_match:
                 # Use the minimum BTEC grade (first one) for matching
                 btec_grades = btec_match.group(1).strip().upper()
@@ -522,6 +530,51 @@ class EntryRequirement:
         # endif
 
         return req
+
+    # enddef
+
+    @staticmethod
+    def add_grade_in_subject_requirements(req: 'EntryRequirement', text: str) -> None:
+        """
+        Finds "grade in subject" requirements like "A* in Mathematics" or "A*/A in Physics".
+        Any word containing an uppercase A to E, "*" or "/" that is followed by "in" starts a subject.
+        The subject is every word after "in" up to (not including) the next word that starts with a
+        bracket, has a full stop or contains an uppercase A to E, "*" or "/" ("A-levels" excepted),
+        or up to the end of the text if there is no such word.
+
+        :param req: EntryRequirement to add the subjects to
+        :param text: Cleaned requirement text
+        :return: None
+        """
+        words = text.split()
+        word_count = len(words)
+        for i in range(word_count - 2):
+            # Check if the next word is "in" and the current word is a grade
+            next_word = words[i + 1]
+            if next_word != "in" and next_word.lower() != "in":
+                continue
+            # endif
+            if GRADE_CHARACTERS.isdisjoint(words[i]):
+                continue
+            # endif
+
+            # Get subject name (rest of the text until punctuation or another grade)
+            subject_words = []
+            for j in range(i + 2, word_count):
+                word = words[j]
+                if word.startswith("(") or word.startswith("[") or "." in word:
+                    break
+                # endif
+                if not GRADE_CHARACTERS.isdisjoint(word) and word != "A-levels":
+                    break
+                # endif
+                subject_words.append(word)
+            # endfor
+
+            if subject_words:
+                req.add_subject_requirement(" ".join(subject_words), words[i])
+            # endif
+        # endfor
     # enddef
 
 # endclass
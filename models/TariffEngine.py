@@ -0,0 +1,335 @@
+"""
+This module turns A level and BTEC grade strings into UCAS Tariff points.
+The answers for every common grade string are worked out once when the module loads, and any
+other string is worked out the first time it is seen and remembered (up to a limit), so each lookup is a
+single dictionary access however often it is called.
+"""
+
+from itertools import product
+
+# NumPy is only needed for the batch functions, so the scraper still runs without it
+try:
+    import numpy as np
+except ImportError:
+    np = None
+# endtry
+
+# UCAS Tariff Points for A-level grades
+# Each A-level grade has a certain number of points
+A_LEVEL_POINTS = {
+    'A*': 56,  # Top grade
+    'A': 48,
+    'B': 40,
+    'C': 32,
+    'D': 24,
+    'E': 16  # Lowest passing grade
+}
+
+# BTEC grade values for calculating UCAS points
+# BTEC qualifications have different grades from A-levels
+BTEC_GRADE_VALUES = {
+    'D*': 56,  # Distinction* (highest)
+    'D': 48,  # Distinction
+    'M': 32,  # Merit
+    'P': 16  # Pass (lowest)
+}
+
+# A level grades from best to worst, used to find the lowest one
+A_LEVEL_GRADE_ORDER = ['A*', 'A', 'B', 'C', 'D', 'E']
+
+# How many grades the tables are filled in for when the module loads (e.g. "A*A*AB" is 4 grades)
+PRECOMPUTED_A_LEVEL_GRADES = 4
+PRECOMPUTED_BTEC_GRADES = 3
+
+# Grade strings longer than this aren't remembered
+MAX_REMEMBERED_LENGTH = 16
+
+# At most this many grade strings (on top of the precomputed ones) are remembered in each table,
+# so a long crawl full of odd input can't keep growing the tables. Later ones are just worked out
+MAX_REMEMBERED_ENTRIES = 10000
+
+
+def reduce_starred_grades(grades, starred_letter):
+    """
+    Takes every starred grade (like "A*" or "D*") out of a grade string.
+    This gives the same result as removing the first "A*" again and again until there are none
+    left (so "AA**" counts as two A* grades), but only reads the string once.
+
+    :param grades: Upper case grade string
+    :param starred_letter: "A" for A levels or "D" for BTEC
+    :return: (number of starred grades, list of the characters left over)
+    """
+    starred_count = 0
+    remaining = []
+    for char in grades:
+        if char == '*' and remaining and remaining[-1] == starred_letter:
+            remaining.pop()
+            starred_count += 1
+        else:
+            remaining.append(char)
+        # endif
+    # endfor
+    return starred_count, remaining
+
+
+# enddef
+
+def work_out_a_level(grades):
+    """
+    Works out the UCAS points and lowest grade of an A level grade string without any tables.
+
+    :param grades: A string of A-level grades (e.g., "AAB", "A*AA", "BCC")
+    :return: (total UCAS points, lowest grade or "" if there are no grades)
+    """
+    if not grades:
+        return 0, ""
+    # endif
+
+    starred_count, remaining = reduce_starred_grades(grades.strip().upper(), 'A')
+    total_points = starred_count * A_LEVEL_POINTS['A*']
+    lowest_index = 0 if starred_count else -1
+    for grade in remaining:
+        if grade in A_LEVEL_POINTS:
+            total_points += A_LEVEL_POINTS[grade]
+            grade_index = A_LEVEL_GRADE_ORDER.index(grade)
+            if grade_index > lowest_index:
+                lowest_index = grade_index
+            # endif
+        # endif
+    # endfor
+
+    lowest_grade = A_LEVEL_GRADE_ORDER[lowest_index] if lowest_index >= 0 else ""
+    return total_points, lowest_grade
+
+
+# enddef
+
+def work_out_btec(grades):
+    """
+    Works out the UCAS points of a BTEC grade string without any tables.
+
+    :param grades: A string of BTEC grades (e.g., "DDD", "DMM", "D*D*D*")
+    :return: Total UCAS points
+    """
+    if not grades:
+        return 0
+    # endif
+
+    starred_count, remaining = reduce_starred_grades(grades.upper(), 'D')
+    total = starred_count * BTEC_GRADE_VALUES['D*']
+    for grade in remaining:
+        if grade in BTEC_GRADE_VALUES:
+            total += BTEC_GRADE_VALUES[grade]
+        # endif
+    # endfor
+    return total
+
+
+# enddef
+
+
+class TariffEngine:
+    """
+    Looks up UCAS Tariff points for A level and BTEC grade strings from precomputed tables.
+    Use the shared tariff_engine below rather than making new ones, so the tables are only built once.
+    """
+
+    def __init__(self):
+        """
+        Builds the tables for every A level string of up to PRECOMPUTED_A_LEVEL_GRADES grades
+        and every BTEC string of up to PRECOMPUTED_BTEC_GRADES grades.
+
+        :return: None
+        """
+        # grade string -> (points, lowest grade)
+        self._a_level_table: dict[str, tuple[int, str]] = {}
+        # grade string (or range like "BCC-BBB") -> (points, lowest grade of the minimum)
+        self._a_level_range_table: dict[str, tuple[int, str]] = {}
+        # grade string -> points
+        self._btec_table: dict[str, int] = {}
+
+        for grade_count in range(1, PRECOMPUTED_A_LEVEL_GRADES + 1):
+            for combination in product(A_LEVEL_GRADE_ORDER, repeat=grade_count):
+                grades = "".join(combination)
+                self._a_level_table[grades] = work_out_a_level(grades)
+            # endfor
+        # endfor
+
+        for grade_count in range(1, PRECOMPUTED_BTEC_GRADES + 1):
+            for combination in product(BTEC_GRADE_VALUES, repeat=grade_count):
+                grades = "".join(combination)
+                self._btec_table[grades] = work_out_btec(grades)
+            # endfor
+        # endfor
+
+        # Sizes the tables can grow to as new grade strings are remembered
+        self._a_level_table_limit = len(self._a_level_table) + MAX_REMEMBERED_ENTRIES
+        self._a_level_range_table_limit = MAX_REMEMBERED_ENTRIES
+        self._btec_table_limit = len(self._btec_table) + MAX_REMEMBERED_ENTRIES
+
+    # enddef
+
+    def a_level(self, grades: str) -> tuple[int, str]:
+        """
+        Looks up the UCAS points and lowest grade for an A level grade string.
+
+        :param grades: A string of A-level grades (e.g., "AAB", "A*AA", "bcc")
+        :return: (total UCAS points, lowest grade or "")
+        """
+        result = self._a_level_table.get(grades)
+        if result is None:
+            result = work_out_a_level(grades)
+            if grades and len(grades) <= MAX_REMEMBERED_LENGTH:
+                self._remember(self._a_level_table, self._a_level_table_limit, grades, result)
+            # endif
+        # endif
+        return result
+
+    # enddef
+
+    def a_level_points(self, grades: str) -> int:
+        """
+        Looks up the UCAS points for an A level grade string.
+
+        :param grades: A string of A-level grades (e.g., "AAB", "A*AA", "BCC")
+        :return: Total UCAS points for these grades
+        """
+        return self.a_level(grades)[0]
+
+    # enddef
+
+    def lowest_grade(self, grades: str) -> str:
+        """
+        Looks up the lowest grade in an A level grade string.
+
+        :param grades: A string of A-level grades (e.g., "AAB", "BCC")
+        :return: The lowest grade found (e.g., "B", "C"), or "" if there are none
+        """
+        return self.a_level(grades)[1]
+
+    # enddef
+
+    def a_level_range(self, grades: str) -> tuple[int, str]:
+        """
+        Looks up the points and lowest grade for grades that might be a range like "BCC-BBB".
+        A range uses its first (minimum) part, the same way EntryRequirement.parse does,
+        and anything with more than one "-" has no points.
+
+        :param grades: A-level grades or a range of them
+        :return: (total UCAS points, lowest grade or "")
+        """
+        result = self._a_level_range_table.get(grades)
+        if result is not None:
+            return result
+        # endif
+
+        if "-" not in grades:
+            result = self.a_level(grades)
+        else:
+            parts = grades.split("-")
+            if len(parts) == 2:
+                result = self.a_level(parts[0].strip())
+            else:
+                result = (0, "")
+            # endif
+        # endif
+
+        if len(grades) <= MAX_REMEMBERED_LENGTH * 2 + 1:
+            self._remember(self._a_level_range_table, self._a_level_range_table_limit, grades, result)
+        # endif
+        return result
+
+    # enddef
+
+    def btec_points(self, grades: str) -> int:
+        """
+        Looks up the UCAS points for a BTEC grade string.
+
+        :param grades: A string of BTEC grades (e.g., "DDD", "DMM", "D*D*D*")
+        :return: Total UCAS points for these BTEC grades
+        """
+        result = self._btec_table.get(grades)
+        if result is None:
+            result = work_out_btec(grades)
+            if grades and len(grades) <= MAX_REMEMBERED_LENGTH:
+                self._remember(self._btec_table, self._btec_table_limit, grades, result)
+            # endif
+        # endif
+        return result
+
+    # enddef
+
+    @staticmethod
+    def _remember(table, limit, grades, result):
+        """
+        Adds a grade string that was just worked out to one of the tables, unless the table is full.
+
+        :param table: One of the lookup tables
+        :param limit: Size the table can't grow past
+        :param grades: The grade string
+        :param result: What was worked out for it
+        :return: None
+        """
+        if len(table) < limit:
+            table[grades] = result
+        # endif
+
+    # enddef
+
+    def a_level_points_array(self, grade_strings, resolve_ranges=True):
+        """
+        Looks up the UCAS points for lots of A level grade strings at once.
+        Each different string is only looked up once, however many times it appears.
+
+        :param grade_strings: List (or NumPy array) of grade strings, None counts as no grades
+        :param resolve_ranges: Use the minimum of ranges like "BCC-BBB" (default True)
+        :return: NumPy int32 array of points, in the same order
+        """
+        if resolve_ranges:
+            return batch_lookup(grade_strings, lambda grades: self.a_level_range(grades)[0])
+        # endif
+        return batch_lookup(grade_strings, self.a_level_points)
+
+    # enddef
+
+    def btec_points_array(self, grade_strings):
+        """
+        Looks up the UCAS points for lots of BTEC grade strings at once.
+
+        :param grade_strings: List (or NumPy array) of grade strings, None counts as no grades
+        :return: NumPy int32 array of points, in the same order
+        """
+        return batch_lookup(grade_strings, self.btec_points)
+
+    # enddef
+# endclass
+
+
+def batch_lookup(grade_strings, lookup_function):
+    """
+    Runs a lookup over an array of grade strings, only once for each different string.
+
+    :param grade_strings: List (or NumPy array) of grade strings
+    :param lookup_function: Function from a grade string to points
+    :return: NumPy int32 array of points
+    """
+    if np is None:
+        raise ImportError("NumPy is needed for the batch tariff functions: pip install numpy")
+    # endif
+
+    if isinstance(grade_strings, np.ndarray):
+        grade_strings = grade_strings.tolist()
+    # endif
+
+    # Give each different string a number, then only look up each number once
+    codes: dict[str, int] = {}
+    positions = np.fromiter((codes.setdefault(grades or "", len(codes)) for grades in grade_strings),
+                            dtype=np.intp, count=len(grade_strings))
+    unique_points = np.fromiter((lookup_function(grades) for grades in codes), dtype=np.int32, count=len(codes))
+    return unique_points[positions]
+
+
+# enddef
+
+# Shared by everything in this process
+tariff_engine = TariffEngine()
@@ -1,12 +1,16 @@
 # Represents and stores university details
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from bs4 import BeautifulSoup
 from requests import Response
 from .Course import Course
 from .EntryRequirement import EntryRequirement
 from scrape_search_results import get_links_to_crawl
 from network_helper import get_with_retry
+from async_fetcher import fetch_all
+from parse_pipeline import fetch_and_parse, apply_parsed_course, PARSE_FAILED
+from html_parser import make_listing_soup
 
 
 class University:
@@ -35,22 +39,49 @@ class University:
 
     # enddef
 
-    def fetch_courses(self, headers):
+    def fetch_courses(self, headers, session=None, fetch_mode="sequential", max_concurrency=16, max_per_host=8,
+                      pipeline_queue_size=64, previous_courses=None, max_age=None):
         """
         Obtains all links to all courses, visits each course page,
         and scrapes course details including name, type, duration, and requirements.
 
         :param headers: Request headers dictionary for HTTP requests
+        :param session: Optional shared session so connections are reused across pages
+        :param fetch_mode: "sequential" fetches course pages one at a time, "async" fetches them concurrently
+                           with asyncio, "threads" fetches them concurrently with a thread pool, "pipeline"
+                           fetches them on threads and parses them in the parser processes from start_parse_pool
+        :param max_concurrency: Maximum course pages in flight at once, also the thread pool size (default 16)
+        :param max_per_host: Maximum course pages in flight to one host in "async" and "pipeline" modes (default 8)
+        :param pipeline_queue_size: Maximum fetched pages waiting to be parsed in "pipeline" mode (default 64)
+        :param previous_courses: Course dictionaries saved by the last crawl of this university. If given, a course
+                                 whose card hasn't changed is copied from here instead of fetching its page again
+        :param max_age: Seconds after which a saved course page is fetched again even if its card hasn't changed
+                        (default None: never)
         :return: None
         """
-        all_result_pages_to_crawl: [str] = get_links_to_crawl(self.link_all_courses, headers)
+        # Saved courses by link, for refreshing a university crawled before
+        previous_by_link = {}
+        if previous_courses is not None:
+            for course_dict in previous_courses:
+                if isinstance(course_dict, dict) and course_dict.get("link"):
+                    previous_by_link.setdefault(course_dict["link"], course_dict)
+                # endif
+            # endfor
+        # endif
+        reused_count = 0
+
+        all_result_pages_to_crawl: [str] = get_links_to_crawl(self.link_all_courses, headers, session=session)
 
         print("All course result links:")
         print(all_result_pages_to_crawl)
 
+        # In "pipeline" mode every course page of the university goes through the pipeline together,
+        # so the fetchers and parsers don't stop and wait at the end of each results page
+        pipeline_courses: [Course] = []
+
         for link_to_crawl in all_result_pages_to_crawl:
             # The following is only to obtain the total number of pages to crawl
-            course_page: Response = get_with_retry(link_to_crawl, headers)
+            course_page: Response = get_with_retry(link_to_crawl, headers, session=session, university=self.name)
 
             # Check if the request failed
             if course_page is None:
@@ -58,7 +89,8 @@ class University:
                 continue
             # endif
 
-            course_soup = BeautifulSoup(course_page.text, "html.parser")
+            # Only the course cards are needed, so the rest of the page isn't parsed
+            course_soup = make_listing_soup(course_page.text)
 
             # find all the centered elements
             # on the page
@@ -66,6 +98,9 @@ class University:
 
             # print(f"Found {len(content_elements)} courses...")
 
+            # Courses found on this results page, their detail pages are fetched after the loop
+            page_courses: [Course] = []
+
             for content_element in content_elements:
                 course = Course()
 
@@ -239,21 +274,168 @@ class University:
                     # endif
                 # endif
 
-                self.courses.append(course)
+                # Everything on the card goes into the fingerprint, so any change on UCAS is noticed
+                card_texts = [course.name, course.link or ""]
+                for card_tag in (details_tag, points_tag):
+                    card_texts.append(card_tag.get_text(strip=True) if card_tag else "")
+                # endfor
+                course.fingerprint = Course.card_fingerprint(card_texts)
 
-                course.fetch_requirements(headers)
-                course.print()
+                self.courses.append(course)
+                page_courses.append(course)
 
                 # # ONLY ONE COURSE FOR NOW DURING TESTING
                 # break
 
             # endfor
 
+            # Only fetch the pages of courses that are new or have changed since the last crawl
+            if previous_courses is not None:
+                courses_to_fetch = self.reuse_unchanged_courses(page_courses, previous_by_link, max_age)
+                reused_count += len(page_courses) - len(courses_to_fetch)
+                page_courses = courses_to_fetch
+            # endif
+
+            if fetch_mode == "async":
+                # Fetch every course page on this results page at the same time
+                course_links = []
+                owners = []
+                for course in page_courses:
+                    course_links.append(course.link)
+                    owners.append((self.name, course.name))
+                # endfor
+
+                course_pages = fetch_all(course_links, headers, session=session,
+                                         max_concurrency=max_concurrency, max_per_host=max_per_host, owners=owners)
+
+                for course, single_course_page in zip(page_courses, course_pages):
+                    if single_course_page is None:
+                        print(f"Failed to fetch course page {course.link}")
+                    else:
+                        course.parse_requirements(single_course_page.text)
+                        course.fetched_at = Course.page_fetched_at(single_course_page)
+                    # endif
+                    course.print()
+                # endfor
+            elif fetch_mode == "pipeline":
+                pipeline_courses.extend(page_courses)
+            elif fetch_mode == "threads":
+                # Each course fetches its own page on a worker thread.
+                # map() hands back the results in the same order the courses were given
+                with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+                    list(executor.map(lambda c: c.fetch_requirements(headers, session=session, university_name=self.name),
+                                      page_courses))
+                # endwith
+
+                for course in page_courses:
+                    course.print()
+                # endfor
+            else:
+                for course in page_courses:
+                    course.fetch_requirements(headers, session=session, university_name=self.name)
+                    course.print()
+                # endfor
+            # endif
+
             # # ONLY ONE COURSE PAGE FOR NOW DURING TESTING
             # break
 
         # endfor
 
+        if pipeline_courses:
+            owners = []
+            for course in pipeline_courses:
+                owners.append((self.name, course.name))
+            # endfor
+
+            parsed_courses = fetch_and_parse(pipeline_courses, headers, session=session,
+                                             fetch_workers=max_concurrency, max_per_host=max_per_host,
+                                             queue_size=pipeline_queue_size, owners=owners)
+
+            for course, course_dict in zip(pipeline_courses, parsed_courses):
+                if course_dict is None:
+                    print(f"Failed to fetch course page {course.link}")
+                elif course_dict is PARSE_FAILED:
+                    print(f"Failed to parse course page {course.link}")
+                else:
+                    apply_parsed_course(course, course_dict)
+                # endif
+                course.print()
+            # endfor
+        # endif
+
+        if previous_courses is not None:
+            print(f"Reused {reused_count} unchanged courses, fetched {len(self.courses) - reused_count} course pages")
+        # endif
+
+    # enddef
+
+    def reuse_unchanged_courses(self, courses, previous_by_link, max_age=None):
+        """
+        Copies the saved details of every course whose card is the same as last time (and whose page
+        isn't older than max_age), so its page doesn't have to be fetched again.
+
+        :param courses: Courses just read from a results page (with their fingerprints)
+        :param previous_by_link: Course dictionaries saved by the last crawl, by link
+        :param max_age: Seconds after which a saved page is fetched again anyway (None: never)
+        :return: List of the courses whose pages still need to be fetched
+        """
+        now = time.time()
+        courses_to_fetch = []
+        for course in courses:
+            previous = previous_by_link.get(course.link)
+            # A course whose page was never fetched (fetched_at 0) is always fetched again
+            reuse = previous is not None and previous.get("fingerprint") == course.fingerprint \
+                and previous.get("fetched_at")
+            if reuse and max_age is not None and now - previous["fetched_at"] > max_age:
+                reuse = False
+            # endif
+
+            if not reuse:
+                courses_to_fetch.append(course)
+                continue
+            # endif
+
+            # The card is the same, so the details from the course page are taken from the saved record
+            saved_course = Course.from_dict(previous)
+            course.course_type = saved_course.course_type
+            course.duration = saved_course.duration
+            course.mode = saved_course.mode
+            course.location = saved_course.location
+            course.start_date = saved_course.start_date
+            course.requirements = saved_course.requirements
+            course.fetched_at = saved_course.fetched_at
+        # endfor
+        return courses_to_fetch
+
+    # enddef
+
+    @staticmethod
+    def from_dict(university_dict: dict) -> 'University':
+        """
+        Rebuilds a University object (and its courses) from a dictionary made by to_dict.
+
+        :param university_dict: Dictionary containing university information
+        :return: University object
+        """
+        university = University()
+        university.name = university_dict.get("name") or ""
+        university.location = university_dict.get("location") or ""
+        university.link = university_dict.get("link") or ""
+        university.link_all_courses = university_dict.get("link_all_courses") or ""
+
+        courses = university_dict.get("courses")
+        if courses is None:
+            courses = []
+        # endif
+        for course_dict in courses:
+            if isinstance(course_dict, dict):
+                university.courses.append(Course.from_dict(course_dict))
+            # endif
+        # endfor
+
+        return university
+
     # enddef
 
     def to_dict(self):
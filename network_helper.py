@@ -1,15 +1,175 @@
 import time
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from retry_policy import RetryPolicy
 
-def log_failed_url(url, reason):
+# Optional on-disk cache of pages, switched on with set_response_cache()
+response_cache = None
+
+# Optional adaptive per-host rate limiter, switched on with set_rate_limiter()
+rate_limiter = None
+
+# Optional structured store of failed URLs, switched on with set_failure_store()
+failure_store = None
+
+# Optional in-memory de-duplication of requests, switched on with set_request_coalescer()
+request_coalescer = None
+
+# Optional record/replay archive of the crawl's traffic, switched on with set_http_archive()
+http_archive = None
+
+# Decides which failures are retried and how long to wait, replaced with set_retry_policy()
+retry_policy = RetryPolicy()
+
+
+def create_session(pool_connections=10, pool_maxsize=10):
+    """
+    Creates a shared HTTP session that keeps connections open between requests.
+    Reusing the same session means we don't redo the TCP and TLS handshake for every page.
+
+    :param pool_connections: Number of hosts to keep a connection pool for (default 10)
+    :param pool_maxsize: Maximum number of kept-alive connections per host (default 10)
+    :return: requests.Session object with keep-alive connection pools mounted
+    """
+    session = requests.Session()
+
+    # Retries are handled by get_with_retry, so the adapter itself never retries
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    return session
+
+
+# enddef
+
+def set_response_cache(cache):
+    """
+    Turns on the on-disk page cache for every get_with_retry call.
+
+    :param cache: ResponseCache object, or None to turn caching off
+    :return: None
+    """
+    global response_cache
+    response_cache = cache
+
+
+# enddef
+
+def set_rate_limiter(limiter):
+    """
+    Turns on the adaptive per-host rate limiter for every get_with_retry call.
+
+    :param limiter: HostRateLimiter object, or None to turn rate limiting off
+    :return: None
+    """
+    global rate_limiter
+    rate_limiter = limiter
+
+
+# enddef
+
+def set_failure_store(store):
+    """
+    Turns on recording of failed URLs in a FailureStore, as well as in failed_urls.txt.
+
+    :param store: FailureStore object, or None to only write failed_urls.txt
+    :return: None
+    """
+    global failure_store
+    failure_store = store
+
+
+# enddef
+
+def set_request_coalescer(coalescer):
+    """
+    Turns on request de-duplication for every get_with_retry call, so each URL is only downloaded once per run.
+
+    :param coalescer: RequestCoalescer object, or None to turn de-duplication off
+    :return: None
+    """
+    global request_coalescer
+    request_coalescer = coalescer
+
+
+# enddef
+
+def set_http_archive(archive):
+    """
+    Turns on recording to, or replaying from, an HTTP archive for every get_with_retry call.
+    In replay mode pages only come from the archive and the network is never touched.
+
+    :param archive: HttpArchive object, or None to turn the archive off
+    :return: None
+    """
+    global http_archive
+    http_archive = archive
+
+
+# enddef
+
+def set_retry_policy(policy):
+    """
+    Replaces the retry policy used by every get_with_retry call, e.g. to give a crawl its own retry budget.
+
+    :param policy: RetryPolicy object
+    :return: None
+    """
+    global retry_policy
+    retry_policy = policy
+
+
+# enddef
+
+def send_request(session, url, headers, timeout):
+    """
+    Sends one GET request, going through the rate limiter if it is switched on.
+
+    :param session: Session (or the requests module) to send the request with
+    :param url: The URL to fetch
+    :param headers: Request headers dictionary
+    :param timeout: (connect, read) timeout in seconds
+    :return: Response object (raises if the request fails)
+    """
+    if rate_limiter is None:
+        return session.get(url, headers=headers, timeout=timeout)
+    # endif
+
+    rate_limiter.acquire(url)
+    try:
+        response = session.get(url, headers=headers, timeout=timeout)
+    except Exception:
+        # Timeouts and connection errors count as the host throttling us
+        rate_limiter.release(url, None)
+        raise
+    # endtry
+    rate_limiter.release(url, response.status_code)
+    return response
+
+
+# enddef
+
+def log_failed_url(url, reason, attempts=1, university="", course=""):
     """
     Logs failed URLs so we can retry them later if needed.
     :param url: The URL that failed
     :param reason: Short reason for the failure
+    :param attempts: Number of attempts made before giving up (default 1)
+    :param university: Name of the university the page belongs to, if known
+    :param course: Name of the course the page belongs to, if known
     :return: None
     """
+    if failure_store is not None:
+        try:
+            failure_store.record(url, reason, attempts=attempts, university=university, course=course)
+        except Exception as e:
+            print(f"Could not record failed URL {url}: {e}")
+        # endtry
+    # endif
+
     try:
         with open("failed_urls.txt", "a", encoding="utf-8") as f:
             f.write(f"{url} | {reason}\n")
@@ -22,46 +182,141 @@ def log_failed_url(url, reason):
 
 # enddef
 
-def get_with_retry(url, headers, max_retries=3, wait_time=10, timeout=(5, 15)):
+def get_with_retry(url, headers, max_retries=5, wait_time=None, session=None, timeout=(5, 15),
+                   university="", course=""):
     """
     Makes a GET request with retry logic for network failures.
+    If request de-duplication is on, a URL already fetched (or being fetched) in this run is shared
+    instead of being downloaded again. If an HTTP archive is on, pages are recorded to it,
+    or in replay mode served only from it.
 
     :param url: The URL to fetch
     :param headers: Request headers dictionary
-    :param max_retries: Maximum number of retry attempts (default 3)
-    :param wait_time: Seconds to wait between retries (default 10)
+    :param max_retries: Maximum number of attempts (default 5)
+    :param wait_time: Seconds the backoff starts from (default is the retry policy's base delay)
+    :param session: Optional shared session from create_session() so connections are reused
+    :param timeout: (connect, read) timeout in seconds (default (5, 15))
+    :param university: Name of the university the page belongs to, recorded if it fails
+    :param course: Name of the course the page belongs to, recorded if it fails
     :return: Response object if successful, None if all retries fail
     """
+    # Replaying an archived crawl: never touch the network
+    if http_archive is not None and http_archive.mode == "replay":
+        response = http_archive.replay(url)
+        if response is None:
+            print(f"Not in the archive: {url}")
+            log_failed_url(url, "not in archive", university=university, course=course)
+        # endif
+        return response
+    # endif
+
+    def fetch_and_record():
+        response = fetch_with_retry(url, headers, max_retries, wait_time, session, timeout, university, course)
+        if response is not None and http_archive is not None:
+            http_archive.record(url, response)
+        # endif
+        return response
+
+    # enddef
+
+    if request_coalescer is None:
+        return fetch_and_record()
+    # endif
+
+    return request_coalescer.fetch(url, fetch_and_record)
+
+
+# enddef
+
+def fetch_with_retry(url, headers, max_retries=5, wait_time=None, session=None, timeout=(5, 15),
+                     university="", course=""):
+    """
+    Downloads a page (or reads it from the disk cache) with retry logic for network failures.
+    429 and 5xx answers and network errors are retried with exponential backoff and jitter,
+    honouring Retry-After. Other 4xx answers (e.g. 404) fail straight away.
+
+    :param url: The URL to fetch
+    :param headers: Request headers dictionary
+    :param max_retries: Maximum number of attempts (default 5)
+    :param wait_time: Seconds the backoff starts from (default is the retry policy's base delay)
+    :param session: Optional shared session from create_session() so connections are reused
+    :param timeout: (connect, read) timeout in seconds (default (5, 15))
+    :param university: Name of the university the page belongs to, recorded if it fails
+    :param course: Name of the course the page belongs to, recorded if it fails
+    :return: Response object if successful, None if all retries fail
+    """
+
+    # Fall back to a one-off connection if no shared session was given
+    if session is None:
+        session = requests
+    # endif
+
+    # Serve the page from the disk cache if we have a fresh copy
+    cache_entry = None
+    if response_cache is not None:
+        cache_entry = response_cache.lookup(url)
+        if cache_entry is not None:
+            if response_cache.is_fresh(cache_entry):
+                return response_cache.build_response(cache_entry)
+            # endif
+
+            # Stale copy: ask the server to send the page only if it changed
+            headers = {**headers, **response_cache.conditional_headers(cache_entry)}
+        # endif
+    # endif
 
     for attempt in range(max_retries):
+        retry_after = None
         try:
-            response = requests.get(url, headers=headers, timeout=timeout)
+            response = send_request(session, url, headers, timeout)
 
-            # If we got a non-OK response, treat as failure to keep data clean
-            if response.status_code >= 400:
-                print(f"Request failed with status {response.status_code} for {url}")
-                log_failed_url(url, f"status {response.status_code}")
-                response = None
+            # Not modified since we cached it, so the cached body is still correct
+            if response.status_code == 304 and cache_entry is not None:
+                return response_cache.mark_revalidated(url, cache_entry, response)
             # endif
 
             # If we got here, the request succeeded
-            if response is not None:
+            if response.status_code < 400:
+                if response_cache is not None:
+                    response_cache.store(url, response)
+                # endif
                 return response
             # endif
-        except Exception as e:
-            # Network error occurred
-            print(f"Network error on attempt {attempt + 1}: {e}")
 
-            # Check if we should retry
-            if attempt < max_retries - 1:
-                print(f"Waiting {wait_time} seconds before retrying...")
-                time.sleep(wait_time)
-            else:
-                print(f"Failed after {max_retries} attempts")
-                log_failed_url(url, f"network error: {e}")
+            # Non-OK response, treat as failure to keep data clean
+            print(f"Request failed with status {response.status_code} for {url}")
+            reason = f"status {response.status_code}"
+
+            # Pages that don't exist won't appear if we ask again
+            if not retry_policy.should_retry_status(response.status_code):
+                log_failed_url(url, reason, attempts=attempt + 1, university=university, course=course)
                 return None
             # endif
+
+            retry_after = response.headers.get("Retry-After")
+        except Exception as e:
+            # Network error occurred
+            print(f"Network error on attempt {attempt + 1}: {e}")
+            reason = f"network error: {e}"
         # endtry
+
+        # Check if we should retry
+        if attempt >= max_retries - 1:
+            print(f"Failed after {max_retries} attempts")
+            log_failed_url(url, reason, attempts=max_retries, university=university, course=course)
+            return None
+        # endif
+
+        if not retry_policy.take_retry():
+            print(f"Retry budget used up, giving up on {url}")
+            log_failed_url(url, f"{reason} (retry budget used up)", attempts=attempt + 1,
+                           university=university, course=course)
+            return None
+        # endif
+
+        delay = retry_policy.get_delay(attempt, retry_after=retry_after, base_delay=wait_time)
+        print(f"Waiting {delay:.1f} seconds before retrying...")
+        time.sleep(delay)
     # endfor
 
     return None
@@ -0,0 +1,311 @@
+"""
+Splits the crawl into a fetch stage and a parse stage so they run at the same time.
+Fetcher threads download course pages and put the raw bytes onto a bounded queue, and a pool of
+parser processes turns each page into Course data. Parsing is CPU work, so running it in other
+processes means it no longer holds up the fetcher threads (or the other parsers) on the GIL.
+
+If the parsers fall behind, the queue fills up and the fetchers wait for space, so the crawl
+never holds more than a fixed number of downloaded pages in memory.
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from models.Course import Course
+from models.EntryRequirement import parse_cache
+from network_helper import get_with_retry, log_failed_url
+
+# Put on the page queue by each fetcher thread when it has no more pages to fetch
+FETCHER_DONE = None
+
+# Put in the results of fetch_and_parse in place of a page that was fetched but couldn't be parsed,
+# so it isn't reported as a fetch failure (pages that couldn't be fetched are None)
+PARSE_FAILED = "parse failed"
+
+# Shared pool of parser processes, started by start_parse_pool
+parse_pool: ProcessPoolExecutor | None = None
+parse_pool_workers = 0
+
+# Requirement parse cache hits and misses in the parser processes, added up as their pages come back
+worker_cache_counts = {"hits": 0, "misses": 0}
+
+
+def parse_course_page(course_dict, page_bytes, encoding, fetched_at=0):
+    """
+    Parses one downloaded course page inside a parser process.
+    This has to be a plain top-level function so it can be sent to another process.
+
+    :param course_dict: The course from the results page, made by Course.to_dict
+    :param page_bytes: Raw bytes of the course page
+    :param encoding: Encoding the server gave for the page (None lets the HTML parser work it out)
+    :param fetched_at: When the page was fetched, from Course.page_fetched_at (seconds since 1970)
+    :return: (dictionary of the course with its details and requirements filled in,
+              parse cache hits, parse cache misses) for this page
+    """
+    # Each parser process has its own parse cache, so its counts are sent back with the page
+    hits_before = parse_cache.hits
+    misses_before = parse_cache.misses
+
+    course = Course.from_dict(course_dict)
+    if encoding:
+        # Decode the same way requests does for response.text
+        course.parse_requirements(page_bytes.decode(encoding, errors="replace"))
+    else:
+        course.parse_requirements(page_bytes)
+    # endif
+    course.fetched_at = fetched_at
+    return course.to_dict(), parse_cache.hits - hits_before, parse_cache.misses - misses_before
+
+
+# enddef
+
+def start_parse_pool(max_workers=None):
+    """
+    Starts the shared pool of parser processes, or returns it if it is already running.
+    Call this before the crawl starts so the processes are made before any fetcher threads exist.
+
+    :param max_workers: Number of parser processes (default: one per CPU)
+    :return: The ProcessPoolExecutor
+    """
+    global parse_pool, parse_pool_workers
+
+    if parse_pool is not None:
+        return parse_pool
+    # endif
+
+    if not max_workers:
+        max_workers = os.cpu_count() or 1
+    # endif
+
+    # Forking means the parsers don't run scraper.py again when they start (scraper.py has no main guard)
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+    # endif
+
+    parse_pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+    parse_pool_workers = max_workers
+
+    # Start every process now with a tiny job, rather than part way through a crawl
+    warm_up = []
+    for _ in range(max_workers):
+        warm_up.append(parse_pool.submit(os.getpid))
+    # endfor
+    wait(warm_up)
+
+    return parse_pool
+
+
+# enddef
+
+def stop_parse_pool():
+    """
+    Shuts down the shared pool of parser processes if it was started.
+
+    :return: None
+    """
+    global parse_pool, parse_pool_workers
+
+    if parse_pool is not None:
+        parse_pool.shutdown()
+        parse_pool = None
+        parse_pool_workers = 0
+    # endif
+
+
+# enddef
+
+def fetch_pages(jobs, page_queue, headers, session, host_limits, host_limits_lock, max_per_host):
+    """
+    Runs on each fetcher thread: takes course pages off the job queue, downloads them
+    and puts the raw bytes and fetch time on the page queue. put() waits while the page queue is full.
+
+    :param jobs: Queue of (index, url, owner) still to fetch
+    :param page_queue: Bounded queue that the downloaded pages are put on
+    :param headers: Request headers dictionary
+    :param session: Optional shared session from create_session()
+    :param host_limits: Dictionary of host name to semaphore, filled in as new hosts are seen
+    :param host_limits_lock: Lock around host_limits
+    :param max_per_host: Maximum requests in flight to one host
+    :return: None
+    """
+    # The consumer waits for one FETCHER_DONE per fetcher, so it is sent even if something here raises
+    try:
+        while True:
+            try:
+                index, url, owner = jobs.get_nowait()
+            except queue.Empty:
+                break
+            # endtry
+
+            host = urllib.parse.urlsplit(url).netloc
+            with host_limits_lock:
+                if host not in host_limits:
+                    host_limits[host] = threading.BoundedSemaphore(max_per_host)
+                # endif
+                host_limit = host_limits[host]
+            # endwith
+
+            try:
+                with host_limit:
+                    response = get_with_retry(url, headers, session=session, university=owner[0], course=owner[1])
+                # endwith
+            except Exception as e:
+                print(f"Error fetching {url}: {e}")
+                response = None
+            # endtry
+
+            if response is None:
+                page_queue.put((index, None, None, 0))
+            else:
+                # From the Date header, so a page served from the cache or the archive keeps its real age
+                page_queue.put((index, response.content, response.encoding, Course.page_fetched_at(response)))
+            # endif
+        # endwhile
+    finally:
+        page_queue.put(FETCHER_DONE)
+    # endtry
+
+
+# enddef
+
+def fetch_and_parse(courses, headers, session=None, fetch_workers=16, max_per_host=8, queue_size=64,
+                    owners=None):
+    """
+    Fetches and parses many course pages, with the fetching and parsing happening at the same time.
+    start_parse_pool must have been called first.
+
+    :param courses: List of Course objects with their links filled in
+    :param headers: Request headers dictionary
+    :param session: Optional shared session from create_session()
+    :param fetch_workers: Number of fetcher threads (default 16)
+    :param max_per_host: Maximum requests in flight to one host (default 8)
+    :param queue_size: Maximum downloaded pages waiting to be parsed (default 64)
+    :param owners: Optional list of (university name, course name) for each course, recorded if a page fails
+    :return: List of course dictionaries in the same order (None for pages that couldn't be fetched,
+             PARSE_FAILED for pages that couldn't be parsed)
+    """
+    if parse_pool is None:
+        raise RuntimeError("start_parse_pool() must be called before fetch_and_parse()")
+    # endif
+
+    results: list[dict | None] = [None] * len(courses)
+    if not courses:
+        return results
+    # endif
+
+    if owners is None:
+        owners = [("", "")] * len(courses)
+    # endif
+
+    jobs = queue.Queue()
+    for index, course in enumerate(courses):
+        jobs.put((index, course.link, owners[index]))
+    # endfor
+
+    page_queue = queue.Queue(maxsize=queue_size)
+    host_limits = {}
+    host_limits_lock = threading.Lock()
+
+    fetcher_count = max(1, min(fetch_workers, len(courses)))
+    fetchers = []
+    for _ in range(fetcher_count):
+        fetcher = threading.Thread(target=fetch_pages, daemon=True,
+                                   args=(jobs, page_queue, headers, session, host_limits, host_limits_lock,
+                                         max_per_host))
+        fetcher.start()
+        fetchers.append(fetcher)
+    # endfor
+
+    # Pages handed to the pool but not parsed yet. Keeping this bounded too means a slow pool
+    # stops us taking pages off the queue, which is what makes the fetchers wait
+    max_in_flight = parse_pool_workers * 2
+    in_flight = {}
+
+    def collect(done_futures):
+        for future in done_futures:
+            index = in_flight.pop(future)
+            try:
+                results[index], hits, misses = future.result()
+                worker_cache_counts["hits"] += hits
+                worker_cache_counts["misses"] += misses
+            except Exception as e:
+                print(f"Error parsing course page {courses[index].link}: {e}")
+                results[index] = PARSE_FAILED
+                log_failed_url(courses[index].link, f"parse error: {e}",
+                               university=owners[index][0], course=owners[index][1])
+            # endtry
+        # endfor
+
+    # enddef
+
+    fetchers_running = fetcher_count
+    while fetchers_running > 0:
+        item = page_queue.get()
+        if item is FETCHER_DONE:
+            fetchers_running -= 1
+            continue
+        # endif
+
+        index, page_bytes, encoding, fetched_at = item
+        if page_bytes is None:
+            continue
+        # endif
+
+        if len(in_flight) >= max_in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            collect(done)
+        # endif
+
+        future = parse_pool.submit(parse_course_page, courses[index].to_dict(), page_bytes, encoding, fetched_at)
+        in_flight[future] = index
+    # endwhile
+
+    collect(wait(in_flight).done)
+
+    for fetcher in fetchers:
+        fetcher.join()
+    # endfor
+
+    return results
+
+
+# enddef
+
+def worker_cache_stats():
+    """
+    Gets the requirement parse cache counters added up over every parser process.
+
+    :return: Dictionary with hits, misses and hit_rate (0 to 1), like ParseCache.stats
+    """
+    hits = worker_cache_counts["hits"]
+    misses = worker_cache_counts["misses"]
+    total = hits + misses
+    hit_rate = hits / total if total else 0.0
+    return {"hits": hits, "misses": misses, "hit_rate": hit_rate}
+
+
+# enddef
+
+def apply_parsed_course(course, course_dict):
+    """
+    Copies the parsed details and fetch time from a parser process back onto the original Course object.
+
+    :param course: Course object to update
+    :param course_dict: Dictionary returned by parse_course_page
+    :return: None
+    """
+    parsed_course = Course.from_dict(course_dict)
+    course.course_type = parsed_course.course_type
+    course.duration = parsed_course.duration
+    course.mode = parsed_course.mode
+    course.location = parsed_course.location
+    course.start_date = parsed_course.start_date
+    course.requirements = parsed_course.requirements
+    course.fetched_at = parsed_course.fetched_at
+# enddef
@@ -0,0 +1,288 @@
+import json
+import mmap
+import os
+import time
+
+from JSONReader import build_index
+from JSONWriter import encode_university, write_universities
+from university_index import StoredUniversity, read_index, summarise_university
+
+
+class ProgressJournal:
+    """
+    Saves the crawl's progress one university at a time without rewriting universities.json each time.
+    Each finished university is appended to a journal file as one line of JSON and synced to disk,
+    so saving costs the same however many universities have been collected.
+    Every compact_interval seconds (and at the end of the crawl) the journal is folded into
+    universities.json and emptied.
+    A timer is used rather than a count of universities, because rewriting the whole file every
+    N universities would still make the total cost grow with the square of the number of universities.
+
+    Resuming reads the summary index next to universities.json (see university_index.py) and then
+    replays the journal on top, so nothing appended before a crash is lost. Universities already in
+    universities.json are never decoded: compaction copies their records across as they are.
+    """
+
+    def __init__(self, output_path="universities.json", journal_path=None, compact_interval=600, compact_json=False):
+        """
+        Opens the journal, creating it if needed.
+
+        :param output_path: The compacted JSON file (default "universities.json")
+        :param journal_path: Journal file (default output_path + ".journal")
+        :param compact_interval: Seconds between compactions, 0 only compacts when asked (default 600)
+        :param compact_json: Write universities.json without indentation (default False)
+        :return: None
+        """
+        self.output_path = output_path
+        self.journal_path = journal_path if journal_path else output_path + ".journal"
+        self.compact_interval = compact_interval
+        self.compact_json = compact_json
+        self.last_compacted_at = time.monotonic()
+
+        # name -> StoredUniversity (already in universities.json) or university dictionary (from the journal),
+        # in the order they should be saved.
+        # A university that is scraped again is moved to the end, the same as replacing it in a list
+        self.universities: dict = {}
+        self.appended_since_compaction = 0
+        self._unnamed_count = 0
+
+        self._journal_file = open(self.journal_path, "ab")
+
+    # enddef
+
+    def load(self):
+        """
+        Loads the saved universities: universities.json first, then every record in the journal on top.
+        If universities.json has no up to date index (e.g. it was saved by an older version or edited
+        by hand), it is read through once, one university at a time, and saved again with one.
+
+        :return: List of summaries (name, has_requirements, missing_bachelor, course_count) in order
+        """
+        self.universities = {}
+        self._unnamed_count = 0
+
+        self._load_stored()
+
+        replayed = 0
+        end_of_last_record = 0
+        with open(self.journal_path, "rb") as f:
+            for line in f:
+                # The last line can be cut short if the crawl was killed while appending it
+                if not line.endswith(b"\n"):
+                    break
+                # endif
+                try:
+                    uni = json.loads(line)
+                except ValueError:
+                    break
+                # endtry
+                self._put(uni)
+                replayed += 1
+                end_of_last_record += len(line)
+            # endfor
+        # endwith
+
+        # Cut off a broken last line so the next record doesn't get stuck on the end of it
+        if os.path.getsize(self.journal_path) > end_of_last_record:
+            self._journal_file.truncate(end_of_last_record)
+        # endif
+
+        self.appended_since_compaction = replayed
+        return self.summaries()
+
+    # enddef
+
+    def _load_stored(self):
+        """
+        Adds every university already in universities.json, using its index.
+
+        :return: None
+        """
+        index = read_index(self.output_path)
+        if index is None and os.path.exists(self.output_path):
+            try:
+                # Only the index is written, universities.json is left as it is
+                build_index(self.output_path)
+                index = read_index(self.output_path)
+            except Exception:
+                # Unreadable, so start again the same as if there was no file
+                index = None
+            # endtry
+        # endif
+
+        if index is None:
+            return
+        # endif
+
+        entries, compact = index
+        for entry in entries:
+            self._put(StoredUniversity(entry, compact))
+        # endfor
+
+    # enddef
+
+    def _put(self, uni):
+        """
+        Adds or replaces a university in memory.
+
+        :param uni: StoredUniversity or university dictionary (anything without a name is kept where it is)
+        :return: None
+        """
+        name = ""
+        if isinstance(uni, StoredUniversity):
+            name = uni.entry["name"]
+        elif isinstance(uni, dict):
+            name = (uni.get("name") or "").strip()
+        # endif
+
+        if not name:
+            self.universities[(None, self._unnamed_count)] = uni
+            self._unnamed_count += 1
+            return
+        # endif
+
+        # Remove first so a replaced university moves to the end
+        self.universities.pop(name, None)
+        self.universities[name] = uni
+
+    # enddef
+
+    def summaries(self):
+        """
+        Gets the summary of every saved university in order.
+
+        :return: List of dictionaries with name, has_requirements, missing_bachelor and course_count
+        """
+        summaries = []
+        for uni in self.universities.values():
+            if isinstance(uni, StoredUniversity):
+                summaries.append(uni.entry)
+            else:
+                summaries.append(summarise_university(uni))
+            # endif
+        # endfor
+        return summaries
+
+    # enddef
+
+    def get_university(self, name):
+        """
+        Gets the full saved record of one university (decoded from universities.json if it is stored there).
+
+        :param name: University name
+        :return: University dictionary, or None if it hasn't been saved
+        """
+        uni = self.universities.get(name.strip())
+        if isinstance(uni, StoredUniversity):
+            with open(self.output_path, "rb") as f:
+                f.seek(uni.entry["offset"])
+                return json.loads(f.read(uni.entry["length"]))
+            # endwith
+        # endif
+        return uni
+
+    # enddef
+
+    def append(self, university_dict):
+        """
+        Appends one finished university to the journal and syncs it to disk.
+        Compacts into universities.json if compact_interval seconds have passed since last time.
+
+        :param university_dict: University dictionary made by University.to_dict
+        :return: None
+        """
+        line = encode_university(university_dict, compact=True) + b"\n"
+        self._journal_file.write(line)
+        self._journal_file.flush()
+        os.fsync(self._journal_file.fileno())
+
+        self._put(university_dict)
+        self.appended_since_compaction += 1
+
+        if self.compact_interval and time.monotonic() - self.last_compacted_at >= self.compact_interval:
+            self.compact()
+        # endif
+
+    # enddef
+
+    def compact(self):
+        """
+        Writes every university to universities.json and empties the journal.
+        The new file is written next to the old one and swapped in, so a crash part way through
+        leaves the old file and the journal as they were.
+
+        :return: None
+        """
+        stored = []
+        for uni in self.universities.values():
+            if isinstance(uni, StoredUniversity):
+                stored.append(uni)
+            # endif
+        # endfor
+
+        if stored:
+            # Records already in universities.json are copied straight out of the old file
+            with open(self.output_path, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as source:
+                    for uni in stored:
+                        uni.source = source
+                    # endfor
+                    write_universities(self.output_path, self.universities.values(), self.compact_json)
+                    for uni in stored:
+                        uni.source = None
+                    # endfor
+                # endwith
+            # endwith
+        else:
+            write_universities(self.output_path, self.universities.values(), self.compact_json)
+        # endif
+
+        # Everything is in universities.json now, and the new index says where
+        self._journal_file.truncate(0)
+        self._journal_file.flush()
+        os.fsync(self._journal_file.fileno())
+        self.last_compacted_at = time.monotonic()
+        self.load()
+
+    # enddef
+
+    def close(self):
+        """
+        Compacts anything left in the journal and closes it.
+
+        :return: None
+        """
+        if self.appended_since_compaction:
+            self.compact()
+        # endif
+        self._journal_file.close()
+    # enddef
+# endclass
+
+
+def fold_journal(output_path="universities.json"):
+    """
+    Folds anything left in the progress journal into universities.json, so tools that only read
+    universities.json and its index see every university the crawl has saved so far, and don't
+    write out a universities.json that the journal would later replay old records on top of.
+
+    :param output_path: The compacted JSON file (default "universities.json")
+    :return: Number of universities that were in the journal
+    """
+    journal_path = output_path + ".journal"
+    if not os.path.exists(journal_path) or os.path.getsize(journal_path) == 0:
+        return 0
+    # endif
+
+    # Keep universities.json in whichever form it was saved in
+    index = read_index(output_path)
+    compact_json = index[1] if index is not None else False
+
+    journal = ProgressJournal(output_path, compact_interval=0, compact_json=compact_json)
+    journal.load()
+    folded = journal.appended_since_compaction
+    journal.close()
+    return folded
+
+
+# enddef
@@ -0,0 +1,188 @@
+import threading
+import time
+import urllib.parse
+
+# Status codes that mean the server wants us to slow down
+THROTTLE_STATUS_CODES = [429, 503]
+
+
+class HostState:
+    """
+    Holds the token bucket and concurrency window for one host.
+    """
+
+    def __init__(self, rate, concurrency):
+        """
+        Creates the state for a host we haven't talked to yet.
+
+        :param rate: Starting requests per second
+        :param concurrency: Starting number of requests allowed in flight
+        :return: None
+        """
+        self.rate: float = rate
+        self.concurrency_limit: float = concurrency
+        self.tokens: float = 1.0
+        self.last_refill: float = time.monotonic()
+        self.last_decrease: float = 0.0
+        self.in_flight: int = 0
+        self.successes: int = 0
+        self.throttled: int = 0
+
+    # enddef
+# endclass
+
+
+class HostRateLimiter:
+    """
+    Limits how fast we hit each host, and adapts the limit to what the host will tolerate.
+    Each host has a token bucket (requests per second) and a concurrency window (requests in flight).
+    Both grow a little after every success and are cut in half when the host throttles us
+    (429, 503 or a timeout), which is the same AIMD idea TCP uses for congestion control.
+    """
+
+    def __init__(self, initial_rate=2.0, min_rate=0.2, max_rate=20.0, rate_step=0.1,
+                 initial_concurrency=4, max_concurrency=16, decrease_factor=0.5, burst=2.0, cooldown=2.0):
+        """
+        Creates a rate limiter with the same settings for every host.
+
+        :param initial_rate: Requests per second a new host starts at (default 2.0)
+        :param min_rate: Lowest rate we back off to (default 0.2)
+        :param max_rate: Highest rate we ramp up to (default 20.0)
+        :param rate_step: Requests per second added after each success (default 0.1)
+        :param initial_concurrency: Requests in flight a new host starts at (default 4)
+        :param max_concurrency: Highest number of requests in flight per host (default 16)
+        :param decrease_factor: What the rate and window are multiplied by when throttled (default 0.5)
+        :param burst: How many requests can be sent back to back after an idle period (default 2.0)
+        :param cooldown: Seconds after a back off before we back off again (default 2.0)
+        :return: None
+        """
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate_step = rate_step
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.decrease_factor = decrease_factor
+        self.burst = burst
+        self.cooldown = cooldown
+
+        self.hosts: dict[str, HostState] = {}
+        self._condition = threading.Condition()
+
+    # enddef
+
+    def _get_host(self, url):
+        """
+        Finds (or creates) the state for the host of a URL.
+        Must be called while holding the condition lock.
+
+        :param url: The URL about to be fetched
+        :return: HostState for the URL's host
+        """
+        host = urllib.parse.urlsplit(url).netloc
+        if host not in self.hosts:
+            self.hosts[host] = HostState(self.initial_rate, self.initial_concurrency)
+        # endif
+        return self.hosts[host]
+
+    # enddef
+
+    def _refill(self, state):
+        """
+        Adds the tokens earned since the last refill, up to the burst size.
+
+        :param state: HostState to refill
+        :return: None
+        """
+        now = time.monotonic()
+        state.tokens = min(self.burst, state.tokens + (now - state.last_refill) * state.rate)
+        state.last_refill = now
+
+    # enddef
+
+    def acquire(self, url):
+        """
+        Waits until the host has a free slot and a token, then takes them.
+
+        :param url: The URL about to be fetched
+        :return: None
+        """
+        with self._condition:
+            state = self._get_host(url)
+            while True:
+                self._refill(state)
+                if state.in_flight < int(state.concurrency_limit) and state.tokens >= 1:
+                    state.tokens -= 1
+                    state.in_flight += 1
+                    return
+                # endif
+
+                if state.in_flight >= int(state.concurrency_limit):
+                    # Wait for another request to finish
+                    self._condition.wait()
+                else:
+                    # Wait for the next token
+                    self._condition.wait((1 - state.tokens) / state.rate)
+                # endif
+            # endwhile
+        # endwith
+
+    # enddef
+
+    def release(self, url, status_code):
+        """
+        Gives the slot back and adjusts the host's rate and window based on how the request went.
+
+        :param url: The URL that was fetched
+        :param status_code: HTTP status code, or None if the request raised (e.g. a timeout)
+        :return: None
+        """
+        with self._condition:
+            state = self._get_host(url)
+            state.in_flight -= 1
+
+            if status_code is None or status_code in THROTTLE_STATUS_CODES:
+                state.throttled += 1
+
+                # Requests already in flight will fail too, so only back off once per cooldown
+                now = time.monotonic()
+                if now - state.last_decrease >= self.cooldown:
+                    state.rate = max(self.min_rate, state.rate * self.decrease_factor)
+                    state.concurrency_limit = max(1.0, state.concurrency_limit * self.decrease_factor)
+                    state.last_decrease = now
+                # endif
+            elif status_code < 400:
+                state.successes += 1
+                state.rate = min(self.max_rate, state.rate + self.rate_step)
+
+                # Grows the window by about one slot per window's worth of successes
+                state.concurrency_limit = min(self.max_concurrency,
+                                              state.concurrency_limit + 1 / state.concurrency_limit)
+            # endif
+
+            self._condition.notify_all()
+        # endwith
+
+    # enddef
+
+    def metrics(self):
+        """
+        Gets the current rate, window and counters for every host.
+
+        :return: Dictionary of host name to a dictionary of metrics
+        """
+        result = {}
+        with self._condition:
+            for host, state in self.hosts.items():
+                result[host] = {
+                    "rate": round(state.rate, 2),
+                    "concurrency_limit": int(state.concurrency_limit),
+                    "in_flight": state.in_flight,
+                    "successes": state.successes,
+                    "throttled": state.throttled
+                }
+            # endfor
+        # endwith
+        return result
+    # enddef
+# endclass
@@ -0,0 +1,165 @@
+"""
+Rebuilds universities.json from the pages kept in the crawl archive, with no network access.
+After a fix to the requirement parsing, this re-runs the parsing over every stored results page
+and course page, so the fix can be applied without crawling UCAS again.
+Universities are parsed in parallel, one process each, so it takes minutes rather than a full crawl.
+
+Usage: python3 reparse.py [--archive crawl_archive.gz] [--input universities.json] [--output universities.json]
+                          [--workers 4]
+"""
+
+import argparse
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from JSONReader import iter_universities
+from JSONWriter import write_universities
+from http_archive import HttpArchive
+from models.University import University
+from network_helper import set_http_archive
+from university_index import university_has_requirements
+
+# Same browser headers the scraper uses (never sent, every page comes from the archive)
+headers = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/107.0.0.0 Safari/537.36"
+}
+
+# The archive opened by each worker process
+worker_archive = None
+
+
+def start_worker(archive_path):
+    """
+    Runs once in each worker process: opens the archive for replay so every page comes from it.
+
+    :param archive_path: Path of the crawl archive
+    :return: None
+    """
+    global worker_archive
+
+    worker_archive = HttpArchive(archive_path, mode="replay")
+    set_http_archive(worker_archive)
+
+    # fetch_courses prints every course it finds, which would only bury the summary
+    sys.stdout = open(os.devnull, "w")
+
+
+# enddef
+
+def reparse_university(university_dict):
+    """
+    Rebuilds one university's courses and requirements from its archived pages.
+    Universities whose results pages aren't in the archive are handed back unchanged.
+
+    :param university_dict: University dictionary from universities.json
+    :return: (university dictionary, True if it was rebuilt from the archive)
+    """
+    university = University.from_dict(university_dict)
+    if not university.link_all_courses or university.link_all_courses not in worker_archive.index:
+        return university_dict, False
+    # endif
+
+    # Start again from the results pages, the same way the crawl does
+    university.courses = []
+    university.fetch_courses(headers, fetch_mode="sequential")
+    return university.to_dict(), True
+
+
+# enddef
+
+def reparse(universities, archive_path, workers=None):
+    """
+    Rebuilds universities from the archive, in parallel.
+    Only a couple of universities per worker are read ahead, so a huge file never has to fit in memory.
+
+    :param universities: Iterable of university dictionaries, e.g. from iter_universities
+    :param archive_path: Path of the crawl archive
+    :param workers: Number of worker processes (default: one per CPU)
+    :return: Generator of (university dictionary, True if it was rebuilt from the archive) in the same order
+    """
+    workers = workers or os.cpu_count() or 1
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=start_worker, initargs=(archive_path,)) as executor:
+        for uni in universities:
+            if not isinstance(uni, dict):
+                continue
+            # endif
+            pending.append(executor.submit(reparse_university, uni))
+
+            # Results are handed back oldest first, so the output keeps the input's order
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+            # endif
+        # endfor
+        while pending:
+            yield pending.popleft().result()
+        # endwhile
+    # endwith
+
+
+# enddef
+
+def count_rebuilt(results, counts):
+    """
+    Passes the rebuilt universities on to be saved while counting them.
+
+    :param results: Iterable of (university dictionary, True if it was rebuilt from the archive)
+    :param counts: Dictionary with "total", "rebuilt" and "with_requirements" counts to add to
+    :return: Generator of university dictionaries
+    """
+    for university_dict, from_archive in results:
+        counts["total"] += 1
+        if from_archive:
+            counts["rebuilt"] += 1
+        # endif
+        if university_has_requirements(university_dict):
+            counts["with_requirements"] += 1
+        # endif
+        yield university_dict
+    # endfor
+
+
+# enddef
+
+def main():
+    """
+    Parses the command line, rebuilds the universities and saves them.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Rebuild universities.json from the crawl archive")
+    parser.add_argument("--archive", default="crawl_archive.gz", help="crawl archive recorded by scraper.py")
+    parser.add_argument("--input", default="universities.json", help="universities to rebuild")
+    parser.add_argument("--output", default="universities.json", help="where to save the rebuilt universities")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes (0 means one per CPU)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.archive):
+        print(f"No crawl archive at {args.archive}, run scraper.py first")
+        return
+    # endif
+
+    # Universities are read, rebuilt and saved one at a time. The output is written through a temporary
+    # file (so a crash can't leave half a file), and the input has been read to the end before it is
+    # swapped in, so the input and output can be the same file
+    counts = {"total": 0, "rebuilt": 0, "with_requirements": 0}
+    results = reparse(iter_universities(args.input), args.archive, args.workers)
+    write_universities(args.output, count_rebuilt(results, counts))
+
+    total = counts["total"]
+    print(f"Rebuilt {counts['rebuilt']} of {total} universities from {args.archive}")
+    if counts["rebuilt"] < total:
+        print(f"{total - counts['rebuilt']} universities weren't in the archive and were kept as they were")
+    # endif
+    print(f"Universities with requirements: {counts['with_requirements']}")
+    print(f"Universities without requirements: {total - counts['with_requirements']}")
+    print(f"Saved {args.output}")
+
+
+# enddef
+
+if __name__ == "__main__":
+    main()
+# endif
@@ -0,0 +1,176 @@
+import time
+from pathlib import Path
+
+from JSONReader import iter_universities
+from JSONWriter import write_universities
+from async_fetcher import fetch_all
+from failure_store import FailureStore
+from models.Course import Course
+from network_helper import create_session, set_failure_store
+from progress_journal import fold_journal
+
+# Same browser headers the scraper uses
+headers = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/107.0.0.0 Safari/537.36"
+}
+
+# How many failed pages are re-fetched at once, and at most to a single host
+REPLAY_CONCURRENCY = 16
+REPLAY_PER_HOST = 8
+
+
+def group_course_failures(failures: list[dict]) -> tuple[dict[str, dict[str, dict]], list[dict]]:
+    """
+    Splits failures into course pages (which can be patched in place) and everything else.
+
+    :param failures: Pending failures from FailureStore.pending()
+    :return: (university name -> {course link -> failure}, list of other failures)
+    """
+    course_failures = {}
+    other_failures = []
+    for failure in failures:
+        if failure["university"] and failure["course"]:
+            if failure["university"] not in course_failures:
+                course_failures[failure["university"]] = {}
+            # endif
+            course_failures[failure["university"]][failure["url"]] = failure
+        else:
+            other_failures.append(failure)
+        # endif
+    # endfor
+    return course_failures, other_failures
+
+
+# enddef
+
+def patch_courses(data: list[dict], pages: dict[tuple[str, str], str]) -> list[tuple[str, str]]:
+    """
+    Re-parses the re-fetched course pages and replaces the matching course records in place.
+
+    :param data: List of university dictionaries loaded from universities.json
+    :param pages: (university name, course link) -> HTML text of the re-fetched page
+    :return: List of (university name, course link) that were patched
+    """
+    patched = []
+    for uni in data:
+        if not isinstance(uni, dict):
+            continue
+        # endif
+        name = (uni.get("name") or "").strip()
+        courses = uni.get("courses")
+        if courses is None:
+            continue
+        # endif
+        for index, course_dict in enumerate(courses):
+            if not isinstance(course_dict, dict):
+                continue
+            # endif
+            key = (name, course_dict.get("link") or "")
+            if key not in pages:
+                continue
+            # endif
+
+            # Start from the saved record so the points from the results page card are kept,
+            # the same as when the course page is parsed during a normal crawl
+            course = Course.from_dict(course_dict)
+            course.parse_requirements(pages[key])
+            course.fetched_at = int(time.time())
+            courses[index] = course.to_dict()
+            patched.append(key)
+        # endfor
+    # endfor
+    return patched
+
+
+# enddef
+
+def patch_universities(universities, pages: dict[tuple[str, str], str], patched: list[tuple[str, str]]):
+    """
+    Patches universities one at a time as they are read, so the whole file never has to be in memory.
+
+    :param universities: Iterable of university dictionaries, e.g. from iter_universities
+    :param pages: (university name, course link) -> HTML text of the re-fetched page
+    :param patched: List that (university name, course link) of every patched course is added to
+    :return: Generator of the university dictionaries, patched
+    """
+    for uni in universities:
+        patched.extend(patch_courses([uni], pages))
+        yield uni
+    # endfor
+
+
+# enddef
+
+
+def main() -> None:
+    """
+    Re-fetches only the URLs recorded in failed_urls.db and patches the affected courses in universities.json.
+
+    :return: None
+    """
+    input_path = Path("universities.json")
+
+    # Patch the latest copy of every university. Anything still in the journal would otherwise be
+    # missing from the patched file, and replayed on top of the patches the next time it is loaded
+    folded = fold_journal(str(input_path))
+    if folded:
+        print(f"Folded {folded} universities from the progress journal into {input_path}")
+    # endif
+
+    store = FailureStore("failed_urls.db")
+    set_failure_store(store)
+
+    course_failures, other_failures = group_course_failures(store.pending())
+
+    urls = []
+    owners = []
+    for university_name, failures in course_failures.items():
+        for url, failure in failures.items():
+            urls.append(url)
+            owners.append((university_name, failure["course"]))
+        # endfor
+    # endfor
+
+    print(f"Replaying {len(urls)} failed course pages")
+
+    session = create_session(pool_maxsize=REPLAY_CONCURRENCY)
+    responses = fetch_all(urls, headers, session=session, max_concurrency=REPLAY_CONCURRENCY,
+                          max_per_host=REPLAY_PER_HOST, owners=owners)
+
+    pages = {}
+    for url, owner, response in zip(urls, owners, responses):
+        if response is not None:
+            pages[(owner[0], url)] = response.text
+        # endif
+    # endfor
+
+    if pages:
+        # The reader is finished with the old file before the new one is swapped in
+        patched = []
+        write_universities(str(input_path), patch_universities(iter_universities(input_path), pages, patched))
+
+        for university_name, url in patched:
+            store.mark_resolved(url)
+        # endfor
+        print(f"Patched {len(patched)} courses in {input_path}")
+    # endif
+
+    print(f"Still failing: {len(urls) - len(pages)} course pages")
+
+    # Search and results pages can't be patched on their own, the whole university has to be rescraped
+    if other_failures:
+        print(f"{len(other_failures)} failed pages are not course pages, rescrape these universities instead:")
+        for failure in other_failures:
+            owner = failure["university"] or "(search page)"
+            print(f"  {owner}: {failure['url']} ({failure['reason']})")
+        # endfor
+    # endif
+
+    store.close()
+
+
+# enddef
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import threading
+from collections import OrderedDict
+
+
+class InFlightRequest:
+    """
+    A request that one thread is currently making, which other threads can wait on.
+    """
+
+    def __init__(self):
+        """
+        Creates an in-flight request with no result yet.
+
+        :return: None
+        """
+        self.done = threading.Event()
+        self.response = None
+
+    # enddef
+# endclass
+
+
+class RequestCoalescer:
+    """
+    Makes sure each URL is only downloaded once per run.
+    If several threads ask for the same URL at the same time they share one request,
+    and URLs already downloaded in this run are handed back from memory.
+    Only the most recent max_entries pages are kept so memory stays bounded.
+    """
+
+    def __init__(self, max_entries=2048):
+        """
+        Creates an empty coalescer.
+
+        :param max_entries: Maximum number of pages kept in memory (default 2048)
+        :return: None
+        """
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        self._responses = OrderedDict()
+        self._in_flight: dict[str, InFlightRequest] = {}
+        self._lock = threading.Lock()
+
+    # enddef
+
+    def fetch(self, url, fetch_function):
+        """
+        Gets a page from memory, from a request already in flight, or by calling fetch_function.
+
+        :param url: The URL to fetch
+        :param fetch_function: Function with no arguments that downloads the page (returns Response or None)
+        :return: Response object, or None if the download failed
+        """
+        is_owner = False
+        with self._lock:
+            if url in self._responses:
+                self.hits += 1
+                self._responses.move_to_end(url)
+                return self._responses[url]
+            # endif
+
+            in_flight = self._in_flight.get(url)
+            if in_flight is not None:
+                # Someone else is already downloading this page, wait for theirs
+                self.coalesced += 1
+            else:
+                self.misses += 1
+                in_flight = InFlightRequest()
+                self._in_flight[url] = in_flight
+                is_owner = True
+            # endif
+        # endwith
+
+        if not is_owner:
+            in_flight.done.wait()
+            return in_flight.response
+        # endif
+
+        response = None
+        try:
+            response = fetch_function()
+        finally:
+            with self._lock:
+                # Failed pages aren't remembered so a later call can try again
+                if response is not None:
+                    self._responses[url] = response
+                    while len(self._responses) > self.max_entries:
+                        self._responses.popitem(last=False)
+                    # endwhile
+                # endif
+                del self._in_flight[url]
+            # endwith
+
+            in_flight.response = response
+            in_flight.done.set()
+        # endtry
+
+        return response
+
+    # enddef
+
+    def stats(self):
+        """
+        Gets the hit and miss counters for this run.
+
+        :return: Dictionary with hits, coalesced and misses
+        """
+        with self._lock:
+            return {"hits": self.hits, "coalesced": self.coalesced, "misses": self.misses}
+        # endwith
+    # enddef
+# endclass
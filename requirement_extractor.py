@@ -0,0 +1,457 @@
+import html
+import json
+import re
+
+from bs4 import NavigableString, Tag
+
+from models.EntryRequirement import A_LEVEL_PATTERN, BTEC_PATTERN, UCAS_TARIFF_PATTERN
+
+# Text that shows a snippet is about entry requirements
+REQUIREMENT_KEYWORDS = re.compile(r"A\s*[-–]?\s*levels?|UCAS\s*Tariff|BTEC", re.IGNORECASE)
+
+# Qualifications we look for in accordion labels
+ACCORDION_QUALIFICATIONS = ["A level", "UCAS", "BTEC"]
+
+# Words in a div's class names that mean it holds entry requirements
+SECTION_CLASS_WORDS = ["requirement", "entry", "qualification"]
+
+# JSON-LD script blocks, found in the raw page without building a tree
+JSON_LD_SCRIPT_PATTERN = re.compile(r"""<script[^>]*type=["']application/ld\+json["'][^>]*>(.*?)</script>""",
+                                    re.IGNORECASE | re.DOTALL)
+
+# Page text that the JSON-LD can't show (subject requirements, courses that don't accept a
+# qualification, no requirements), so the full parse has to be used instead
+JSON_LD_FALLBACK_PHRASES = ["including", "not accepted", "not available", "no formal", "no specific",
+                            "no requirement", "requirements not specified", "n/a"]
+
+# Subject requirements written like "A* in Mathematics", "A*/A in Physics" or "AAB in Chemistry"
+IN_SUBJECT_PATTERN = re.compile(r"\sin\s+[A-Z]")
+GRADE_BEFORE_IN_PATTERN = re.compile(r"(?:^|[^\w*/])[A-E*/]+\s*$")
+
+# Runs of tags (and the space around them), used to split a page into the pieces of text between its tags
+TAG_RUN_PATTERN = re.compile(r"(?:\s*<[^>]*>\s*)+")
+
+
+class CoursePageParts:
+    """
+    Everything Course.parse_requirements needs from a course page, collected in one walk over the tree.
+    """
+
+    def __init__(self):
+        """
+        Creates an empty set of page parts.
+
+        :return: None
+        """
+        # First div.options-bar and first div.options-bar-custom on the page
+        self.options_bar = None
+        self.options_bar_custom = None
+
+        # First table on the page (the course options table when there are several options)
+        self.options_table = None
+
+        # Requirement snippets in the order the old multi-pass search found them, without duplicates
+        self.requirement_texts: list[str] = []
+
+    # enddef
+# endclass
+
+
+def accordion_texts(label):
+    """
+    Gets the label text and detailed content of an accordion whose label mentions a qualification.
+
+    :param label: h2.accordion__label element
+    :return: List of snippets (empty if the label isn't about a qualification)
+    """
+    found_qual = False
+    for qual in ACCORDION_QUALIFICATIONS:
+        if qual in label.text:
+            found_qual = True
+            break
+        # endif
+    # endfor
+    if not found_qual:
+        return []
+    # endif
+
+    texts = [label.text.strip()]
+
+    # The detailed content is in the accordion item the label belongs to
+    accordion_item = label.find_parent("li", class_="accordion__child")
+    if accordion_item:
+        content_div = accordion_item.find("div", class_="accordion__inner-wrapper")
+        if content_div:
+            detailed_text = content_div.get_text(strip=True)
+            if detailed_text and len(detailed_text) < 1000:  # Reasonable length
+                texts.append(detailed_text)
+            # endif
+        # endif
+    # endif
+    return texts
+
+
+# enddef
+
+def is_requirement_section(div):
+    """
+    Checks whether a div's class names suggest it holds entry requirements.
+
+    :param div: div element
+    :return: True if any class name contains "requirement", "entry" or "qualification"
+    """
+    if not div.has_attr("class"):
+        return False
+    # endif
+    for class_name in div.get("class", []):
+        class_name_lower = class_name.lower()
+        for word in SECTION_CLASS_WORDS:
+            if word in class_name_lower:
+                return True
+            # endif
+        # endfor
+    # endfor
+    return False
+
+
+# enddef
+
+def labelled_pair_text(left_text, right_text):
+    """
+    Joins a label and value (table cells or dt/dd) if the label is an entry requirement.
+
+    :param left_text: Label text
+    :param right_text: Value text
+    :return: Combined snippet, or None if it isn't a requirement
+    """
+    if not left_text or not right_text:
+        return None
+    # endif
+    if not REQUIREMENT_KEYWORDS.search(left_text):
+        return None
+    # endif
+    combined = f"{left_text} {right_text}"
+    if len(combined) >= 500:
+        return None
+    # endif
+    return combined
+
+
+# enddef
+
+def prerequisite_texts(data):
+    """
+    Turns the coursePrerequisites in parsed JSON-LD into requirement snippets.
+
+    :param data: Parsed JSON-LD (a dictionary or a list of them)
+    :return: List of snippets like "A level - AAB"
+    """
+    texts = []
+    items = data if isinstance(data, list) else [data]
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        # endif
+        if item.get("@type") != "Course":
+            continue
+        # endif
+        prereqs = item.get("coursePrerequisites") or []
+        if not isinstance(prereqs, list):
+            continue
+        # endif
+        for prereq in prereqs:
+            if not isinstance(prereq, dict):
+                continue
+            # endif
+            framework = prereq.get("educationalFramework") or ""
+            target = prereq.get("targetName") or ""
+            if not framework or not target:
+                continue
+            # endif
+            framework_lower = framework.lower()
+            if "a level" in framework_lower:
+                texts.append(f"A level - {target}")
+            elif "btec" in framework_lower:
+                texts.append(f"BTEC - {target}")
+            elif "ucas tariff" in framework_lower:
+                texts.append(f"UCAS Tariff - {target}")
+            # endif
+        # endfor
+    # endfor
+    return texts
+
+
+# enddef
+
+def json_ld_texts(script):
+    """
+    Turns the coursePrerequisites in a JSON-LD script element into requirement snippets.
+
+    :param script: script element with type application/ld+json
+    :return: List of snippets like "A level - AAB"
+    """
+    raw = script.string
+    if not raw:
+        return []
+    # endif
+    try:
+        data = json.loads(raw)
+    except Exception:
+        return []
+    # endtry
+    return prerequisite_texts(data)
+
+
+# enddef
+
+def needs_full_parse(text):
+    """
+    Checks whether page text has anything the JSON-LD can't show, like subject requirements
+    or a qualification that isn't accepted.
+
+    :param text: Page HTML with the JSON-LD blocks taken out
+    :return: True if the full parse has to be used
+    """
+    text_lower = text.lower()
+    for phrase in JSON_LD_FALLBACK_PHRASES:
+        if phrase in text_lower:
+            return True
+        # endif
+    # endfor
+
+    # Plain " in " is everywhere, so only look at the few words just before each one
+    for match in IN_SUBJECT_PATTERN.finditer(text):
+        if GRADE_BEFORE_IN_PATTERN.search(text, max(0, match.start() - 12), match.start()):
+            return True
+        # endif
+    # endfor
+    return False
+
+
+# enddef
+
+def requirement_values(text):
+    """
+    Finds every A level, UCAS Tariff and BTEC value that EntryRequirement.parse could read from some text,
+    written the way the parse reads them.
+
+    :param text: Requirement snippets, or the text of a page
+    :return: (list of A level grades, list of minimum UCAS points, list of BTEC grades) in the order found
+    """
+    a_levels = []
+    for match in A_LEVEL_PATTERN.finditer(text):
+        a_levels.append(match.group(1).strip())
+    # endfor
+
+    ucas_points = []
+    for match in UCAS_TARIFF_PATTERN.finditer(text):
+        ucas_points.append(match.group(1))
+    # endfor
+
+    btecs = []
+    for match in BTEC_PATTERN.finditer(text):
+        btecs.append(match.group(1).strip().upper())
+    # endfor
+    return a_levels, ucas_points, btecs
+
+
+# enddef
+
+def page_matches_json_ld(outside_html, requirement_texts):
+    """
+    Checks that every A level, UCAS Tariff and BTEC value written on the page (in the accordions,
+    tables and so on) is the same as the one in the JSON-LD. The full parse reads the page's own text
+    before the JSON-LD, so a page showing e.g. a range where the JSON-LD has one value would give a
+    different course on the fast path. Each piece of text between tags that mentions a qualification is
+    read together with the piece after it, the way labelled_pair_text joins a label and its value.
+    This can find more than the full parse would, which only means the full parse is used.
+
+    :param outside_html: Page HTML with the JSON-LD blocks taken out
+    :param requirement_texts: Snippets made from the JSON-LD by prerequisite_texts
+    :return: True if the page has no value that differs from the JSON-LD
+    """
+    pieces = TAG_RUN_PATTERN.split(outside_html)
+    pair_texts = []
+    for index, piece in enumerate(pieces):
+        if not REQUIREMENT_KEYWORDS.search(piece):
+            continue
+        # endif
+        next_piece = pieces[index + 1] if index + 1 < len(pieces) else ""
+        pair_texts.append(f"{piece} {next_piece}")
+    # endfor
+
+    page_values = requirement_values(html.unescape(" | ".join(pair_texts)))
+    json_ld_values = requirement_values(" | ".join(requirement_texts))
+
+    for found_on_page, found_in_json_ld in zip(page_values, json_ld_values):
+        for value in found_on_page:
+            # The full parse would take the first value, the fast path the JSON-LD's first one
+            if not found_in_json_ld or value != found_in_json_ld[0]:
+                return False
+            # endif
+        # endfor
+    # endfor
+    return True
+
+
+# enddef
+
+def extract_json_ld_requirements(page_html):
+    """
+    Fast path for course pages: pulls the JSON-LD blocks straight out of the raw page with a regex,
+    without building a BeautifulSoup tree, and turns their coursePrerequisites into requirement snippets.
+    This is only used when the JSON-LD has A level, BTEC and UCAS Tariff requirements, the rest of
+    the page has nothing the JSON-LD can't show, like subject requirements or "not accepted", and
+    every grade or points value written on the page is the same as the JSON-LD's.
+    The course options aren't taken from the JSON-LD (courseMode, startDate and so on aren't written
+    the way the page shows them), so they still have to be read from the page.
+
+    :param page_html: HTML text (or bytes) of the course page
+    :return: List of requirement snippets, or None to fall back to the full parse
+    """
+    if isinstance(page_html, bytes):
+        page_html = page_html.decode("utf-8", errors="replace")
+    # endif
+
+    requirement_texts = []
+    outside_parts = []
+    last_end = 0
+    for match in JSON_LD_SCRIPT_PATTERN.finditer(page_html):
+        outside_parts.append(page_html[last_end:match.start()])
+        last_end = match.end()
+
+        try:
+            data = json.loads(match.group(1))
+        except Exception:
+            continue
+        # endtry
+        requirement_texts.extend(prerequisite_texts(data))
+    # endfor
+
+    if not requirement_texts:
+        return None
+    # endif
+
+    for qualification in ["A level - ", "BTEC - ", "UCAS Tariff - "]:
+        found = False
+        for text in requirement_texts:
+            if text.startswith(qualification):
+                found = True
+                break
+            # endif
+        # endfor
+        if not found:
+            return None
+        # endif
+    # endfor
+
+    outside_parts.append(page_html[last_end:])
+    outside_html = " ".join(outside_parts)
+    if needs_full_parse(outside_html):
+        return None
+    # endif
+    if not page_matches_json_ld(outside_html, requirement_texts):
+        return None
+    # endif
+
+    return requirement_texts
+
+
+# enddef
+
+def extract_course_page(soup):
+    """
+    Walks the course page tree once and collects the options bar, options table and every
+    candidate requirement snippet (accordions, requirement divs, table rows, dt/dd pairs,
+    text around requirement keywords and JSON-LD).
+
+    Each kind of snippet is kept in its own list so the final order is the same as when every
+    kind was searched for separately. Repeated snippets are only kept the first time they appear.
+
+    :param soup: BeautifulSoup tree of the course page
+    :return: CoursePageParts
+    """
+    parts = CoursePageParts()
+
+    accordion_snippets = []
+    section_snippets = []
+    row_snippets = []
+    pair_snippets = []
+    keyword_snippets = []
+    json_ld_snippets = []
+
+    for element in soup.descendants:
+        if isinstance(element, Tag):
+            name = element.name
+            if name == "div":
+                class_names = element.get("class") or []
+                if parts.options_bar is None and "options-bar" in class_names:
+                    parts.options_bar = element
+                # endif
+                if parts.options_bar_custom is None and "options-bar-custom" in class_names:
+                    parts.options_bar_custom = element
+                # endif
+                if is_requirement_section(element):
+                    text = element.get_text(strip=True)
+                    if text and len(text) < 1500:  # Skip really long text
+                        section_snippets.append(text)
+                    # endif
+                # endif
+            elif name == "h2":
+                if "accordion__label" in (element.get("class") or []):
+                    accordion_snippets.extend(accordion_texts(element))
+                # endif
+            elif name == "tr":
+                # Requirement tables where labels and grades are in separate cells
+                cells = element.find_all(["th", "td"])
+                if len(cells) >= 2:
+                    combined_row = labelled_pair_text(cells[0].get_text(" ", strip=True),
+                                                      cells[1].get_text(" ", strip=True))
+                    if combined_row:
+                        row_snippets.append(combined_row)
+                    # endif
+                # endif
+            elif name == "table":
+                if parts.options_table is None:
+                    parts.options_table = element
+                # endif
+            elif name == "dl":
+                # Definition lists (dt/dd pairs) for entry requirements
+                for dt, dd in zip(element.find_all("dt"), element.find_all("dd")):
+                    combined_pair = labelled_pair_text(dt.get_text(" ", strip=True), dd.get_text(" ", strip=True))
+                    if combined_pair:
+                        pair_snippets.append(combined_pair)
+                    # endif
+                # endfor
+            elif name == "script":
+                if element.get("type") == "application/ld+json":
+                    json_ld_snippets.extend(json_ld_texts(element))
+                # endif
+            # endif
+        elif isinstance(element, NavigableString):
+            # Fallback: grab nearby text around key requirement keywords
+            if REQUIREMENT_KEYWORDS.search(element):
+                parent = element.parent
+                if parent:
+                    candidate = parent.get_text(" ", strip=True)
+                    if candidate and len(candidate) < 500:
+                        keyword_snippets.append(candidate)
+                    # endif
+                # endif
+            # endif
+        # endif
+    # endfor
+
+    seen = set()
+    for snippets in [accordion_snippets, section_snippets, row_snippets, pair_snippets, keyword_snippets,
+                     json_ld_snippets]:
+        for snippet in snippets:
+            if snippet not in seen:
+                seen.add(snippet)
+                parts.requirement_texts.append(snippet)
+            # endif
+        # endfor
+    # endfor
+
+    return parts
+# enddef
@@ -0,0 +1,332 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from email.utils import formatdate
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Only these headers are kept with a cached page, the rest aren't needed to rebuild it
+KEPT_HEADERS = ["Content-Type", "ETag", "Last-Modified", "Date"]
+
+
+class ResponseCache:
+    """
+    Keeps downloaded pages on disk so a resume or rescrape doesn't download them again.
+    Each page is stored as a zlib-compressed body file and a small JSON metadata file,
+    both named after a hash of the URL. Entries expire after their TTL, and once the cache
+    grows past max_bytes the least recently used entries are deleted.
+    """
+
+    def __init__(self, directory=".http_cache", ttl=3 * 24 * 60 * 60, max_bytes=2 * 1024 * 1024 * 1024,
+                 max_age=None):
+        """
+        Creates the cache and works out how much space it is already using.
+
+        :param directory: Folder to keep cached pages in (default ".http_cache")
+        :param ttl: Default seconds a page stays fresh before it has to be revalidated (default 3 days)
+        :param max_bytes: Size the cache is trimmed back to when it grows past it (default 2 GB)
+        :param max_age: Pages stored longer ago than this many seconds are revalidated even if their TTL
+                        hasn't run out, e.g. 0 revalidates everything (default None: only the TTL counts)
+        :return: None
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._total_bytes = 0
+        for _, path in self._all_entries():
+            self._total_bytes += self._entry_size(path)
+        # endfor
+
+    # enddef
+
+    def _base_path(self, url):
+        """
+        Works out where the files for a URL live.
+        The first two hash characters are used as a sub folder so no folder gets too big.
+
+        :param url: The page URL
+        :return: Path without the file extension
+        """
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key[:2], key)
+
+    # enddef
+
+    def _all_entries(self):
+        """
+        Lists every entry in the cache with the last time it was used.
+
+        :return: List of (last used time, base path) tuples
+        """
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for file_name in files:
+                if not file_name.endswith(".json"):
+                    continue
+                # endif
+                meta_path = os.path.join(root, file_name)
+                try:
+                    last_used = os.path.getmtime(meta_path)
+                except OSError:
+                    continue
+                # endtry
+                entries.append((last_used, meta_path[:-len(".json")]))
+            # endfor
+        # endfor
+        return entries
+
+    # enddef
+
+    @staticmethod
+    def _entry_size(base_path):
+        """
+        Adds up the size of an entry's body and metadata files.
+
+        :param base_path: Path without the file extension
+        :return: Size in bytes (0 if the files are missing)
+        """
+        size = 0
+        for extension in [".json", ".body"]:
+            try:
+                size += os.path.getsize(base_path + extension)
+            except OSError:
+                pass
+            # endtry
+        # endfor
+        return size
+
+    # enddef
+
+    def lookup(self, url):
+        """
+        Reads the cached copy of a page, whether or not it is still fresh.
+
+        :param url: The page URL
+        :return: (metadata dictionary, body bytes), or None if the page isn't cached
+        """
+        base_path = self._base_path(url)
+        try:
+            with open(base_path + ".json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            # endwith
+            with open(base_path + ".body", "rb") as f:
+                body = zlib.decompress(f.read())
+            # endwith
+        except Exception:
+            return None
+        # endtry
+
+        # Another URL with the same hash is practically impossible, but check anyway
+        if meta.get("url") != url:
+            return None
+        # endif
+
+        # Touch the metadata file so eviction knows this entry was used recently
+        try:
+            os.utime(base_path + ".json")
+        except OSError:
+            pass
+        # endtry
+
+        return meta, body
+
+    # enddef
+
+    def is_fresh(self, entry):
+        """
+        Checks whether a cached page can be used without asking the server.
+
+        :param entry: (metadata, body) from lookup()
+        :return: True if the entry hasn't expired yet (and isn't older than max_age)
+        """
+        meta = entry[0]
+        if self.max_age is not None and time.time() - meta.get("stored_at", 0) >= self.max_age:
+            return False
+        # endif
+        return time.time() < meta.get("expires_at", 0)
+
+    # enddef
+
+    @staticmethod
+    def conditional_headers(entry):
+        """
+        Builds the headers that let the server answer 304 Not Modified if the page hasn't changed.
+
+        :param entry: (metadata, body) from lookup()
+        :return: Dictionary of If-None-Match / If-Modified-Since headers (may be empty)
+        """
+        meta = entry[0]
+        stored_headers = meta.get("headers", {})
+        extra_headers = {}
+        if stored_headers.get("ETag"):
+            extra_headers["If-None-Match"] = stored_headers["ETag"]
+        # endif
+        if stored_headers.get("Last-Modified"):
+            extra_headers["If-Modified-Since"] = stored_headers["Last-Modified"]
+        # endif
+        return extra_headers
+
+    # enddef
+
+    @staticmethod
+    def build_response(entry):
+        """
+        Turns a cached entry back into a Response object so callers can't tell the difference.
+
+        :param entry: (metadata, body) from lookup()
+        :return: requests.Response object
+        """
+        meta, body = entry
+        response = requests.Response()
+        response.status_code = meta.get("status_code", 200)
+        response.url = meta.get("url", "")
+        response.headers = CaseInsensitiveDict(meta.get("headers", {}))
+        if "Date" not in response.headers and "stored_at" in meta:
+            # Entries cached before the Date header was kept get one from when they were stored
+            response.headers["Date"] = formatdate(meta["stored_at"], usegmt=True)
+        # endif
+        response.encoding = meta.get("encoding")
+        response._content = body
+        return response
+
+    # enddef
+
+    def store(self, url, response, ttl=None):
+        """
+        Saves a freshly downloaded page in the cache.
+
+        :param url: The page URL
+        :param response: The Response object to save
+        :param ttl: Seconds this entry stays fresh (default is the cache's ttl)
+        :return: None
+        """
+        if ttl is None:
+            ttl = self.ttl
+        # endif
+
+        stored_headers = {}
+        for header_name in KEPT_HEADERS:
+            value = response.headers.get(header_name)
+            if value:
+                stored_headers[header_name] = value
+            # endif
+        # endfor
+
+        meta = {
+            "url": url,
+            "status_code": response.status_code,
+            "encoding": response.encoding,
+            "headers": stored_headers,
+            "stored_at": time.time(),
+            "expires_at": time.time() + ttl
+        }
+        self._write_entry(url, meta, response.content)
+
+    # enddef
+
+    def mark_revalidated(self, url, entry, response, ttl=None):
+        """
+        Handles a 304 Not Modified answer by keeping the cached body and making it fresh again.
+
+        :param url: The page URL
+        :param entry: (metadata, body) from lookup()
+        :param response: The 304 Response object (may carry a new ETag)
+        :param ttl: Seconds this entry stays fresh (default is the cache's ttl)
+        :return: Response object rebuilt from the cache
+        """
+        if ttl is None:
+            ttl = self.ttl
+        # endif
+
+        meta, body = entry
+        for header_name in ["ETag", "Last-Modified"]:
+            value = response.headers.get(header_name)
+            if value:
+                meta["headers"][header_name] = value
+            # endif
+        # endfor
+
+        # The server has just said the page is current, so it counts as fetched now (see Course.page_fetched_at).
+        # Keeping the old Date would make a refresh fetch an unchanged course again once it is older than max_age
+        meta["headers"]["Date"] = response.headers.get("Date") or formatdate(time.time(), usegmt=True)
+        meta["stored_at"] = time.time()
+        meta["expires_at"] = time.time() + ttl
+
+        self._write_entry(url, meta, body)
+        return self.build_response(entry)
+
+    # enddef
+
+    def _write_entry(self, url, meta, body):
+        """
+        Writes an entry to disk and trims the cache if it has grown too big.
+        Files are written to a temporary name first so a crash never leaves half a page behind.
+
+        :param url: The page URL
+        :param meta: Metadata dictionary
+        :param body: Uncompressed body bytes
+        :return: None
+        """
+        base_path = self._base_path(url)
+        os.makedirs(os.path.dirname(base_path), exist_ok=True)
+
+        with self._lock:
+            old_size = self._entry_size(base_path)
+
+            temp_suffix = f".tmp{threading.get_ident()}"
+            try:
+                with open(base_path + ".body" + temp_suffix, "wb") as f:
+                    f.write(zlib.compress(body))
+                # endwith
+                with open(base_path + ".json" + temp_suffix, "w", encoding="utf-8") as f:
+                    json.dump(meta, f)
+                # endwith
+                os.replace(base_path + ".body" + temp_suffix, base_path + ".body")
+                os.replace(base_path + ".json" + temp_suffix, base_path + ".json")
+            except OSError as e:
+                print(f"Could not write cache entry for {url}: {e}")
+                return
+            # endtry
+
+            self._total_bytes += self._entry_size(base_path) - old_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            # endif
+        # endwith
+
+    # enddef
+
+    def _evict(self):
+        """
+        Deletes the least recently used entries until the cache is back under 90% of max_bytes.
+        Going a bit under the limit means we don't have to evict again on the very next page.
+
+        :return: None
+        """
+        target = self.max_bytes * 0.9
+        entries = sorted(self._all_entries())
+        for _, base_path in entries:
+            if self._total_bytes <= target:
+                break
+            # endif
+            size = self._entry_size(base_path)
+            for extension in [".json", ".body"]:
+                try:
+                    os.remove(base_path + extension)
+                except OSError:
+                    pass
+                # endtry
+            # endfor
+            self._total_bytes -= size
+        # endfor
+    # enddef
+# endclass
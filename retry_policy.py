@@ -0,0 +1,117 @@
+import email.utils
+import random
+import threading
+import time
+
+
+def parse_retry_after(value):
+    """
+    Reads a Retry-After header, which can be a number of seconds or an HTTP date.
+
+    :param value: The header value (or None if the header wasn't sent)
+    :return: Seconds to wait, or None if the header is missing or can't be read
+    """
+    if not value:
+        return None
+    # endif
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    # endif
+
+    try:
+        retry_date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    # endtry
+    if retry_date is None:
+        return None
+    # endif
+
+    return max(0.0, retry_date.timestamp() - time.time())
+
+
+# enddef
+
+
+class RetryPolicy:
+    """
+    Decides which failed requests are worth retrying and how long to wait before each retry.
+    429 and 5xx answers are retried with exponential backoff and full jitter (or the server's
+    Retry-After if it sends one). Other 4xx answers such as 404 won't change, so they are never retried.
+    The policy also keeps a retry budget for the whole crawl so a broken site can't stall it forever.
+    """
+
+    def __init__(self, base_delay=2.0, max_delay=60.0, max_retry_after=300.0, max_total_retries=None):
+        """
+        Creates a retry policy.
+
+        :param base_delay: Seconds the backoff starts from (default 2.0)
+        :param max_delay: Longest backoff in seconds, before jitter (default 60.0)
+        :param max_retry_after: Longest Retry-After we are willing to honour in seconds (default 300.0)
+        :param max_total_retries: Retries allowed across the whole crawl, None for no limit (default None)
+        :return: None
+        """
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.max_total_retries = max_total_retries
+
+        self.retries_used = 0
+        self._lock = threading.Lock()
+
+    # enddef
+
+    @staticmethod
+    def should_retry_status(status_code):
+        """
+        Checks whether a failed status code might succeed if we try again.
+
+        :param status_code: HTTP status code of the failed response
+        :return: True for 429 and 5xx, False for everything else (e.g. 404)
+        """
+        return status_code == 429 or 500 <= status_code < 600
+
+    # enddef
+
+    def take_retry(self):
+        """
+        Uses up one retry from the crawl's budget.
+
+        :return: True if the retry is allowed, False if the budget has run out
+        """
+        with self._lock:
+            if self.max_total_retries is not None and self.retries_used >= self.max_total_retries:
+                return False
+            # endif
+            self.retries_used += 1
+            return True
+        # endwith
+
+    # enddef
+
+    def get_delay(self, attempt, retry_after=None, base_delay=None):
+        """
+        Works out how long to wait before the next attempt.
+        Full jitter picks a random wait between 0 and the exponential backoff,
+        so lots of failed requests don't all retry at the same moment.
+
+        :param attempt: Number of the attempt that just failed, starting at 0
+        :param retry_after: Retry-After header value from the response, if any
+        :param base_delay: Seconds the backoff starts from (default is the policy's base_delay)
+        :return: Seconds to wait
+        """
+        server_delay = parse_retry_after(retry_after)
+        if server_delay is not None:
+            return min(server_delay, self.max_retry_after)
+        # endif
+
+        if base_delay is None:
+            base_delay = self.base_delay
+        # endif
+
+        backoff = min(self.max_delay, base_delay * (2 ** attempt))
+        return random.uniform(0, backoff)
+    # enddef
+# endclass
@@ -1,10 +1,10 @@
 import re
-from bs4 import BeautifulSoup
 from requests import Response
+from html_parser import make_listing_soup
 from network_helper import get_with_retry
 
 
-def get_links_to_crawl(link, headers):
+def get_links_to_crawl(link, headers, session=None):
     """
     Visits search link, counts the total number of search result pages,
     builds a list of all search links to crawl, and inserts the main
@@ -12,6 +12,7 @@ def get_links_to_crawl(link, headers):
 
     :param link: The search URL to start from
     :param headers: Request headers dictionary
+    :param session: Optional shared session so the connection is reused
     :return: List of all result page URLs to crawl
     """
 
@@ -19,7 +20,7 @@ def get_links_to_crawl(link, headers):
     all_result_pages_to_crawl: [str] = []
 
     # 1. Visit main search page
-    page: Response = get_with_retry(link, headers)
+    page: Response = get_with_retry(link, headers, session=session)
 
     # Check if the request failed
     if page is None:
@@ -27,7 +28,8 @@ def get_links_to_crawl(link, headers):
         return []
     # endif
 
-    soup = BeautifulSoup(page.text, "html.parser")
+    # Only the pagination list is needed, so the rest of the page isn't parsed
+    soup = make_listing_soup(page.text)
 
     # 2. Get total page count of search results
 
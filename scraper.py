@@ -1,11 +1,25 @@
 #!/usr/bin/env python3
 
-import json
 import os
 import urllib.parse
 from datetime import date
 
 from models.University import University
+from models.EntryRequirement import parse_cache
+from failure_store import FailureStore
+from network_helper import create_session, set_response_cache, set_rate_limiter, set_retry_policy, set_failure_store
+from network_helper import set_request_coalescer, set_http_archive
+from html_parser import make_listing_soup
+from http_archive import HttpArchive
+from parse_pipeline import start_parse_pool, stop_parse_pool, worker_cache_stats
+from progress_journal import ProgressJournal
+from JSONReader import iter_universities
+import columnar_export
+from university_store import UniversityStore
+from request_coalescer import RequestCoalescer
+from retry_policy import RetryPolicy
+from rate_limiter import HostRateLimiter
+from response_cache import ResponseCache
 from scrape_search_results import *
 
 # Development settings: Limit scraping for testing
@@ -17,6 +31,77 @@ from scrape_search_results import *
 # Maximum number of universities without requirements to collect (edge cases)
 # MAX_UNIS_WITHOUT_REQ = 5
 
+# Address of the UCAS website, can be pointed at a local stand-in for testing and benchmarks
+# e.g. SCRAPER_UCAS_URL=http://127.0.0.1:8800 python3 scraper.py
+UCAS_BASE_URL = os.environ.get("SCRAPER_UCAS_URL", "https://www.ucas.com")
+
+# How course detail pages are fetched:
+# "sequential" fetches one page at a time, "async" fetches many at once with asyncio,
+# "threads" fetches many at once with a thread pool (for when asyncio isn't practical),
+# "pipeline" fetches on threads and parses in separate processes so parsing doesn't slow the fetching down
+# e.g. SCRAPER_FETCH_MODE=pipeline python3 scraper.py
+FETCH_MODE = os.environ.get("SCRAPER_FETCH_MODE", "async")
+
+# Maximum course pages in flight at once (also the thread pool size), and maximum to a single host
+FETCH_CONCURRENCY = 16
+FETCH_PER_HOST = 8
+
+# "pipeline" mode only: number of parser processes (0 means one per CPU), and how many downloaded
+# pages can wait to be parsed before the fetchers have to wait for the parsers to catch up
+PARSE_WORKERS = int(os.environ.get("SCRAPER_PARSE_WORKERS", "0"))
+PIPELINE_QUEUE_SIZE = 64
+
+# Keep downloaded pages on disk so resuming or rescraping doesn't download them again
+# Pages older than the TTL are revalidated with the server (ETag / If-Modified-Since)
+USE_RESPONSE_CACHE = True
+RESPONSE_CACHE_DIR = ".http_cache"
+RESPONSE_CACHE_TTL = 3 * 24 * 60 * 60  # 3 days
+RESPONSE_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2 GB
+
+# Adapt the request rate to what UCAS will tolerate instead of a fixed delay
+# The rate ramps up a little after each success and halves on 429 / 503 / timeouts
+# Can be switched off for local benchmarks with SCRAPER_RATE_LIMITER=0
+USE_RATE_LIMITER = os.environ.get("SCRAPER_RATE_LIMITER", "1") != "0"
+RATE_LIMIT_INITIAL = 2.0  # requests per second per host
+RATE_LIMIT_MAX = 20.0
+
+# Retries across the whole crawl, so a broken site can't keep us retrying forever
+RETRY_BUDGET = 5000
+
+# Record every page of the crawl into an archive ("record"), or run the whole crawl from a
+# previous archive with no network access ("replay"). An empty string turns the archive off.
+# Pages are recorded by default so reparse.py can rebuild universities.json after a parsing fix
+# e.g. SCRAPER_ARCHIVE_MODE=replay python3 scraper.py
+HTTP_ARCHIVE_MODE = os.environ.get("SCRAPER_ARCHIVE_MODE", "record")
+HTTP_ARCHIVE_PATH = os.environ.get("SCRAPER_ARCHIVE_PATH", "crawl_archive.gz")
+
+# Each finished university is appended to universities.json.journal, and the journal is folded into
+# universities.json this often (and at the end of the crawl)
+PROGRESS_COMPACT_INTERVAL = 10 * 60  # 10 minutes
+
+# Write universities.json without indentation: smaller and quicker to save, but harder to read by eye
+COMPACT_JSON = os.environ.get("SCRAPER_COMPACT_JSON", "0") == "1"
+
+# Also keep the universities in an indexed SQLite database that can be queried without loading the JSON
+# (see UniversityStore.find_courses). An empty string turns it off.
+# e.g. SCRAPER_SQLITE_PATH=universities.db python3 scraper.py
+SQLITE_STORE_PATH = os.environ.get("SCRAPER_SQLITE_PATH", "")
+
+# After the crawl, also export the courses and requirements as memory mappable NumPy columns for
+# analytics (see columnar_export.py, needs NumPy). An empty string turns it off.
+# e.g. SCRAPER_COLUMNS_PATH=universities_columns python3 scraper.py
+COLUMNS_EXPORT_PATH = os.environ.get("SCRAPER_COLUMNS_PATH", "")
+if COLUMNS_EXPORT_PATH and columnar_export.np is None:
+    # Stop now rather than after the whole crawl has finished
+    raise SystemExit("NumPy is needed for SCRAPER_COLUMNS_PATH: pip install numpy")
+# endif
+
+# Refresh mode crawls universities already in universities.json again, but only fetches the page of a
+# course whose card on the results page has changed, or whose saved page is older than the max age
+# e.g. SCRAPER_REFRESH=1 SCRAPER_REFRESH_MAX_AGE_DAYS=7 python3 scraper.py
+REFRESH_MODE = os.environ.get("SCRAPER_REFRESH", "0") == "1"
+REFRESH_MAX_AGE = float(os.environ.get("SCRAPER_REFRESH_MAX_AGE_DAYS", "7")) * 24 * 60 * 60
+
 # Counters for tracking what we've found
 count_with_req = 0
 count_without_req = 0
@@ -29,83 +114,33 @@ count_without_req = 0
 all_universities: [University] = []
 
 
-def load_existing_universities(path: str) -> tuple[list[dict], set[str], int, int]:
+def load_existing_universities(journal: ProgressJournal) -> tuple[list[dict], set[str], int, int]:
     """
-    Loads existing university data to enable resume behavior.
+    Loads existing university data (universities.json plus anything in the progress journal) to enable resume behavior.
+    Only the summary index next to universities.json is read, not the whole file.
 
-    :param path: JSON file path to load
-    :return: (existing_data, existing_names, count_with_req, count_without_req)
+    :param journal: ProgressJournal the crawl saves its progress to
+    :return: (summaries of the saved universities, existing_names, count_with_req, count_without_req)
     """
-    if not os.path.exists(path):
-        return [], set(), 0, 0
-    #endif
-
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except Exception:
-        return [], set(), 0, 0
-    # endtry
-
-    if not isinstance(data, list):
-        return [], set(), 0, 0
-    # endif
+    summaries = journal.load()
 
     existing_names = set()
     with_req = 0
     without_req = 0
 
-    for uni in data:
-        if not isinstance(uni, dict):
-            continue
-        # endif
-        name_value = uni.get("name")
-        if name_value is None:
-            name_value = ""
-        # endif
-        name = name_value.strip()
-        if name:
-            existing_names.add(name)
-        # endif
-
-        uni_has_requirements = False
-        courses = uni.get("courses")
-        if courses is None:
-            courses = []
+    for summary in summaries:
+        if summary["name"]:
+            existing_names.add(summary["name"])
         # endif
-        for course in courses:
-            requirements = course.get("requirements")
-            if requirements is None:
-                requirements = []
-            # endif
-            for req in requirements:
-                if not isinstance(req, dict):
-                    continue
-                # endif
-                has_requirements = req.get("has_requirements")
-                min_points = req.get("min_ucas_points")
-                display_grades = req.get("display_grades")
-                if min_points is None:
-                    min_points = 0
-                # endif
-                if has_requirements and (min_points > 0 or display_grades):
-                    uni_has_requirements = True
-                    break
-                # endif
-            # endfor
-            if uni_has_requirements:
-                break
-            # endif
-        # endfor
 
-        if uni_has_requirements:
+        if summary["has_requirements"]:
             with_req += 1
         else:
             without_req += 1
         # endif
     # endfor
 
-    return data, existing_names, with_req, without_req
+    return summaries, existing_names, with_req, without_req
 
 
 # enddef
@@ -138,61 +173,6 @@ def load_target_universities(path: str) -> set[str]:
     return names
 
 
-# enddef
-
-def replace_university(existing_data: list[dict], university_dict: dict) -> list[dict]:
-    """
-    Replaces an existing university entry with the same name, or appends if new.
-
-    :param existing_data: Existing list of university dictionaries
-    :param university_dict: New university dictionary
-    :return: Updated list of university dictionaries
-    """
-    name_value = university_dict.get("name")
-    if name_value is None:
-        name_value = ""
-    # endif
-    target_name = name_value.strip()
-    if not target_name:
-        return existing_data
-    # endif
-
-    updated = []
-    for item in existing_data:
-        if not isinstance(item, dict):
-            updated.append(item)
-            continue
-        # endif
-        item_name_value = item.get("name")
-        if item_name_value is None:
-            item_name_value = ""
-        # endif
-        item_name = item_name_value.strip()
-        if item_name == target_name:
-            continue
-        # endif
-        updated.append(item)
-    # endfor
-
-    updated.append(university_dict)
-    return updated
-
-
-# enddef
-
-def save_progress(path: str, data: list[dict]) -> None:
-    """
-    Saves scraped data to disk for resume support.
-
-    :param path: JSON file path to save
-    :param data: List of university dictionaries
-    :return: None
-    """
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
-    # endwith
-
-
 # enddef
 
 # Scraping logic...
@@ -208,19 +188,76 @@ headers = {
 # https://www.ucas.com/explore/unis/6cadf6e5/the-university-of-law
 # link = https://www.ucas.com/explore/unis + code + university name + /courses?studyLevel=undergraduate&studyYear=2026
 
+# The parser processes are started first, so they are made before the crawl starts any threads
+if FETCH_MODE == "pipeline":
+    start_parse_pool(PARSE_WORKERS)
+# endif
+
+# One shared session for the whole crawl so every request to UCAS reuses
+# kept-alive connections instead of doing a new TCP/TLS handshake per page
+# pool_maxsize is how many connections are kept open to the same host, so it
+# matches the number of course pages that can be in flight at once
+session = create_session(pool_connections=10, pool_maxsize=FETCH_CONCURRENCY)
+
+# Each URL is downloaded once per run: the first search page and each university's first results page
+# are asked for twice, and joint courses appear under several universities
+request_coalescer = RequestCoalescer(max_entries=2048)
+set_request_coalescer(request_coalescer)
+
+# Failed pages are recorded with their university and course so replay_failed.py can re-fetch just those
+set_failure_store(FailureStore("failed_urls.db"))
+
+retry_policy = RetryPolicy(max_total_retries=RETRY_BUDGET)
+set_retry_policy(retry_policy)
+
+rate_limiter = None
+if USE_RATE_LIMITER:
+    rate_limiter = HostRateLimiter(initial_rate=RATE_LIMIT_INITIAL, max_rate=RATE_LIMIT_MAX,
+                                   max_concurrency=FETCH_PER_HOST)
+    set_rate_limiter(rate_limiter)
+# endif
+
+http_archive = None
+if HTTP_ARCHIVE_MODE:
+    http_archive = HttpArchive(HTTP_ARCHIVE_PATH, mode=HTTP_ARCHIVE_MODE)
+    set_http_archive(http_archive)
+    print(f"HTTP archive: {HTTP_ARCHIVE_MODE} {HTTP_ARCHIVE_PATH}")
+# endif
+
+# Replaying never touches the network, so the disk cache would only get in the way.
+# A refresh has to see today's results pages, so every cached page is revalidated with the server
+if USE_RESPONSE_CACHE and HTTP_ARCHIVE_MODE != "replay":
+    cache_max_age = 0 if REFRESH_MODE else None
+    set_response_cache(ResponseCache(RESPONSE_CACHE_DIR, ttl=RESPONSE_CACHE_TTL, max_bytes=RESPONSE_CACHE_MAX_BYTES,
+                                     max_age=cache_max_age))
+# endif
+
 # Get links of all the result pages we need to crawl. We need to find total number of pages
 # Their page results are like this: https://www.ucas.com/explore/search/providers?query=&page=2
 
 # Store links to crawl as UCAS returns few results per page
-all_result_pages_to_crawl: [str] = get_links_to_crawl("https://www.ucas.com/explore/search/providers?query=", headers)
+all_result_pages_to_crawl: [str] = get_links_to_crawl(f"{UCAS_BASE_URL}/explore/search/providers?query=", headers,
+                                                      session=session)
 
-existing_data, existing_names, count_with_req, count_without_req = load_existing_universities("universities.json")
+progress_journal = ProgressJournal("universities.json", compact_interval=PROGRESS_COMPACT_INTERVAL,
+                                   compact_json=COMPACT_JSON)
+existing_summaries, existing_names, count_with_req, count_without_req = load_existing_universities(progress_journal)
+
+university_store = None
+if SQLITE_STORE_PATH:
+    university_store = UniversityStore(SQLITE_STORE_PATH)
+# endif
 target_universities = load_target_universities("unis_without_requirements.txt")
 
 if target_universities:
     print(f"Targeted rescrape enabled for {len(target_universities)} universities")
     count_with_req = 0
     count_without_req = 0
+elif REFRESH_MODE:
+    print(f"Refreshing {len(existing_names)} saved universities, course pages older than "
+          f"{REFRESH_MAX_AGE / 86400:g} days are fetched again")
+    count_with_req = 0
+    count_without_req = 0
 # endif
 
 total_targets = len(target_universities) if target_universities else 0
@@ -229,7 +266,7 @@ rescraped_count = 0
 for link_to_crawl in all_result_pages_to_crawl:
     # Now I'll loop through each of the results pages I found earlier.
     # This request gets the HTML for one page of university listings.
-    page: Response = get_with_retry(link_to_crawl, headers)
+    page: Response = get_with_retry(link_to_crawl, headers, session=session)
 
     # Check if the request failed
     if page is None:
@@ -237,7 +274,8 @@ for link_to_crawl in all_result_pages_to_crawl:
         continue
     # endif
 
-    soup = BeautifulSoup(page.text, "html.parser")
+    # Only the university cards are needed, so the rest of the page isn't parsed
+    soup = make_listing_soup(page.text)
 
     # find all the centered elements
     # on the page
@@ -277,7 +315,7 @@ for link_to_crawl in all_result_pages_to_crawl:
 
             encoded_uni_name = urllib.parse.quote(university.name)
 
-            university.link_all_courses = f"https://www.ucas.com/explore/search/courses?query=&refinementList%5Bscheme%5D%5B0%5D=Undergraduate&refinementList%5BacademicYear%5D%5B0%5D={current_year}&refinementList%5Buniversity%5D%5B0%5D={encoded_uni_name}"
+            university.link_all_courses = f"{UCAS_BASE_URL}/explore/search/courses?query=&refinementList%5Bscheme%5D%5B0%5D=Undergraduate&refinementList%5BacademicYear%5D%5B0%5D={current_year}&refinementList%5Buniversity%5D%5B0%5D={encoded_uni_name}"
 
             # Process this university
             break
@@ -287,7 +325,7 @@ for link_to_crawl in all_result_pages_to_crawl:
             continue
         # endif
 
-        if university.name in existing_names and not target_universities:
+        if university.name in existing_names and not target_universities and not REFRESH_MODE:
             print(f"Skipping already-scraped university: {university.name}")
             continue
         # endif
@@ -307,7 +345,19 @@ for link_to_crawl in all_result_pages_to_crawl:
         # 1. Find all courses (and its basic information and dates)
         # 2. For each course extract grade requirements and UCAS points
         # 3.
-        university.fetch_courses(headers)
+        # When refreshing, courses whose cards haven't changed are copied from the saved record
+        previous_courses = None
+        if REFRESH_MODE:
+            saved_university = progress_journal.get_university(university.name)
+            if saved_university is not None:
+                previous_courses = saved_university.get("courses") or []
+            # endif
+        # endif
+
+        university.fetch_courses(headers, session=session, fetch_mode=FETCH_MODE,
+                                  max_concurrency=FETCH_CONCURRENCY, max_per_host=FETCH_PER_HOST,
+                                  pipeline_queue_size=PIPELINE_QUEUE_SIZE, previous_courses=previous_courses,
+                                  max_age=REFRESH_MAX_AGE)
 
         # Check if this university has courses with requirements
         uni_has_requirements = False
@@ -338,9 +388,12 @@ for link_to_crawl in all_result_pages_to_crawl:
         # endif
 
         all_universities.append(university)
-        existing_data = replace_university(existing_data, university.to_dict())
+        university_dict = university.to_dict()
+        progress_journal.append(university_dict)
+        if university_store is not None:
+            university_store.save_university(university_dict)
+        # endif
         existing_names.add(university.name)
-        save_progress("universities.json", existing_data)
         print(f"Found university {label} requirements ({count_value}): {university.name}")
 
         if target_universities:
@@ -367,6 +420,25 @@ print(f"Universities without requirements: {count_without_req}")
 # print(f"Universities with requirements: {count_with_req}/{MAX_UNIS_WITH_REQ}")
 # print(f"Universities without requirements: {count_without_req}/{MAX_UNIS_WITHOUT_REQ}")
 print(f"Total universities collected: {len(all_universities)}")
+print(f"Retries used: {retry_policy.retries_used} / {RETRY_BUDGET}")
+dedup_stats = request_coalescer.stats()
+print(f"Request de-duplication: {dedup_stats['hits']} served from memory, "
+      f"{dedup_stats['coalesced']} shared an in-flight request, {dedup_stats['misses']} fetched")
+if FETCH_MODE == "pipeline":
+    # Course pages were parsed in the parser processes, each with its own cache
+    parse_stats = worker_cache_stats()
+else:
+    parse_stats = parse_cache.stats()
+# endif
+print(f"Requirement parse cache: {parse_stats['hits']} hits, {parse_stats['misses']} misses "
+      f"({parse_stats['hit_rate']:.1%} hit rate)")
+if rate_limiter is not None:
+    for host, host_metrics in rate_limiter.metrics().items():
+        print(f"Rate limit for {host}: {host_metrics['rate']} req/s, "
+              f"window {host_metrics['concurrency_limit']}, in flight {host_metrics['in_flight']}, "
+              f"{host_metrics['successes']} ok, {host_metrics['throttled']} throttled")
+    # endfor
+# endif
 print("========================================")
 
 # Print all universities obtained
@@ -374,7 +446,21 @@ for university in all_universities:
     university.print()
 # endfor
 
+# Fold the journal into universities.json
+progress_journal.close()
+if university_store is not None:
+    university_store.close()
+# endif
+if COLUMNS_EXPORT_PATH and os.path.exists("universities.json"):
+    column_counts = columnar_export.export_columns(iter_universities("universities.json"), COLUMNS_EXPORT_PATH)
+    print(f"Exported {column_counts['courses']} courses to {COLUMNS_EXPORT_PATH}")
+# endif
 if all_universities:
-    save_progress("universities.json", existing_data)
     print("saved")
 # endif
+
+stop_parse_pool()
+
+if http_archive is not None:
+    http_archive.close()
+# endif
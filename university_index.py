@@ -0,0 +1,253 @@
+"""
+A small index file kept next to universities.json ("universities.json.index"), written every time
+universities.json is saved. For each university it holds a summary (name, whether it has entry
+requirements, whether a bachelor course is missing them, number of courses), a hash of its record
+and where the record is in universities.json. Resuming a crawl and generate_unis_without_requirements.py
+only need these summaries, so they read the index instead of parsing the whole JSON file.
+
+The first line of the index records the size and modification time of the universities.json it
+describes, so an index that doesn't match the file (e.g. the file was edited by hand) is ignored.
+"""
+
+import json
+import os
+
+INDEX_VERSION = 1
+
+
+class StoredUniversity:
+    """
+    A university that is already written in universities.json, known only by its index entry.
+    Its record can be copied into a new universities.json as it is, without decoding and encoding it again.
+    """
+
+    def __init__(self, entry, compact=False):
+        """
+        Wraps an index entry.
+
+        :param entry: Index entry dictionary (summary, hash, offset and length)
+        :param compact: Whether the record was written in compact form
+        :return: None
+        """
+        self.entry = entry
+        self.compact = compact
+
+        # The bytes of the universities.json the record is in, set by whoever opens it
+        self.source = None
+
+    # enddef
+
+    def encoded(self):
+        """
+        Gets the record's bytes exactly as they are in universities.json.
+
+        :return: JSON bytes
+        """
+        offset = self.entry["offset"]
+        return bytes(self.source[offset:offset + self.entry["length"]])
+
+    # enddef
+
+    def to_dict(self):
+        """
+        Decodes the record into a university dictionary.
+
+        :return: University dictionary
+        """
+        return json.loads(self.encoded())
+    # enddef
+# endclass
+
+
+def index_path(json_path):
+    """
+    Gets the path of the index that goes with a JSON file.
+
+    :param json_path: Path of universities.json
+    :return: Path of its index
+    """
+    return json_path + ".index"
+
+
+# enddef
+
+def is_bachelor_course(course_type: str) -> bool:
+    """
+    Checks if a course type looks like a bachelor or integrated bachelor/masters.
+
+    :param course_type: Course type text from the JSON
+    :return: True if it is a bachelor-level course
+    """
+    if not course_type:
+        return False
+    # endif
+
+    text = course_type.strip().lower()
+
+    bachelor_keywords = [
+        "ba", "bsc", "beng", "llb", "bba", "bcs",
+        "bachelor", "certhe", "diphe", "fda", "fdsc",
+        # integrated masters that still use A-level requirements
+        "meng", "msci", "mphys", "mchem", "mmath"
+    ]
+
+    for keyword in bachelor_keywords:
+        if keyword in text:
+            return True
+        # endif
+    # endfor
+
+    return False
+
+
+# enddef
+
+def has_missing_bachelor_requirements(courses: list[dict]) -> bool:
+    """
+    Checks whether any bachelor-level course is missing entry requirements.
+
+    :param courses: List of course dictionaries from the JSON file
+    :return: True if any bachelor course has empty requirements
+    """
+    for course in courses:
+        course_type = course.get("course_type") or ""
+        if not is_bachelor_course(course_type):
+            continue
+        # endif
+
+        requirements = course.get("requirements")
+        if requirements is None:
+            requirements = []
+        # endif
+        if not requirements:
+            return True
+        # endif
+    # endfor
+    return False
+
+
+# enddef
+
+def university_has_requirements(university_dict):
+    """
+    Checks whether any course of a university has real entry requirements (UCAS points or grades).
+    This is what the crawl counts as a university "with requirements".
+
+    :param university_dict: University dictionary
+    :return: True if at least one course has requirements
+    """
+    courses = university_dict.get("courses")
+    if courses is None:
+        courses = []
+    # endif
+    for course in courses:
+        requirements = course.get("requirements")
+        if requirements is None:
+            requirements = []
+        # endif
+        for req in requirements:
+            if not isinstance(req, dict):
+                continue
+            # endif
+            min_points = req.get("min_ucas_points")
+            if min_points is None:
+                min_points = 0
+            # endif
+            if req.get("has_requirements") and (min_points > 0 or req.get("display_grades")):
+                return True
+            # endif
+        # endfor
+    # endfor
+    return False
+
+
+# enddef
+
+def summarise_university(university_dict):
+    """
+    Works out the summary kept in the index for one university.
+
+    :param university_dict: University dictionary (anything else gets an empty summary)
+    :return: Dictionary with name, has_requirements, missing_bachelor and course_count
+    """
+    if not isinstance(university_dict, dict):
+        return {"name": "", "has_requirements": False, "missing_bachelor": False, "course_count": 0}
+    # endif
+
+    courses = university_dict.get("courses")
+    if courses is None:
+        courses = []
+    # endif
+    return {
+        "name": (university_dict.get("name") or "").strip(),
+        "has_requirements": university_has_requirements(university_dict),
+        "missing_bachelor": has_missing_bachelor_requirements(courses),
+        "course_count": len(courses)
+    }
+
+
+# enddef
+
+def write_index(json_path, entries, compact):
+    """
+    Writes the index for a JSON file that has just been saved.
+
+    :param json_path: Path of universities.json (already in its final place)
+    :param entries: List of index entries, one per university in file order
+    :param compact: Whether universities.json was written in compact form
+    :return: None
+    """
+    json_stat = os.stat(json_path)
+    header = {
+        "version": INDEX_VERSION,
+        "json_size": json_stat.st_size,
+        "json_mtime_ns": json_stat.st_mtime_ns,
+        "compact": compact,
+        "count": len(entries)
+    }
+
+    path = index_path(json_path)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(header) + "\n")
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+        # endfor
+    # endwith
+    os.replace(temp_path, path)
+
+
+# enddef
+
+def read_index(json_path):
+    """
+    Reads the index for a JSON file, if there is one and it still matches the file.
+
+    :param json_path: Path of universities.json
+    :return: (list of index entries, whether the file is compact), or None if the index is missing or out of date
+    """
+    path = index_path(json_path)
+    if not os.path.exists(path) or not os.path.exists(json_path):
+        return None
+    # endif
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            entries = []
+            for line in f:
+                entries.append(json.loads(line))
+            # endfor
+        # endwith
+    except ValueError:
+        return None
+    # endtry
+
+    json_stat = os.stat(json_path)
+    if header.get("version") != INDEX_VERSION or header.get("json_size") != json_stat.st_size \
+            or header.get("json_mtime_ns") != json_stat.st_mtime_ns or header.get("count") != len(entries):
+        return None
+    # endif
+
+    return entries, header.get("compact", False)
+# enddef
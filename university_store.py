@@ -0,0 +1,422 @@
+"""
+Optional SQLite copy of the scraped data, so questions like "which courses ask for at most 112 points
+and need Mathematics" can be answered with an indexed query instead of loading the whole of
+universities.json and looking through every course.
+
+Build it from an existing universities.json with: python3 university_store.py [universities.json] [universities.db]
+"""
+
+import sqlite3
+import sys
+import threading
+
+from JSONReader import iter_universities
+from models.University import University
+
+# One table per model, each row pointing at the row it belongs to.
+# "position" keeps the order things were in on the page (and in universities.json)
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS universities ("
+    "id INTEGER PRIMARY KEY, "
+    "name TEXT NOT NULL UNIQUE, "
+    "location TEXT NOT NULL DEFAULT '', "
+    "link TEXT NOT NULL DEFAULT '', "
+    "link_all_courses TEXT NOT NULL DEFAULT '')",
+
+    "CREATE TABLE IF NOT EXISTS courses ("
+    "id INTEGER PRIMARY KEY, "
+    "university_id INTEGER NOT NULL REFERENCES universities (id) ON DELETE CASCADE, "
+    "position INTEGER NOT NULL, "
+    "name TEXT NOT NULL DEFAULT '', "
+    "course_type TEXT NOT NULL DEFAULT '', "
+    "duration TEXT NOT NULL DEFAULT '', "
+    "mode TEXT NOT NULL DEFAULT '', "
+    "location TEXT NOT NULL DEFAULT '', "
+    "start_date TEXT NOT NULL DEFAULT '', "
+    "link TEXT NOT NULL DEFAULT '', "
+    "fingerprint TEXT NOT NULL DEFAULT '', "
+    "fetched_at INTEGER NOT NULL DEFAULT 0)",
+
+    "CREATE TABLE IF NOT EXISTS entry_requirements ("
+    "id INTEGER PRIMARY KEY, "
+    "course_id INTEGER NOT NULL REFERENCES courses (id) ON DELETE CASCADE, "
+    "position INTEGER NOT NULL, "
+    "min_ucas_points INTEGER NOT NULL DEFAULT 0, "
+    "min_grade_required TEXT NOT NULL DEFAULT '', "
+    "display_grades TEXT NOT NULL DEFAULT '', "
+    "btec_grades TEXT NOT NULL DEFAULT '', "
+    "accepts_ucas INTEGER NOT NULL DEFAULT 1, "
+    "has_requirements INTEGER NOT NULL DEFAULT 0)",
+
+    "CREATE TABLE IF NOT EXISTS subject_requirements ("
+    "id INTEGER PRIMARY KEY, "
+    "requirement_id INTEGER NOT NULL REFERENCES entry_requirements (id) ON DELETE CASCADE, "
+    "position INTEGER NOT NULL, "
+    "subject TEXT NOT NULL DEFAULT '', "
+    "grade TEXT NOT NULL DEFAULT '')",
+
+    # Indexes for the searches in find_courses, and for following each row to the one it belongs to
+    "CREATE INDEX IF NOT EXISTS idx_courses_university ON courses (university_id)",
+    "CREATE INDEX IF NOT EXISTS idx_courses_type ON courses (course_type COLLATE NOCASE)",
+    "CREATE INDEX IF NOT EXISTS idx_requirements_course ON entry_requirements (course_id)",
+    "CREATE INDEX IF NOT EXISTS idx_requirements_points ON entry_requirements (min_ucas_points)",
+    "CREATE INDEX IF NOT EXISTS idx_subjects_requirement ON subject_requirements (requirement_id)",
+    "CREATE INDEX IF NOT EXISTS idx_subjects_subject ON subject_requirements (subject COLLATE NOCASE)"
+]
+
+# Columns added to the courses table after it was first made, added to older databases when they are opened
+# (fingerprint and fetched_at are what a refresh crawl needs, see University.reuse_unchanged_courses)
+ADDED_COURSE_COLUMNS = [
+    ("fingerprint", "TEXT NOT NULL DEFAULT ''"),
+    ("fetched_at", "INTEGER NOT NULL DEFAULT 0")
+]
+
+
+class UniversityStore:
+    """
+    Keeps universities, courses, entry requirements and subject requirements in normalised SQLite tables.
+    Universities go in as the same dictionaries University.to_dict makes, and come back out the same way.
+    """
+
+    def __init__(self, path="universities.db"):
+        """
+        Opens (or creates) the database.
+
+        :param path: SQLite file to store the universities in (default "universities.db")
+        :return: None
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        for statement in SCHEMA:
+            self._connection.execute(statement)
+        # endfor
+
+        existing_columns = set()
+        for column_row in self._connection.execute("PRAGMA table_info(courses)"):
+            existing_columns.add(column_row[1])
+        # endfor
+        for column_name, column_type in ADDED_COURSE_COLUMNS:
+            if column_name not in existing_columns:
+                self._connection.execute(f"ALTER TABLE courses ADD COLUMN {column_name} {column_type}")
+            # endif
+        # endfor
+        self._connection.commit()
+
+    # enddef
+
+    def _insert_university(self, university_dict):
+        """
+        Writes one university and everything under it, replacing any university with the same name.
+        The caller commits.
+
+        :param university_dict: University dictionary made by University.to_dict
+        :return: None
+        """
+        # Going through the models fills in defaults for anything missing, the same as loading the JSON
+        university = University.from_dict(university_dict)
+        name = university.name.strip()
+        if not name:
+            return
+        # endif
+
+        # Deleting the university deletes its courses and requirements too (ON DELETE CASCADE)
+        self._connection.execute("DELETE FROM universities WHERE name = ?", (name,))
+        cursor = self._connection.execute(
+            "INSERT INTO universities (name, location, link, link_all_courses) VALUES (?, ?, ?, ?)",
+            (name, university.location, university.link, university.link_all_courses)
+        )
+        university_id = cursor.lastrowid
+
+        for course_position, course in enumerate(university.courses):
+            cursor = self._connection.execute(
+                "INSERT INTO courses (university_id, position, name, course_type, duration, mode, location, "
+                "start_date, link, fingerprint, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (university_id, course_position, course.name, course.course_type, course.duration, course.mode,
+                 course.location, course.start_date, course.link, course.fingerprint, int(course.fetched_at))
+            )
+            course_id = cursor.lastrowid
+
+            for requirement_position, req in enumerate(course.requirements):
+                cursor = self._connection.execute(
+                    "INSERT INTO entry_requirements (course_id, position, min_ucas_points, min_grade_required, "
+                    "display_grades, btec_grades, accepts_ucas, has_requirements) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (course_id, requirement_position, req.min_ucas_points, req.min_grade_required,
+                     req.display_grades, req.btec_grades, int(bool(req.accepts_ucas)),
+                     int(bool(req.has_requirements)))
+                )
+                requirement_id = cursor.lastrowid
+
+                subject_rows = []
+                for subject_position, subject_req in enumerate(req.subject_requirements):
+                    subject_rows.append((requirement_id, subject_position, subject_req.subject, subject_req.grade))
+                # endfor
+                self._connection.executemany(
+                    "INSERT INTO subject_requirements (requirement_id, position, subject, grade) VALUES (?, ?, ?, ?)",
+                    subject_rows
+                )
+            # endfor
+        # endfor
+
+    # enddef
+
+    def save_university(self, university_dict):
+        """
+        Saves one university, replacing any university with the same name.
+
+        :param university_dict: University dictionary made by University.to_dict
+        :return: None
+        """
+        with self._lock:
+            self._insert_university(university_dict)
+            self._connection.commit()
+        # endwith
+
+    # enddef
+
+    def save_universities(self, universities):
+        """
+        Saves many universities in one transaction (much quicker than one at a time).
+
+        :param universities: Any iterable of university dictionaries, e.g. iter_universities("universities.json")
+        :return: None
+        """
+        with self._lock:
+            for university_dict in universities:
+                if isinstance(university_dict, dict):
+                    self._insert_university(university_dict)
+                # endif
+            # endfor
+            self._connection.commit()
+        # endwith
+
+    # enddef
+
+    def university_names(self):
+        """
+        Gets the name of every stored university.
+
+        :return: List of names in alphabetical order
+        """
+        with self._lock:
+            rows = self._connection.execute("SELECT name FROM universities ORDER BY name").fetchall()
+        # endwith
+
+        names = []
+        for row in rows:
+            names.append(row[0])
+        # endfor
+        return names
+
+    # enddef
+
+    def get_university(self, name):
+        """
+        Gets one university with all its courses.
+
+        :param name: The university's name
+        :return: University dictionary in the same shape as University.to_dict, or None if it isn't stored
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT id, name, location, link, link_all_courses FROM universities WHERE name = ?",
+                (name.strip(),)
+            ).fetchone()
+            if row is None:
+                return None
+            # endif
+            course_rows = self._connection.execute(
+                "SELECT id, name, course_type, duration, mode, location, start_date, link, fingerprint, fetched_at "
+                "FROM courses "
+                "WHERE university_id = ? ORDER BY position",
+                (row[0],)
+            ).fetchall()
+            courses = self._build_courses(course_rows)
+        # endwith
+
+        return {
+            "name": row[1],
+            "location": row[2],
+            "link": row[3],
+            "link_all_courses": row[4],
+            "courses": courses
+        }
+
+    # enddef
+
+    def find_courses(self, max_points=None, min_points=None, subject=None, course_type=None, university=None,
+                     limit=None):
+        """
+        Finds courses using the indexes. Every filter given has to match, and the points and subject
+        have to match on the same entry requirement.
+        e.g. store.find_courses(max_points=112, subject="Mathematics")
+
+        :param max_points: Only courses asking for at most this many UCAS points (courses with no points are left out)
+        :param min_points: Only courses asking for at least this many UCAS points
+        :param subject: Only courses with a requirement in this subject (not case sensitive)
+        :param course_type: Only this type of course, e.g. "BSc (Hons)" (not case sensitive)
+        :param university: Only courses at the university with this name
+        :param limit: Maximum number of courses to return
+        :return: List of course dictionaries (the same shape as Course.to_dict) with an added "university" name
+        """
+        conditions = []
+        parameters = []
+        if max_points is not None:
+            conditions.append("r.min_ucas_points > 0 AND r.min_ucas_points <= ?")
+            parameters.append(max_points)
+        # endif
+        if min_points is not None:
+            conditions.append("r.min_ucas_points >= ?")
+            parameters.append(min_points)
+        # endif
+        if subject is not None:
+            conditions.append("r.id IN (SELECT requirement_id FROM subject_requirements "
+                              "WHERE subject = ? COLLATE NOCASE)")
+            parameters.append(subject.strip())
+        # endif
+        if course_type is not None:
+            conditions.append("c.course_type = ? COLLATE NOCASE")
+            parameters.append(course_type.strip())
+        # endif
+        if university is not None:
+            conditions.append("u.name = ?")
+            parameters.append(university.strip())
+        # endif
+
+        query = ("SELECT DISTINCT c.id, c.name, c.course_type, c.duration, c.mode, c.location, c.start_date, c.link, "
+                 "c.fingerprint, c.fetched_at, u.name, u.id, c.position "
+                 "FROM courses c JOIN universities u ON u.id = c.university_id")
+        if max_points is not None or min_points is not None or subject is not None:
+            query += " JOIN entry_requirements r ON r.course_id = c.id"
+        # endif
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        # endif
+        query += " ORDER BY u.name, c.position"
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters.append(limit)
+        # endif
+
+        with self._lock:
+            rows = self._connection.execute(query, parameters).fetchall()
+            courses = self._build_courses(rows)
+        # endwith
+
+        for course_dict, row in zip(courses, rows):
+            course_dict["university"] = row[10]
+        # endfor
+        return courses
+
+    # enddef
+
+    def _build_courses(self, course_rows):
+        """
+        Turns course rows back into course dictionaries, fetching all their requirements in two queries.
+        The caller holds the lock.
+
+        :param course_rows: Rows starting with (id, name, course_type, duration, mode, location, start_date, link,
+                            fingerprint, fetched_at)
+        :return: List of course dictionaries in the same order as the rows
+        """
+        course_ids = []
+        for row in course_rows:
+            course_ids.append(row[0])
+        # endfor
+
+        # course id -> list of requirement dictionaries, requirement id -> its dictionary
+        requirements_by_course = {}
+        requirements_by_id = {}
+        if course_ids:
+            self._connection.execute("CREATE TEMP TABLE IF NOT EXISTS wanted_courses (id INTEGER PRIMARY KEY)")
+            self._connection.execute("DELETE FROM wanted_courses")
+            self._connection.executemany("INSERT OR IGNORE INTO wanted_courses (id) VALUES (?)",
+                                         [(course_id,) for course_id in course_ids])
+
+            # CROSS JOIN makes SQLite start from the wanted courses and use the indexes from there,
+            # rather than reading the whole requirements table in order
+            requirement_rows = self._connection.execute(
+                "SELECT r.id, r.course_id, r.min_ucas_points, r.min_grade_required, r.display_grades, "
+                "r.btec_grades, r.accepts_ucas, r.has_requirements FROM wanted_courses w "
+                "CROSS JOIN entry_requirements r ON r.course_id = w.id ORDER BY r.course_id, r.position"
+            ).fetchall()
+            for requirement_id, course_id, points, min_grade, display_grades, btec_grades, accepts_ucas, \
+                    has_requirements in requirement_rows:
+                requirement_dict = {
+                    "min_ucas_points": points,
+                    "min_grade_required": min_grade,
+                    "subject_requirements": [],
+                    "display_grades": display_grades,
+                    "btec_grades": btec_grades,
+                    "accepts_ucas": bool(accepts_ucas),
+                    "has_requirements": bool(has_requirements)
+                }
+                requirements_by_course.setdefault(course_id, []).append(requirement_dict)
+                requirements_by_id[requirement_id] = requirement_dict
+            # endfor
+
+            subject_rows = self._connection.execute(
+                "SELECT s.requirement_id, s.subject, s.grade FROM wanted_courses w "
+                "CROSS JOIN entry_requirements r ON r.course_id = w.id "
+                "CROSS JOIN subject_requirements s ON s.requirement_id = r.id ORDER BY s.requirement_id, s.position"
+            ).fetchall()
+            for requirement_id, subject, grade in subject_rows:
+                requirements_by_id[requirement_id]["subject_requirements"].append({"subject": subject, "grade": grade})
+            # endfor
+        # endif
+
+        courses = []
+        for row in course_rows:
+            courses.append({
+                "name": row[1],
+                "course_type": row[2],
+                "duration": row[3],
+                "mode": row[4],
+                "location": row[5],
+                "start_date": row[6],
+                "link": row[7],
+                "requirements": requirements_by_course.get(row[0], []),
+                "fingerprint": row[8],
+                "fetched_at": row[9]
+            })
+        # endfor
+        return courses
+
+    # enddef
+
+    def close(self):
+        """
+        Closes the database connection.
+
+        :return: None
+        """
+        with self._lock:
+            self._connection.close()
+        # endwith
+    # enddef
+# endclass
+
+
+def main():
+    """
+    Builds the database from a universities.json file.
+
+    :return: None
+    """
+    input_path = sys.argv[1] if len(sys.argv) > 1 else "universities.json"
+    output_path = sys.argv[2] if len(sys.argv) > 2 else "universities.db"
+
+    store = UniversityStore(output_path)
+    # Read one university at a time so a huge file never has to fit in memory
+    store.save_universities(iter_universities(input_path))
+    print(f"Saved {len(store.university_names())} universities to {output_path}")
+    store.close()
+
+
+# enddef
+
+if __name__ == "__main__":
+    main()
+# endif